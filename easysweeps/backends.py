@@ -0,0 +1,113 @@
+import hashlib
+import logging
+import subprocess
+import threading
+import time
+from copy import deepcopy
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+class SweepBackend:
+    """Interface for registering a rendered sweep config and getting back its sweep ID"""
+
+    name = None
+
+    def create_sweep(self, sweep_config: dict, sweep_file: Path) -> str:
+        """Register a sweep.
+
+        Args:
+            sweep_config: The rendered sweep configuration
+            sweep_file: Path of the YAML file the configuration was saved to
+
+        Returns:
+            The sweep ID
+        """
+        raise NotImplementedError
+
+class SubprocessBackend(SweepBackend):
+    """Register each sweep by running `wandb sweep <file>` in a new process"""
+
+    name = "subprocess"
+
+    def create_sweep(self, sweep_config: dict, sweep_file: Path) -> str:
+        out = subprocess.check_output(
+            ["wandb", "sweep", str(sweep_file)],
+            text=True,
+            stderr=subprocess.STDOUT
+        )
+        return out.strip().split("/")[-1]
+
+class InProcessBackend(SweepBackend):
+    """Register sweeps through the wandb library API from the current interpreter.
+
+    wandb is imported once and reused for every sweep, which avoids paying for a new
+    interpreter and the wandb CLI import per sweep.
+    """
+
+    name = "inprocess"
+
+    def __init__(self, entity: str = None, project: str = None):
+        self.entity = entity or config.get("entity")
+        self.project = project or config.get("project")
+        self._wandb = None
+        self._lock = threading.Lock()
+
+    def _import_wandb(self):
+        with self._lock:
+            if self._wandb is None:
+                import wandb
+                self._wandb = wandb
+        return self._wandb
+
+    def create_sweep(self, sweep_config: dict, sweep_file: Path) -> str:
+        wandb = self._import_wandb()
+        # Rendered configs share unchanged parts with the template, so hand wandb its own copy
+        return wandb.sweep(deepcopy(sweep_config), entity=self.entity, project=self.project)
+
+class FakeBackend(SweepBackend):
+    """Offline backend that hands out IDs without talking to wandb.
+
+    IDs are derived from the sweep name so repeated runs are reproducible. An optional
+    delay simulates the round trip of a real backend for benchmarks.
+    """
+
+    name = "fake"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = float(delay)
+
+    def create_sweep(self, sweep_config: dict, sweep_file: Path) -> str:
+        if self.delay:
+            time.sleep(self.delay)
+        return hashlib.sha1(str(sweep_config.get("name")).encode()).hexdigest()[:8]
+
+class LocalBackend(SweepBackend):
+    """Create grid and random sweeps that are controlled locally, without the wandb sweep server.
+
+    Agents of these sweeps run `easysweeps local-agent` instead of `wandb agent`, see
+    easysweeps.local_sweeps.
+    """
+
+    name = "local"
+
+    def create_sweep(self, sweep_config: dict, sweep_file: Path) -> str:
+        from .local_sweeps import LocalSweep
+        return LocalSweep.create(sweep_config, sweep_file.parent).sweep_id
+
+BACKENDS = {
+    SubprocessBackend.name: SubprocessBackend,
+    InProcessBackend.name: InProcessBackend,
+    FakeBackend.name: FakeBackend,
+    LocalBackend.name: LocalBackend,
+}
+
+def get_backend(name: str = None) -> SweepBackend:
+    """Create the sweep backend with the given name (default: `sweep_backend` from ez_config.yaml)"""
+    name = name or config.get("sweep_backend", SubprocessBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown sweep backend '{name}', expected one of: {', '.join(BACKENDS)}")
+    if name == FakeBackend.name:
+        return FakeBackend(delay=config.get("fake_backend_delay", 0.0))
+    return BACKENDS[name]()
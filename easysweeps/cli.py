@@ -2,15 +2,20 @@ import click
 from pathlib import Path
 import logging
 
-from easysweeps import launch_agents, launch_sweeps
 from .config import config
 from .utils import setup_logging
-import subprocess
+from .registry import open_registry
+from .executors import get_executor
+from .trace import tracer
 
 logger = logging.getLogger(__name__)
 
 @click.group()
-def cli():
+@click.option('--trace', 'trace_file', type=click.Path(dir_okay=False),
+              help='Record timed spans of the command (config, rendering, subprocesses, file I/O) to FILE in Chrome trace format')
+@click.option('--timings', is_flag=True, help='Print the slowest operations when the command finishes')
+@click.pass_context
+def cli(ctx, trace_file, timings):
     """EasySweeps - A powerful CLI tool for automating Weights & Biases sweep creation and management.
 
     This tool helps you create and manage multiple wandb sweeps efficiently by:
@@ -21,29 +26,63 @@ def cli():
 
     For detailed help on each command, use: easysweeps COMMAND --help
     """
+    if trace_file or timings:
+        tracer.enable()
+        ctx.call_on_close(lambda: finish_trace(trace_file, timings))
+
     # Set up logging
     log_dir = Path(config.get("agent_log_dir"))
     setup_logging(log_dir)
 
+def finish_trace(trace_file=None, timings=False, limit=15):
+    """Write the recorded spans to trace_file and/or print the slowest operations to stderr"""
+    tracer.disable()
+    if trace_file:
+        tracer.write(trace_file)
+        click.echo(f"Trace with {len(tracer.events)} spans written to {trace_file}", err=True)
+    if timings:
+        click.echo(f"\n{'operation':<40}{'calls':>7}{'total ms':>12}{'max ms':>10}", err=True)
+        for name, count, total, longest in tracer.summary(limit):
+            click.echo(f"{name[:39]:<40}{count:>7}{total:>12.1f}{longest:>10.1f}", err=True)
+
 @cli.command()
 @click.option('--sweep-dir', type=click.Path(), help='Directory containing sweep configurations (default: from ez_config.yaml)')
 @click.option('--template', type=click.Path(), help='Sweep template file (default: sweep_dir/sweep_template.yaml)')
 @click.option('--variants', type=click.Path(), help='Sweep variants configuration file (default: sweep_dir/sweep_variants.yaml)')
-def sweep(sweep_dir, template, variants):
+@click.option('--jobs', '-j', type=int, default=1, show_default=True, help='Number of sweeps to create concurrently')
+@click.option('--force', is_flag=True, help='Recreate sweeps even if an identical sweep was already created')
+@click.option('--dry-run', is_flag=True, help='Only count the sweeps that would be created and preview the first ones')
+@click.option('--preview', type=int, default=10, show_default=True, help='Number of sweeps listed by --dry-run')
+def sweep(sweep_dir, template, variants, jobs, force, dry_run, preview):
     """Create and launch wandb sweeps from a template and variants configuration.
 
     This command creates multiple wandb sweeps by combining a template configuration
     with a variants definition. The template defines the sweep structure while
     the variants file specifies the different parameter combinations to create sweeps for.
 
+    Use --jobs to register several sweeps in parallel. created_sweeps.txt is always
+    written in the order of the variant combinations.
+
+    Sweeps are only created for new or changed combinations: each rendered config is
+    hashed and looked up in the sweep registry (sweep_dir/sweeps.db), so re-running after editing one
+    variant (or after an interrupted run) only creates what is missing. Use --force to
+    recreate everything.
+
+    Besides lists of values, the variants file accepts the reserved keys _zip,
+    _exclude, _include and _sample to zip parameters together, skip or add specific
+    combinations, and create only a random or Latin-hypercube subset. Combinations are
+    generated lazily. Use --dry-run to check how many sweeps a variants file produces.
+
     Example:
         easysweeps sweep --sweep-dir sweeps/ --template sweeps/sweep_template.yaml --variants sweeps/sweep_variants.yaml
+        easysweeps sweep --jobs 8  # Create up to 8 sweeps at a time
+        easysweeps sweep --dry-run  # Count and preview the sweeps without creating them
     """
     try:
         # Use provided paths or defaults from config
         sweep_dir = Path(sweep_dir or config.get("sweep_dir"))
-        template = template or (sweep_dir / "sweep_template.yaml")
-        variants = variants or (sweep_dir / "sweep_variants.yaml")
+        template = Path(template) if template else sweep_dir / "sweep_template.yaml"
+        variants = Path(variants) if variants else sweep_dir / "sweep_variants.yaml"
 
         # Validate files exist
         if not template.exists():
@@ -51,22 +90,33 @@ def sweep(sweep_dir, template, variants):
         if not variants.exists():
             raise click.ClickException(f"Variants file not found: {variants}")
 
+        from . import launch_sweeps
+
+        if dry_run:
+            raw_count, count, previews = launch_sweeps.preview_sweeps(template, variants, limit=preview)
+            click.echo(f"{raw_count} combinations in the product, {count} sweeps would be created")
+            for name, combo in previews:
+                click.echo(f"  {name}: {combo}")
+            if count > len(previews):
+                click.echo(f"  ... and {count - len(previews)} more")
+            return
+
+        with open_registry(sweep_dir) as registry:
+            known_sweeps = registry.count()
+
         # Create sweeps
         created_sweeps = launch_sweeps.create_sweeps(
             sweep_dir=sweep_dir,
             template_file=template,
-            variants_file=variants
+            variants_file=variants,
+            jobs=jobs,
+            force=force
         )
-        
-        # Create and update created_sweeps.txt
-        sweep_log = sweep_dir / "created_sweeps.txt"
-        sweep_log.parent.mkdir(parents=True, exist_ok=True)
-        
-        with sweep_log.open('a') as f:
-            for name, sweep_id in created_sweeps:
-                f.write(f"{name} {sweep_id}\n")
-        
-        click.echo(f"Successfully created {len(created_sweeps)} sweeps")
+
+        with open_registry(sweep_dir) as registry:
+            new_sweeps = registry.count() - known_sweeps
+
+        click.echo(f"Successfully created {new_sweeps} sweeps ({len(created_sweeps) - new_sweeps} unchanged)")
         
     except Exception as e:
         logger.error(f"Failed to create sweeps: {e}")
@@ -74,18 +124,41 @@ def sweep(sweep_dir, template, variants):
 
 @cli.command()
 @click.argument('sweep_id', required=False)
-@click.option('--gpu-list', required=True, help='Comma-separated list of GPU indices to use (e.g., "0,1,2")')
+@click.option('--gpu-list', help='Comma-separated list of GPU indices to use (e.g., "0,1,2"). Required unless --auto is given')
 @click.option('--agents-per-sweep', type=int, default=1, help='Number of agents to launch per sweep on each GPU')
+@click.option('--auto', 'auto_agents', type=int, help='Launch this many agents, placed on the GPUs with free capacity')
 @click.option('--force-recopy', is_flag=True, help='Force recopy project directories even if they already exist')
-def agent(sweep_id, gpu_list, agents_per_sweep, force_recopy):
+@click.option('--ready-timeout', type=float, help='Seconds to wait for each agent to start (default: agent_ready_timeout from ez_config.yaml, 10)')
+@click.option('--hosts', multiple=True, help='Launch on these hosts instead, with their GPUs (e.g., "node1:0,1 node2:0-3"). Hosts without GPUs use --gpu-list or --auto')
+def agent(sweep_id, gpu_list, agents_per_sweep, auto_agents, force_recopy, ready_timeout, hosts):
     """Launch wandb sweep agents for a specific sweep ID on specified GPUs.
 
     This command launches wandb sweep agents as systemd scope units for a specific sweep ID,
     distributing them across the specified GPUs. Each agent runs in its own systemd scope unit
-    for better process management and monitoring.
+    for better process management and monitoring. With `executor: process` in
+    ez_config.yaml, agents run as plain process groups instead, for machines without
+    systemd.
+
+    Agents are launched concurrently. The command then waits until every agent's unit
+    is active and its log starts growing, and reports agents that failed to start.
 
     If no sweep ID is provided, it will display all available sweeps.
 
+    When `easysweeps daemon` is running, the agents are launched by the daemon, which
+    restarts them if they crash.
+
+    With --auto N, agents are placed by capacity instead: free memory and utilization
+    are read from nvidia-smi, agents already running on each GPU are counted, and up to
+    N new agents are spread over the GPUs (from --gpu-list, or all GPUs) that have room
+    for another agent. The per-agent memory estimate and limits come from
+    ez_config.yaml (agent_memory_mb, max_agents_per_gpu, max_gpu_utilization).
+
+    With --hosts, `easysweeps agent` is run on each of the given hosts at the same time
+    (over SSH by default, see host_transport in ez_config.yaml), in the same project
+    directory, and their output is printed with a host prefix. Each host launches
+    agents on the GPUs listed after its name. The project and the sweep registry must be
+    available on every host, e.g. on a shared filesystem.
+
     The command uses the following configuration from ez_config.yaml:
     - conda_env: The conda environment to use
     - entity: The wandb entity name
@@ -95,12 +168,16 @@ def agent(sweep_id, gpu_list, agents_per_sweep, force_recopy):
     Example:
         easysweeps agent abc123 --gpu-list 0,1,2  # Launch agents for sweep abc123 on GPUs 0,1,2
         easysweeps agent abc123 --gpu-list 0 --agents-per-sweep 3  # Launch 3 agents on GPU 0
+        easysweeps agent abc123 --auto 8  # Place 8 agents on GPUs with free capacity
+        easysweeps agent abc123 --hosts "node1:0,1 node2:0-3"  # 2 agents on node1, 4 on node2
         easysweeps agent --gpu-list 0,1  # Show all available sweeps
     """
     try:
         # Parse GPU list
+        if gpu_list is None and auto_agents is None and sweep_id and not hosts:
+            raise click.ClickException("Either --gpu-list or --auto is required")
         try:
-            gpu_list = [int(gpu.strip()) for gpu in gpu_list.split(',')]
+            gpu_list = [int(gpu.strip()) for gpu in gpu_list.split(',')] if gpu_list else None
         except ValueError:
             raise click.ClickException("GPU list must be comma-separated integers (e.g., '0,1,2')")
 
@@ -112,71 +189,135 @@ def agent(sweep_id, gpu_list, agents_per_sweep, force_recopy):
 
             click.echo("\nAvailable sweeps:")
             click.echo("-" * 50)
-            sweep_log = Path(config.get("sweep_dir")) / "created_sweeps.txt"
-            with sweep_log.open() as f:
-                for line in f:
-                    if line.strip():
-                        name, sid = line.strip().split()
-                        click.echo(f"Name: {name}, ID: {sid}")
-                        click.echo("-" * 50)
+            with open_registry() as registry:
+                for record in registry.all():
+                    click.echo(f"Name: {record.name}, ID: {record.sweep_id}")
+                    click.echo("-" * 50)
+            return
+
+        if hosts:
+            from .hosts import parse_hosts, launch_on_hosts
+            results = launch_on_hosts(sweep_id, parse_hosts(hosts), gpu_list, agents_per_sweep, auto_agents,
+                                      force_recopy, ready_timeout)
+            failed = echo_host_results(results)
+            if failed:
+                raise click.ClickException(f"Launching agents failed on {len(failed)} of {len(results)} hosts: "
+                                           f"{', '.join(failed)}")
+            click.echo(f"Successfully launched sweep agents on {len(results)} hosts")
             return
 
-        # Use provided values or defaults from config
-        args = type('Args', (), {
-            'conda_env': config.get("conda_env"),
-            'sweep_log_dir': config.get("sweep_dir"),
-            'gpu_list': gpu_list,
-            'entity': config.get("entity"),
-            'project': config.get("project"),
-            'all_gpus': True,  # Always use all specified GPUs
-            'agents_per_sweep': agents_per_sweep,
-            'force_recopy': force_recopy,
-            'sweep_id': sweep_id
-        })
-
-        # Run the agent launch
-        launch_agents.launch_agents(args)
+        placement = None
+        if auto_agents is not None:
+            placement = plan_agent_placement(auto_agents, gpu_list)
+            if not placement:
+                raise click.ClickException("No GPU has free capacity for another agent")
+            if len(placement) < auto_agents:
+                click.echo(f"Only {len(placement)} of {auto_agents} agents fit on the available GPUs")
+            gpu_list = sorted(set(placement))
+
+        # Let the daemon launch (and supervise) the agents when it is running
+        client = connect_daemon()
+        if client is not None:
+            launches = client.call("agent", timeout=None, sweep_id=sweep_id, gpu_list=gpu_list,
+                                   agents_per_sweep=agents_per_sweep, force_recopy=force_recopy,
+                                   ready_timeout=ready_timeout, placement=placement)
+            for launch in launches:
+                if launch['ready']:
+                    click.echo(f"Launched agent {launch['unit']} on GPU {launch['gpu']} "
+                               f"(ready in {launch['latency']:.1f}s)")
+                else:
+                    click.echo(click.style(f"Failed to launch agent on GPU {launch['gpu']}: {launch['error']}", fg="red"))
+            failed = [launch for launch in launches if not launch['ready']]
+        else:
+            # Run the agent launch, with the remaining settings from ez_config.yaml
+            from . import launch_agents
+            args = launch_agents.agent_args(sweep_id, gpu_list, agents_per_sweep, force_recopy,
+                                            ready_timeout, placement)
+            launches = launch_agents.launch_agents(args)
+            failed = [launch for launch in launches if not launch.ready]
+        if failed:
+            raise click.ClickException(f"{len(failed)} of {len(launches)} agents failed to start")
         click.echo("Successfully launched sweep agents")
         
     except Exception as e:
         logger.error(f"Failed to launch agents: {e}")
         raise click.ClickException(str(e))
 
-def get_sweep_ids():
-    """Get list of sweep IDs from the log file.
+def echo_host_results(results) -> list:
+    """Print the output of commands run with hosts.run_on_hosts, prefixed with the host.
+
+    Returns:
+        list: Hosts where the command failed
+    """
+    failed = []
+    for host, result in results.items():
+        if isinstance(result, Exception):
+            click.echo(click.style(f"[{host}] {result}", fg="red"))
+            failed.append(host)
+            continue
+        for line in (result.stdout + result.stderr).splitlines():
+            click.echo(f"[{host}] {line}")
+        if result.returncode != 0:
+            click.echo(click.style(f"[{host}] failed with exit status {result.returncode}", fg="red"))
+            failed.append(host)
+    return failed
+
+def connect_daemon():
+    """Return a client of the running daemon, or None to work directly with the executor"""
+    from .daemon import connect
+    return connect()
+
+def plan_agent_placement(num_agents, gpu_list=None):
+    """Place num_agents new agents on GPUs according to their free capacity.
+
+    Args:
+        num_agents: Number of agents to place
+        gpu_list: GPU indices to consider (default: all GPUs reported by nvidia-smi)
+
+    Returns:
+        list: GPU index for each agent that could be placed
+    """
+    from .gpus import query_gpus, plan_placement
+
+    gpus = query_gpus()
+    if gpu_list is not None:
+        gpus = [gpu for gpu in gpus if gpu.index in gpu_list]
+    max_agents = config.get("max_agents_per_gpu")
+    max_utilization = config.get("max_gpu_utilization")
+    placement = plan_placement(
+        num_agents, gpus, get_executor().list_units(),
+        agent_memory_mb=float(config.get("agent_memory_mb", 0) or 0),
+        max_agents_per_gpu=int(max_agents) if max_agents is not None else None,
+        max_utilization=float(max_utilization) if max_utilization is not None else None,
+    )
+    for gpu in gpus:
+        logger.debug(f"GPU {gpu.index}: {gpu.memory_free:.0f}/{gpu.memory_total:.0f} MiB free, "
+                     f"{gpu.utilization:.0f}% utilization, {placement.count(gpu.index)} new agents")
+    return placement
+
+def get_sweep_ids(sweep_dir=None):
+    """Get list of sweep IDs from the sweep registry.
     
+    Args:
+        sweep_dir: Directory containing the registry (default: sweep_dir from ez_config.yaml)
+
     Returns:
-        list: List of sweep IDs from created_sweeps.txt. Returns empty list if file doesn't exist.
+        list: List of sweep IDs in creation order. Returns empty list if no sweeps were created.
     """
     try:
-        sweep_log = Path(config.get("sweep_dir")) / "created_sweeps.txt"
-        
-        # Create the file if it doesn't exist
-        if not sweep_log.exists():
-            sweep_log.parent.mkdir(parents=True, exist_ok=True)
-            sweep_log.touch()
-            logger.info(f"Created new sweep log file at {sweep_log}")
-            return []
-        
-        with sweep_log.open() as f:
-            sweep_ids = []
-            for line in f:
-                if line.strip():
-                    try:
-                        name, sweep_id = line.strip().split()
-                        sweep_ids.append(sweep_id)
-                    except ValueError:
-                        logger.warning(f"Invalid line format in {sweep_log}: {line.strip()}")
-                        continue
-        
-        return sweep_ids
+        with open_registry(sweep_dir) as registry:
+            return [record.sweep_id for record in registry.all()]
     except Exception as e:
         logger.error(f"Failed to get sweep IDs: {e}")
         return []
 
 
 @cli.command()
-def status():
+@click.option('--watch', '-w', 'interval', type=float, is_flag=False, flag_value=2.0, default=None,
+              help='Refresh every INTERVAL seconds (default 2) and show CPU, memory and uptime of each agent')
+@click.option('--json', 'as_json', is_flag=True, help='Print the status as JSON, including resource usage')
+@click.option('--hosts', multiple=True, help='Combine the status of these hosts (default: hosts from ez_config.yaml)')
+def status(interval, as_json, hosts):
     """Show status of all sweeps and running agents in a pretty format.
     
     This command displays:
@@ -184,81 +325,70 @@ def status():
     - GPU assignments for each agent
     - Status of each agent (running/stopped)
     - Sweeps that exist but have no running agents
+
+    With --watch, the view refreshes in place and also shows the CPU usage, resident
+    memory, uptime and process count of each agent, taken from the processes in its
+    scope unit. --json prints the same information as JSON (one document per refresh
+    with --watch).
+
+    When `easysweeps daemon` is running, the status is served from its in-memory
+    inventory instead of querying the executor.
+
+    With --hosts (or `hosts` in ez_config.yaml), all hosts are queried at the same time
+    and their agents are shown together, each with the host it runs on. Hosts that
+    cannot be reached are reported on stderr.
+
+    Examples:
+        easysweeps status
+        easysweeps status --watch  # Refresh every 2 seconds
+        easysweeps status --watch 1 --json  # One JSON document per second
+        easysweeps status --hosts "node1 node2"
     """
+    import json
+    import time
+    from .hosts import parse_hosts, configured_hosts, collect_host_status
+    from .monitor import collect_status, format_status
+
     try:
-        # Get running scope units
-        result = subprocess.run(['systemctl', '--user', 'list-units', '--type=scope'], 
-                              capture_output=True, text=True)
-        running_units = result.stdout.split('\n')
+        with_usage = interval is not None or as_json
+        host_names = [spec.host for spec in (parse_hosts(hosts) if hosts else configured_hosts())]
+        client = connect_daemon() if not host_names else None
+        monitor = None
+        if with_usage and client is None and not host_names:
+            from .monitor import AgentMonitor
+            monitor = AgentMonitor()
 
-        # Parse all running units to get sweep IDs and their agents
-        active_sweeps = {}  # sweep_id -> {name: str, agents: list of (gpu, agent, status)}
-        
-        for unit in running_units:
-            if "wandb-agent-" in unit:
-                parts = unit.split()
-                if len(parts) > 0:
-                    unit_name = parts[0]
-                    try:
-                        # Extract sweep_id, GPU and agent numbers from unit name
-                        # Format: wandb-agent-{sweep_id}-{gpu}-{agent}.scope
-                        parts = unit_name.split('-')
-                        sweep_id = parts[2]
-                        gpu = parts[3]
-                        agent = parts[4].replace('.scope', '')
-                        status = "running" if "active" in unit else "stopped"
-                        
-                        if sweep_id not in active_sweeps:
-                            active_sweeps[sweep_id] = {
-                                'name': sweep_id,  # Default to ID if name not found
-                                'agents': []
-                            }
-                        active_sweeps[sweep_id]['agents'].append((gpu, agent, status))
-                    except (IndexError, ValueError):
-                        continue
-
-        # Get sweep names from created_sweeps.txt for inactive sweeps
-        sweep_log = Path(config.get("sweep_dir")) / "created_sweeps.txt"
-        if sweep_log.exists():
-            with sweep_log.open() as f:
-                for line in f:
-                    if line.strip():
-                        name, sweep_id = line.strip().split()
-                        if sweep_id not in active_sweeps:
-                            active_sweeps[sweep_id] = {
-                                'name': name,
-                                'agents': []
-                            }
-                        else:
-                            active_sweeps[sweep_id]['name'] = name
-
-        # Create a pretty table
-        click.echo("=== Sweeps and Agents Status ===\n")
-        
-        # First show sweeps with running agents
-        active_sweeps_with_agents = {sid: info for sid, info in active_sweeps.items() if info['agents']}
-        if active_sweeps_with_agents:
-            click.echo("Active Sweeps:")
-            click.echo("-" * 50)
-            for sweep_id, info in active_sweeps_with_agents.items():
-                click.echo(f"Sweep: {info['name']} (ID: {sweep_id})")
-                click.echo("Agents:")
-                for gpu, agent, status in sorted(info['agents'], key=lambda x: (int(x[0]), int(x[1]))):
-                    status_color = "green" if status == "running" else "red"
-                    click.echo(f"  GPU {gpu}, Agent {agent}: {click.style(status, fg=status_color)}")
-                click.echo("-" * 50)
-
-        # Then show sweeps without agents
-        inactive_sweeps = {sid: info for sid, info in active_sweeps.items() if not info['agents']}
-        if inactive_sweeps:
-            click.echo("\nInactive Sweeps (no running agents):")
-            click.echo("-" * 50)
-            for sweep_id, info in inactive_sweeps.items():
-                click.echo(f"   {info['name']} (ID: {sweep_id})")
+        def fetch_status():
+            if host_names:
+                active_sweeps, errors = collect_host_status(host_names)
+                for host, error in errors.items():
+                    click.echo(click.style(f"{host}: {error}", fg="yellow"), err=True)
+                return active_sweeps
+            if client is not None:
+                return client.call("status", usage=with_usage)
+            return collect_status(registry, monitor)
 
-        if not active_sweeps:
-            click.echo("No active sweeps found")
-            
+        with open_registry() as registry:
+            if as_json and interval is None and not host_names:
+                # CPU percentages are measured between two samples
+                fetch_status()
+                time.sleep(0.5)
+            while True:
+                active_sweeps = fetch_status()
+                if as_json:
+                    payload = [{'sweep_id': sid, **info} for sid, info in active_sweeps.items()]
+                    click.echo(json.dumps({'time': time.time(), 'sweeps': payload}))
+                elif interval is not None:
+                    # Move the cursor home and clear the screen, then redraw
+                    click.echo("\x1b[H\x1b[J" + "\n".join(format_status(active_sweeps, with_usage=True)))
+                else:
+                    click.echo("\n".join(format_status(active_sweeps)))
+                if interval is None:
+                    break
+                time.sleep(interval)
+
+    except KeyboardInterrupt:
+        pass
     except Exception as e:
         logger.error(f"Failed to show status: {e}")
         raise click.ClickException(str(e))
@@ -267,7 +397,10 @@ def status():
 @click.option('--force', is_flag=True, help='Force kill all sweeps and agents (requires confirmation)')
 @click.option('--gpu', type=str, help='GPU number to kill agents from (optional)')
 @click.option('--sweep', type=str, help='Sweep ID to kill agents for (optional)')
-def kill(force, gpu, sweep):
+@click.option('--drain', is_flag=True, help='Let agents finish their current runs before they stop')
+@click.option('--drain-timeout', type=float, help='Seconds to wait for draining agents before stopping them (default: drain_timeout from ez_config.yaml, 3600)')
+@click.option('--hosts', multiple=True, help='Kill agents on these hosts (default: hosts from ez_config.yaml)')
+def kill(force, gpu, sweep, drain, drain_timeout, hosts):
     """Kill wandb sweep agents with flexible options.
 
     This command kills wandb sweep agents that are running in systemd scope units.
@@ -278,45 +411,42 @@ def kill(force, gpu, sweep):
     - --sweep and --gpu together to kill agents for a specific sweep on a specific GPU
     - No options to see list of active sweeps
 
+    With --drain, the agents are not stopped outright. Each agent is told to stop
+    taking new runs (like pressing Ctrl-C once in `wandb agent`) and exits when its
+    current run is finished. All targeted agents drain at the same time and the number
+    still running is shown live. Agents still running after --drain-timeout seconds are
+    stopped.
+
+    With --hosts (or `hosts` in ez_config.yaml), the same kill is run on all hosts at
+    the same time, and without options the active sweeps of all hosts are listed.
+
     Examples:
         easysweeps kill --force  # Kills all sweeps and agents (with confirmation)
         easysweeps kill --gpu 0  # Kills all agents on GPU 0
         easysweeps kill --sweep abc123  # Kills all agents for sweep abc123
         easysweeps kill --sweep abc123 --gpu 0  # Kills agents for sweep abc123 on GPU 0
+        easysweeps kill --gpu 0 --drain  # Frees GPU 0 once its current runs are finished
         easysweeps kill  # Shows list of active sweeps
+        easysweeps kill --sweep abc123 --hosts "node1 node2"
     """
+    from .hosts import parse_hosts, configured_hosts
+
     try:
-        # Handle force kill all
+        host_names = [spec.host for spec in (parse_hosts(hosts) if hosts else configured_hosts())]
+        if host_names:
+            kill_on_hosts(host_names, force, gpu, sweep, drain, drain_timeout)
+            return
+
+        # Get agent units with a single query
+        executor = get_executor()
+        units = executor.list_units()
+
         if force:
             if not click.confirm("This will kill ALL sweeps and agents. Continue?"):
                 return
-            # Kill all wandb agent scope units
-            subprocess.run(['systemctl', '--user', '--no-pager', 'stop', 'wandb-agent-*.scope'])
-            click.echo("Killed all wandb agent units")
-            return
-
-        # Get running scope units
-        result = subprocess.run(['systemctl', '--user', 'list-units', '--type=scope'], 
-                              capture_output=True, text=True)
-        running_units = result.stdout.split('\n')
-
-        # Parse all running units to get sweep IDs
-        active_sweeps = set()
-        for unit in running_units:
-            if "wandb-agent-" in unit:
-                parts = unit.split()
-                if len(parts) > 0:
-                    unit_name = parts[0]
-                    try:
-                        # Extract sweep_id from unit name
-                        # Format: wandb-agent-{sweep_id}-{gpu}-{agent}.scope
-                        sweep_id = unit_name.split('-')[2]
-                        active_sweeps.add(sweep_id)
-                    except (IndexError, ValueError):
-                        continue
-
-        # If no sweep or gpu provided, show all available sweeps
-        if not sweep and gpu is None:
+        elif not sweep and gpu is None:
+            # If no sweep or gpu provided, show all available sweeps
+            active_sweeps = {unit.sweep_id for unit in units}
             if not active_sweeps:
                 click.echo("No active sweeps found")
                 return
@@ -327,57 +457,714 @@ def kill(force, gpu, sweep):
                 click.echo(f"Sweep ID: {sweep_id}")
             return
 
-        # Construct the unit pattern based on provided options
-        if sweep:
-            unit_pattern = f"wandb-agent-{sweep}"
-            if gpu is not None:
-                unit_pattern += f"-{gpu}"
-            else:
-                unit_pattern += "-*"
-            unit_pattern += "-*"  # For agent number
-        else:
-            # Only gpu specified - use a more precise pattern
-            # First get all running units
-            result = subprocess.run(['systemctl', '--user', 'list-units', '--type=scope'], 
-                                  capture_output=True, text=True)
-            running_units = result.stdout.split('\n')
-            
-            # Filter units that match the GPU
-            matching_units = []
-            for unit in running_units:
-                if "wandb-agent-" in unit:
-                    parts = unit.split()
-                    if len(parts) > 0:
-                        unit_name = parts[0]
-                        try:
-                            # Extract GPU from unit name
-                            # Format: wandb-agent-{sweep_id}-{gpu}-{agent}.scope
-                            unit_gpu = unit_name.split('-')[3]
-                            if unit_gpu == str(gpu):
-                                matching_units.append(unit_name)
-                        except (IndexError, ValueError):
-                            continue
-            
-            # Stop each matching unit individually
-            for unit in matching_units:
-                subprocess.run(['systemctl', '--user', '--no-pager', 'stop', unit])
-            
-            click.echo(f"Killed all agents on GPU {gpu}")
+        try:
+            gpu = int(gpu) if gpu is not None else None
+        except ValueError:
+            raise click.ClickException(f"GPU must be an integer, got '{gpu}'")
+        matching_units = [
+            unit for unit in units
+            if force or ((not sweep or unit.sweep_id == sweep) and (gpu is None or unit.gpu == gpu))
+        ]
+        if not matching_units:
+            click.echo("No matching agents")
             return
 
-        unit_pattern += ".scope"
+        # The daemon also stops supervising the agents, so they are not restarted
+        client = connect_daemon()
+        if drain:
+            if client is not None:
+                client.call("kill", sweep=sweep, gpu=gpu, all_agents=force, stop=False)
+            drain_agents(executor, matching_units, drain_timeout)
+            return
+        if client is not None:
+            client.call("kill", sweep=sweep, gpu=gpu, all_agents=force)
+        elif force:
+            # Kill all wandb agent units
+            executor.stop_all()
+        else:
+            # Stop the matching units in one batched call
+            executor.stop(matching_units)
 
-        # Stop the matching systemd units
-        subprocess.run(['systemctl', '--user', '--no-pager', 'stop', unit_pattern])
-        
         # Construct appropriate message
-        if gpu is not None:
+        if force:
+            click.echo("Killed all wandb agent units")
+        elif sweep and gpu is not None:
             click.echo(f"Killed agents for {sweep} on GPU {gpu}")
-        else:
+        elif sweep:
             click.echo(f"Killed all agents for sweep {sweep}")
-            
+        else:
+            click.echo(f"Killed all agents on GPU {gpu}")
+
+    except KeyboardInterrupt:
+        click.echo("\nStopped waiting, the remaining agents keep draining")
+    except click.ClickException:
+        raise
     except Exception as e:
         logger.error(f"Failed to kill agents: {e}")
         raise click.ClickException(str(e))
+
+def kill_on_hosts(hosts, force, gpu, sweep, drain, drain_timeout):
+    """Run `easysweeps kill` with the same options on all hosts concurrently"""
+    from .hosts import run_on_hosts, collect_host_status
+
+    if force:
+        if not click.confirm(f"This will kill ALL sweeps and agents on {len(hosts)} hosts. Continue?"):
+            return
+    elif not sweep and gpu is None:
+        active_sweeps, errors = collect_host_status(hosts)
+        for host, error in errors.items():
+            click.echo(click.style(f"{host}: {error}", fg="yellow"), err=True)
+        running = {sid: info for sid, info in active_sweeps.items() if info['agents']}
+        if not running:
+            click.echo("No active sweeps found")
+            return
+        click.echo("Active sweeps:")
+        click.echo("-" * 50)
+        for sweep_id, info in sorted(running.items()):
+            on_hosts = sorted({agent_info['host'] for agent_info in info['agents']})
+            click.echo(f"Sweep ID: {sweep_id} ({', '.join(on_hosts)})")
+        return
+
+    args = ["kill"]
+    if force:
+        args.append("--force")
+    if sweep:
+        args += ["--sweep", sweep]
+    if gpu is not None:
+        args += ["--gpu", str(gpu)]
+    if drain:
+        args.append("--drain")
+        if drain_timeout is not None:
+            args += ["--drain-timeout", str(drain_timeout)]
+    # --force asks for confirmation on every host, which was given above
+    results = run_on_hosts({host: args for host in hosts}, input="y\n" if force else None)
+    failed = echo_host_results(results)
+    if failed:
+        raise click.ClickException(f"Killing agents failed on {len(failed)} of {len(results)} hosts: {', '.join(failed)}")
+
+def drain_agents(executor, units, timeout=None):
+    """Drain agents with a live count of those still running, see easysweeps.drain.drain_units"""
+    import sys
+    from .drain import drain_units
+    from .monitor import format_duration
+
+    if not units:
+        click.echo("No matching agents")
+        return
+    timeout = float(timeout if timeout is not None else config.get("drain_timeout", 3600))
+    interactive = sys.stdout.isatty()
+    last = [None]
+
+    def progress(remaining, total, elapsed):
+        line = f"Draining: {remaining}/{total} agents still running ({format_duration(elapsed)} elapsed)"
+        if interactive:
+            click.echo(f"\r\x1b[K{line}", nl=False)
+        elif remaining != last[0]:
+            click.echo(line)
+        last[0] = remaining
+
+    click.echo(f"Draining {len(units)} agents (timeout {format_duration(timeout)})")
+    drained, stopped = drain_units(executor, units, timeout=timeout, progress=progress)
+    if interactive:
+        click.echo()
+    click.echo(f"{len(drained)} agents finished their runs and exited, {len(stopped)} were stopped")
+
+
+@cli.command()
+@click.option('--sweep', type=str, help='Sweep ID or name to show logs for (optional)')
+@click.option('--gpu', type=int, help='Only show logs of agents on this GPU (optional)')
+@click.option('--agent', 'agent_idx', type=int, help='Only show logs of agents with this index (optional)')
+@click.option('--lines', '-n', type=int, default=20, show_default=True, help='Number of lines to show from the end of each log')
+@click.option('--follow', '-f', is_flag=True, help='Keep printing new lines as they are written')
+@click.option('--rotate', is_flag=True, help='Compress and truncate agent logs larger than agent_log_max_mb, then exit')
+def logs(sweep, gpu, agent_idx, lines, follow, rotate):
+    """Show, follow or rotate agent logs.
+
+    Logs are read from the end, so showing the last lines of a multi-GB log is
+    instant. With --follow, only the bytes appended since the previous poll are read
+    from each log, so many logs can be followed at once.
+
+    --rotate compresses every agent log larger than agent_log_max_mb (default 100) to
+    <log>.1.gz and truncates it in place, keeping agent_log_backups (default 3) archives.
+    Running agents keep writing to the same file. Agent logs are also rotated
+    automatically whenever agents are launched, and every agent_log_rotate_interval
+    seconds (default 60) while the daemon, the queue or the telemetry sampler runs.
+
+    Examples:
+        easysweeps logs --sweep abc123  # Last 20 lines of every agent of sweep abc123
+        easysweeps logs --gpu 0 -f  # Follow all agents on GPU 0
+        easysweeps logs --sweep abc123 --gpu 1 --agent 0 -n 100
+        easysweeps logs --rotate
+    """
+    from .logs import find_agent_logs, tail_lines, LogFollower, rotate_agent_logs
+
+    try:
+        log_dir = Path(config.get("agent_log_dir"))
+
+        if rotate:
+            max_bytes = int(float(config.get("agent_log_max_mb", 100)) * 1024 * 1024)
+            rotated = rotate_agent_logs(log_dir, max_bytes, int(config.get("agent_log_backups", 3)))
+            click.echo(f"Rotated {len(rotated)} agent logs")
+            return
+
+        names = None
+        if sweep:
+            with open_registry() as registry:
+                record = registry.get(sweep)
+            names = {record.name} if record else {sweep}
+
+        agent_logs = find_agent_logs(log_dir, names=names, gpu=gpu, agent=agent_idx)
+        if not agent_logs:
+            raise click.ClickException("No matching agent logs found")
+
+        def prefix(log):
+            return f"[{log.name} gpu{log.gpu} agent{log.agent}] " if len(agent_logs) > 1 else ""
+
+        for log in agent_logs:
+            for line in tail_lines(log.path, lines):
+                click.echo(f"{prefix(log)}{line}")
+
+        if follow:
+            by_path = {log.path: log for log in agent_logs}
+            for path, line in LogFollower(by_path).follow():
+                click.echo(f"{prefix(by_path[path])}{line}")
+
+    except KeyboardInterrupt:
+        pass
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to show logs: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command()
+@click.option('--background', is_flag=True, help='Run the daemon in the background as the easysweeps-daemon.scope unit')
+@click.option('--stop', is_flag=True, help='Stop the running daemon')
+@click.option('--poll-interval', type=float, default=2.0, show_default=True, help='Seconds between agent inventory refreshes')
+def daemon(background, stop, poll_interval):
+    """Run the agent supervisor daemon.
+
+    The daemon keeps the sweep registry and the agent inventory in memory and serves
+    `status`, `agent` and `kill` over a Unix socket (one per project directory, see
+    daemon_socket in ez_config.yaml). While it runs, those commands are sent to the
+    daemon; without it they work directly with the executor as before.
+
+    Agents launched through the daemon are supervised: an agent that exits with an
+    error is restarted with exponential backoff (daemon_restart_backoff, default 5s,
+    doubling up to daemon_restart_max_backoff, default 300s). Agents that exit
+    normally because their sweep is finished, and agents stopped with `kill`, are not
+    restarted.
+
+    Examples:
+        easysweeps daemon --background
+        easysweeps daemon --stop
+        easysweeps daemon  # Run in the foreground
+    """
+    import sys
+    import time
+    from .daemon import DAEMON_UNIT, socket_path, connect, serve
+
+    try:
+        client = connect()
+        if stop:
+            if client is None:
+                click.echo("No daemon is running")
+                return
+            client.call("shutdown")
+            click.echo("Stopped daemon")
+            return
+
+        if client is not None:
+            raise click.ClickException(f"A daemon is already running on {client.path}")
+
+        if background:
+            log_file = Path(config.get("agent_log_dir")) / "daemon.log"
+            cmd = [sys.executable, '-m', 'easysweeps.cli', 'daemon', '--poll-interval', str(poll_interval)]
+            executor = get_executor()
+            executor.reset_failed([DAEMON_UNIT])
+            with log_file.open("ab") as log:
+                executor.launch(DAEMON_UNIT, cmd, stdout=log)
+            deadline = time.monotonic() + 10
+            while connect() is None:
+                if time.monotonic() > deadline:
+                    raise click.ClickException(f"Daemon did not start, see {log_file}")
+                time.sleep(0.1)
+            click.echo(f"Started daemon ({DAEMON_UNIT}) on {socket_path()}")
+            return
+
+        serve(poll_interval=poll_interval)
+
+    except KeyboardInterrupt:
+        pass
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to run daemon: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command('local-agent')
+@click.argument('sweep_id')
+@click.option('--count', type=int, help='Stop after this many runs (default: until the sweep has no runs left)')
+@click.option('--sweep-dir', type=click.Path(), help='Directory containing the sweep registry (default: from ez_config.yaml)')
+def local_agent(sweep_id, count, sweep_dir):
+    """Run an agent of a local sweep in the foreground.
+
+    Local sweeps are created with `sweep_backend: local` in ez_config.yaml. Their grid
+    or random parameter sets are handed out by easysweeps itself instead of the wandb
+    sweep server, so no network is needed: every run gets the next parameter set, runs
+    the sweep's `program` like `wandb agent` would (arguments and WANDB_SWEEP_PARAM_PATH),
+    with wandb in local_wandb_mode (default offline), and is recorded as finished or
+    failed. The agent exits when the sweep has no runs left.
+
+    `easysweeps agent` starts this command instead of `wandb agent` for local sweeps,
+    so it rarely needs to be run by hand.
+
+    Example:
+        easysweeps local-agent abc123 --count 1
+    """
+    from .local_sweeps import LocalSweep, run_agent
+
+    try:
+        sweep = LocalSweep(sweep_id, sweep_dir)
+        if not sweep.exists():
+            raise click.ClickException(f"No local sweep found with ID: {sweep_id}")
+        size = sweep.size()
+        click.echo(f"easysweeps: Starting local agent for sweep {sweep_id} "
+                   f"({sweep.config.get('method', 'grid')}, {size if size is not None else 'unlimited'} runs)")
+        run_agent(sweep, count, echo=click.echo)
+
+    except KeyboardInterrupt:
+        pass
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Local agent failed: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command('warm-agent')
+@click.argument('sweep_id')
+@click.option('--entry-point', help='Training function as module:function (default: trial_entry_point from ez_config.yaml)')
+@click.option('--trials-per-process', type=int, help='Start a fresh process after this many trials, 0 for never (default: trials_per_process from ez_config.yaml, 10)')
+@click.option('--sweep-dir', type=click.Path(), help='Directory containing the sweep registry (default: from ez_config.yaml)')
+@click.option('--worker', is_flag=True, hidden=True)
+def warm_agent(sweep_id, entry_point, trials_per_process, sweep_dir, worker):
+    """Run a sweep agent that keeps the training code loaded between trials.
+
+    Instead of a new process per run, a worker process imports the entry point (e.g.
+    `train:main` for main() in train.py) once and calls it for one trial after
+    another, so imports such as torch and the CUDA initialization are paid once per
+    worker instead of once per run. Between trials, the wandb run is finished, the
+    Python, NumPy and PyTorch RNGs are reseeded and cached CUDA memory is released. The
+    entry point takes no arguments and reads its parameters from wandb.config (or
+    sys.argv), like a function passed to wandb.agent. It should not keep state in
+    module globals.
+
+    For isolation, a fresh worker replaces the current one every --trials-per-process
+    trials, and after a trial that failed (for local sweeps) or crashed the worker.
+
+    `easysweeps agent` starts this command instead of `wandb agent` when
+    `trial_runner: warm` is set in ez_config.yaml. easysweeps must then be installed in
+    the agents' conda environment.
+
+    Example:
+        easysweeps warm-agent abc123 --entry-point train:main --trials-per-process 20
+    """
+    import sys
+    from .local_sweeps import LocalSweep
+    from .warm_runner import load_entry_point, local_worker, wandb_worker, run_warm_agent
+
+    try:
+        entry_point = entry_point or config.get("trial_entry_point")
+        if not entry_point:
+            raise click.ClickException("No entry point given, use --entry-point or trial_entry_point in ez_config.yaml")
+        if trials_per_process is None:
+            trials_per_process = int(config.get("trials_per_process", 10))
+        count = trials_per_process if trials_per_process > 0 else None
+        sweep = LocalSweep(sweep_id, sweep_dir)
+
+        if worker:
+            entry = load_entry_point(entry_point)
+            if sweep.exists():
+                sys.exit(local_worker(entry, sweep, count, echo=click.echo))
+            sys.exit(wandb_worker(entry, sweep_id, count, echo=click.echo))
+
+        click.echo(f"easysweeps: Starting warm agent for sweep {sweep_id} ({entry_point}, "
+                   f"{trials_per_process or 'unlimited'} trials per process)")
+        worker_command = [sys.executable, '-m', 'easysweeps.cli', 'warm-agent', sweep_id, '--worker',
+                          '--entry-point', entry_point, '--trials-per-process', str(trials_per_process)]
+        if sweep_dir:
+            worker_command += ['--sweep-dir', str(sweep_dir)]
+        sys.exit(run_warm_agent(worker_command, echo=click.echo))
+
+    except KeyboardInterrupt:
+        pass
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Warm agent failed: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command('local-runs')
+@click.argument('sweep_id')
+@click.option('--json', 'as_json', is_flag=True, help='Print the runs as JSON')
+def local_runs(sweep_id, as_json):
+    """Show the runs of a local sweep: parameters, state and exit code.
+
+    Example:
+        easysweeps local-runs abc123
+    """
+    import json
+    from .local_sweeps import LocalSweep
+
+    try:
+        sweep = LocalSweep(sweep_id)
+        if not sweep.exists():
+            raise click.ClickException(f"No local sweep found with ID: {sweep_id}")
+        runs = sweep.runs()
+        if as_json:
+            click.echo(json.dumps(runs))
+            return
+        colors = {"finished": "green", "running": "yellow"}
+        for run_id, run in sorted(runs.items(), key=lambda item: item[1]['started']):
+            state = click.style(f"{run['state']:<9}", fg=colors.get(run['state'], "red"))
+            exit_code = run.get('exit_code', '')
+            click.echo(f"{run_id}  {state} {exit_code!s:>4}  {json.dumps(run['params'])}")
+        size = sweep.size()
+        finished = sum(run['state'] == "finished" for run in runs.values())
+        click.echo(f"{finished} of {size if size is not None else len(runs)} runs finished")
+
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to show local runs: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command()
+@click.option('--sweep', 'sweeps', multiple=True, help='Sweep ID or name to show (default: all sweeps with runs)')
+@click.option('--metric', help="Summary metric to rank by (default: the sweep's `metric`)")
+@click.option('--goal', type=click.Choice(['minimize', 'maximize']), help="Whether lower or higher is better (default: the sweep's `metric.goal`)")
+@click.option('--top', type=int, default=10, show_default=True, help='Runs shown per sweep (0 for all)')
+@click.option('--export', 'export_file', type=click.Path(dir_okay=False), help='Write all ranked runs to a .csv or .json file')
+@click.option('--jobs', '-j', type=int, help='Worker processes for parsing runs (default: one per CPU)')
+@click.option('--rebuild', is_flag=True, help='Ignore the index and parse every run again')
+def results(sweeps, metric, goal, top, export_file, jobs, rebuild):
+    """Rank the runs of each sweep by its metric, from the local wandb run directories.
+
+    The wandb/ directory of the project (and of every project copy) is scanned for run
+    directories. Their config and summary files are parsed in parallel, and runs are
+    matched to sweeps through the parameter files agents leave in
+    wandb/sweep-<sweep_id>/. Parsed runs are kept in an index (sweep_dir/results_index.json),
+    so later scans only read runs that are new or still changing.
+
+    Each sweep gets a leaderboard sorted by the `metric` of its sweep config (override
+    with --metric and --goal), showing the parameters that differ between its runs.
+
+    Examples:
+        easysweeps results
+        easysweeps results --sweep abc123 --top 0
+        easysweeps results --metric val/acc --goal maximize --export results.csv
+    """
+    import csv
+    import json
+    from .results import ResultsIndex, RESULTS_INDEX_FILE, result_roots, sweep_metric, leaderboard, varied_parameters
+
+    try:
+        sweep_dir = Path(config.get("sweep_dir"))
+        with open_registry(sweep_dir) as registry:
+            records = {record.sweep_id: record for record in registry.all()}
+            roots = result_roots(registry)
+
+        index = ResultsIndex(sweep_dir / RESULTS_INDEX_FILE)
+        if rebuild:
+            index.runs = {}
+        parsed = index.scan(roots, jobs=jobs)
+        all_runs = index.results()
+        click.echo(f"Indexed {len(all_runs)} runs ({parsed} parsed)\n")
+
+        runs_by_sweep = {}
+        for run in all_runs:
+            if run.sweep_id in records:
+                runs_by_sweep.setdefault(run.sweep_id, []).append(run)
+
+        selected = [sweep_id for sweep_id in records if sweep_id in runs_by_sweep]
+        if sweeps:
+            by_name = {record.name: sweep_id for sweep_id, record in records.items()}
+            selected = [by_name.get(sweep, sweep) for sweep in sweeps]
+        if not any(runs_by_sweep.get(sweep_id) for sweep_id in selected):
+            raise click.ClickException(f"No sweep runs found in {', '.join(str(root / 'wandb') for root in roots)}")
+
+        exported = []
+        for sweep_id in selected:
+            record = records.get(sweep_id)
+            runs = runs_by_sweep.get(sweep_id, [])
+            if record is None or not runs:
+                click.echo(f"No runs found for sweep {sweep_id}\n")
+                continue
+            sweep_metric_config = sweep_metric(sweep_dir, record)
+            metric_name = metric or sweep_metric_config.get("name")
+            metric_goal = goal or sweep_metric_config.get("goal", "minimize")
+            if not metric_name:
+                click.echo(f"Sweep {record.name} ({sweep_id}) has no metric, use --metric\n")
+                continue
+
+            ranked, missing = leaderboard(runs, metric_name, metric_goal)
+            params = varied_parameters(runs)
+            click.echo(f"=== {record.name} ({sweep_id}): {metric_name} ({metric_goal}), {len(runs)} runs ===")
+            header = f"{'#':>4}  {'run':<10}{metric_name[:14]:>14}" + "".join(f"  {param[:12]:>12}" for param in params)
+            click.echo(header)
+            click.echo("-" * len(header))
+            for rank, run in enumerate(ranked[:top] if top else ranked, 1):
+                values = "".join(f"  {str(run.config.get(param, ''))[:12]:>12}" for param in params)
+                click.echo(f"{rank:>4}  {run.run_id:<10}{run.summary[metric_name]:>14.6g}{values}")
+            if missing:
+                click.echo(f"  ({len(missing)} runs without a finite {metric_name})")
+            click.echo()
+
+            for rank, run in enumerate(ranked, 1):
+                exported.append({'sweep_id': sweep_id, 'sweep_name': record.name, 'rank': rank, 'run_id': run.run_id,
+                                 'metric': metric_name, 'value': run.summary[metric_name],
+                                 **{f"config.{key}": value for key, value in run.config.items()},
+                                 'path': run.path})
+
+        if export_file:
+            if export_file.endswith(".json"):
+                with open(export_file, "w") as f:
+                    json.dump(exported, f, indent=2, default=str)
+            else:
+                columns = list(dict.fromkeys(key for row in exported for key in row))
+                with open(export_file, "w", newline="") as f:
+                    writer = csv.DictWriter(f, fieldnames=columns)
+                    writer.writeheader()
+                    writer.writerows(exported)
+            click.echo(f"Exported {len(exported)} runs to {export_file}")
+
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to collect results: {e}")
+        raise click.ClickException(str(e))
+
+QUEUE_UNIT = "easysweeps-queue.scope"
+
+@cli.command()
+@click.option('--gpu-list', help='Comma-separated list of GPU indices the queue may use (default: all GPUs reported by nvidia-smi)')
+@click.option('--agents-per-gpu', type=int, help='Agent slots per GPU (default: max_agents_per_gpu from ez_config.yaml, 1)')
+@click.option('--max-agents', type=int, help='Default cap on agents per sweep (default: queue_max_agents from ez_config.yaml, 1)')
+@click.option('--max-failures', type=int, default=3, show_default=True, help='Skip a sweep after its agents failed this many times')
+@click.option('--interval', type=float, default=2.0, show_default=True, help='Seconds between checks for exited agents')
+@click.option('--ready-timeout', type=float, help='Seconds to wait for each agent to start (default: agent_ready_timeout from ez_config.yaml, 10)')
+@click.option('--dry-run', is_flag=True, help='Show the queue order and the agents that would be launched now, then exit')
+@click.option('--reset', is_flag=True, help='Forget which sweeps the queue saw finish or fail')
+@click.option('--background', is_flag=True, help=f'Run the queue in the background as the {QUEUE_UNIT} unit')
+@click.option('--stop', is_flag=True, help='Stop the background queue (its agents keep running)')
+def queue(gpu_list, agents_per_gpu, max_agents, max_failures, interval, ready_timeout, dry_run, reset, background, stop):
+    """Run the sweeps of the registry one after another, backfilling freed GPUs.
+
+    Every GPU gets a fixed number of agent slots. Whenever a slot is free, agents are
+    launched for the next queued sweep: sweeps are taken by priority (higher first),
+    then in the order of created_sweeps.txt, and each gets up to its agent cap. When an
+    agent exits because its sweep has no runs left (e.g. a finished grid sweep), the
+    sweep is marked done and its slot goes to the next sweep within --interval seconds.
+    Agents that were started by hand take up slots too. The queue exits once every
+    sweep is done or failed.
+
+    Priorities and caps are set in sweep_dir/queue.yaml, which is re-read while the
+    queue runs:
+
+    \b
+        max_agents: 2          # default cap per sweep
+        sweeps:
+          abc123: {priority: 10, max_agents: 4}
+          lr_0.01: {priority: 5}  # sweep names work too
+          old_sweep: {max_agents: 0}  # never launched
+
+    Which sweeps finished is kept in sweep_dir/queue_state.json, so a restarted queue
+    does not launch them again (use --reset to forget it).
+
+    Examples:
+        easysweeps queue --gpu-list 0-7
+        easysweeps queue --agents-per-gpu 2 --background
+        easysweeps queue --dry-run
+    """
+    import sys
+    from .hosts import parse_gpu_range
+    from .sweep_queue import SweepQueue
+
+    try:
+        if stop:
+            get_executor().stop([QUEUE_UNIT])
+            click.echo("Stopped sweep queue")
+            return
+
+        if background:
+            log_file = Path(config.get("agent_log_dir")) / "queue.log"
+            cmd = [sys.executable, '-m', 'easysweeps.cli', 'queue', '--max-failures', str(max_failures),
+                   '--interval', str(interval)]
+            for option, value in [('--gpu-list', gpu_list), ('--agents-per-gpu', agents_per_gpu),
+                                  ('--max-agents', max_agents), ('--ready-timeout', ready_timeout)]:
+                if value is not None:
+                    cmd += [option, str(value)]
+            if reset:
+                cmd.append('--reset')
+            executor = get_executor()
+            executor.reset_failed([QUEUE_UNIT])
+            with log_file.open("ab") as log:
+                executor.launch(QUEUE_UNIT, cmd, stdout=log)
+            click.echo(f"Started sweep queue ({QUEUE_UNIT}), logging to {log_file}")
+            return
+
+        try:
+            gpus = parse_gpu_range(gpu_list) if gpu_list else None
+        except ValueError:
+            raise click.ClickException("GPU list must be comma-separated integers or ranges (e.g., '0,1' or '0-3')")
+        if gpus is None:
+            from .gpus import query_gpus
+            gpus = [gpu.index for gpu in query_gpus()]
+        if not gpus:
+            raise click.ClickException("No GPUs available for the queue")
+
+        if agents_per_gpu is None:
+            agents_per_gpu = int(config.get("max_agents_per_gpu") or 1)
+        if max_agents is None:
+            max_agents = int(config.get("queue_max_agents", 1))
+        sweep_queue = SweepQueue(gpus, slots_per_gpu=agents_per_gpu, max_agents=max_agents,
+                                 max_failures=max_failures, ready_timeout=ready_timeout)
+        if reset:
+            sweep_queue.reset()
+
+        if dry_run:
+            sweep_queue.refresh()
+            plan = {entry.sweep_id: placement for entry, placement in sweep_queue.plan(get_executor().list_units())}
+            click.echo(f"{'Sweep':<30}{'Priority':>9}{'Cap':>5}  {'State':<9}Launch now")
+            click.echo("-" * 72)
+            for entry in sweep_queue.ordered():
+                placement = plan.get(entry.sweep_id)
+                launch_now = f"GPUs {','.join(map(str, placement))}" if placement else ""
+                click.echo(f"{f'{entry.name} ({entry.sweep_id})':<30}{entry.priority:>9g}{entry.max_agents:>5}  "
+                           f"{entry.state:<9}{launch_now}")
+            return
+
+        click.echo(f"Queue running on GPUs {','.join(map(str, gpus))} with {agents_per_gpu} agent slots per GPU")
+        sweep_queue.run(interval)
+        click.echo("All queued sweeps are done")
+
+    except KeyboardInterrupt:
+        click.echo("\nStopped the queue, its agents keep running")
+    except click.ClickException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to run the sweep queue: {e}")
+        raise click.ClickException(str(e))
+
+TELEMETRY_UNIT = "easysweeps-telemetry.scope"
+
+def get_telemetry_file():
+    """Open the telemetry file (default: agent_log_dir/telemetry.bin)"""
+    from .telemetry import TelemetryFile
+
+    path = config.get("telemetry_file") or Path(config.get("agent_log_dir")) / "telemetry.bin"
+    return TelemetryFile(Path(path), capacity=int(config.get("telemetry_capacity", 200000)))
+
+@cli.command()
+@click.option('--interval', type=float, default=10.0, show_default=True, help='Seconds between samples')
+@click.option('--count', type=int, help='Stop after this many samples (default: run until stopped)')
+@click.option('--background', is_flag=True, help=f'Run the sampler in the background as the {TELEMETRY_UNIT} unit')
+@click.option('--stop', is_flag=True, help='Stop the background sampler')
+def telemetry(interval, count, background, stop):
+    """Record CPU, memory and GPU usage of all running agents.
+
+    Every INTERVAL seconds, one sample per running agent is appended to a telemetry
+    file (agent_log_dir/telemetry.bin by default, see telemetry_file in
+    ez_config.yaml). Samples are fixed-width binary records in a ring buffer of
+    telemetry_capacity records (default 200000), so the file never grows. Use
+    `easysweeps report` to summarize the recorded data.
+
+    Examples:
+        easysweeps telemetry --background  # Start sampling every 10 seconds
+        easysweeps telemetry --stop
+        easysweeps telemetry --interval 1 --count 60  # Sample for a minute in the foreground
+    """
+    import sys
+    from .telemetry import record_samples
+
+    try:
+        if stop:
+            get_executor().stop([TELEMETRY_UNIT])
+            click.echo("Stopped telemetry sampler")
+            return
+
+        telemetry_file = get_telemetry_file()
+        if background:
+            log_file = Path(config.get("agent_log_dir")) / "telemetry.log"
+            cmd = [sys.executable, '-m', 'easysweeps.cli', 'telemetry', '--interval', str(interval)]
+            if count is not None:
+                cmd += ['--count', str(count)]
+            executor = get_executor()
+            executor.reset_failed([TELEMETRY_UNIT])
+            with log_file.open("ab") as log:
+                executor.launch(TELEMETRY_UNIT, cmd, stdout=log)
+            click.echo(f"Started telemetry sampler ({TELEMETRY_UNIT}), writing to {telemetry_file.path}")
+            return
+
+        click.echo(f"Recording agent telemetry every {interval:g}s to {telemetry_file.path}")
+        record_samples(telemetry_file, interval, count)
+
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        logger.error(f"Failed to record telemetry: {e}")
+        raise click.ClickException(str(e))
+
+@cli.command()
+@click.option('--since', type=float, help='Only use samples from the last SINCE hours')
+@click.option('--idle-gpu-util', type=float, default=5.0, show_default=True, help='GPU utilization (%) below which an agent counts as idle')
+@click.option('--idle-cpu', type=float, default=5.0, show_default=True, help='CPU usage (%) below which an agent counts as idle')
+def report(since, idle_gpu_util, idle_cpu):
+    """Summarize recorded telemetry: GPU-hours used and idle per sweep, and idle agents.
+
+    GPU time of a sample is split between the agents sharing the GPU at that moment,
+    and counted as used in proportion to the GPU utilization. Agents that were idle
+    (low GPU utilization and low CPU usage) in at least half of their samples are
+    listed, which usually means their sweep has no runs left or the agent is stuck.
+
+    Example:
+        easysweeps report --since 24
+    """
+    import time
+    from .telemetry import summarize
+
+    try:
+        telemetry_file = get_telemetry_file()
+        samples = telemetry_file.read(since=time.time() - since * 3600 if since else None)
+        if not samples:
+            click.echo("No telemetry recorded. Start the sampler with `easysweeps telemetry --background`.")
+            return
+
+        sweeps, idle_agents = summarize(samples, idle_gpu_util=idle_gpu_util, idle_cpu_percent=idle_cpu)
+        with open_registry() as registry:
+            names = registry.names()
+
+        span = (samples[-1].timestamp - samples[0].timestamp) / 3600
+        click.echo(f"=== GPU usage over {span:.1f}h ({len(samples)} samples) ===\n")
+        click.echo(f"{'Sweep':<30}{'Agents':>7}{'GPU-h':>9}{'Used-h':>9}{'Idle-h':>9}{'Idle %':>8}")
+        click.echo("-" * 72)
+        for sweep_id, info in sorted(sweeps.items(), key=lambda item: -item[1]['gpu_hours']):
+            idle_share = info['idle_hours'] / info['gpu_hours'] * 100 if info['gpu_hours'] else 0.0
+            label = f"{names.get(sweep_id, sweep_id)} ({sweep_id})"
+            click.echo(f"{label:<30}{len(info['agents']):>7}{info['gpu_hours']:>9.2f}"
+                       f"{info['used_hours']:>9.2f}{info['idle_hours']:>9.2f}{idle_share:>7.0f}%")
+
+        if idle_agents:
+            click.echo("\nIdle agents:")
+            click.echo("-" * 72)
+            for sweep_id, gpu, agent_idx, idle_hours, idle_share in idle_agents:
+                click.echo(click.style(
+                    f"  {names.get(sweep_id, sweep_id)} ({sweep_id}) GPU {gpu}, Agent {agent_idx}: "
+                    f"idle {idle_share * 100:.0f}% of samples ({idle_hours:.2f}h)", fg="yellow"))
+
+    except Exception as e:
+        logger.error(f"Failed to build report: {e}")
+        raise click.ClickException(str(e))
+
 if __name__ == '__main__':
     cli() 
\ No newline at end of file
@@ -1,30 +1,56 @@
+import json
 import os
 from pathlib import Path
 import yaml
 import subprocess
 import shutil
+from .trace import span
+
+# Where results of expensive environment detection are cached between invocations
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME", "~/.cache")).expanduser() / "easysweeps"
 
 class Config:
-    """Configuration manager for wandb sweep automation"""
-    
+    """Configuration manager for wandb sweep automation
+
+    Nothing is read or detected until the first call to `get`: the config file is
+    loaded on first use, and defaults that are expensive to compute (such as the conda
+    path) are only detected when they are requested and not set in the config file.
+    """
+
     def __init__(self, config_file: Path = None):
         self.config_file = config_file or Path("ez_config.yaml")
+        self._config = None
+        self._detected = {}
         self.defaults = {
             "sweep_dir": "sweeps",
             "agent_log_dir": "agent_logs",
             "conda_env": "wandb_sweeps",
             "entity": "yaniv_team",
-            "project": self._detect_project_name(),
-            "conda_path": self._detect_conda_path(),
+            "sweep_backend": "subprocess",
         }
-        self.config = self._load_config()
+        # Defaults that are only computed when needed
+        self.lazy_defaults = {
+            "project": self._detect_project_name,
+            "conda_path": self._detect_conda_path,
+        }
+
+    @property
+    def config(self) -> dict:
+        if self._config is None:
+            self._config = self._load_config()
+        return self._config
 
     def _detect_project_name(self) -> str:
         """Detect the project name from the current directory"""
         return Path.cwd().name
 
     def _detect_conda_path(self) -> str:
-        """Detect the conda.sh path by checking common locations"""
+        """Detect the conda.sh path by checking common locations
+
+        The result of asking conda for its base directory is cached in
+        ~/.cache/easysweeps/conda.json and reused as long as the conda executable has
+        not changed (same path and mtime) and the detected conda.sh still exists.
+        """
         # Common conda installation paths
         common_paths = [
             "~/anaconda3/etc/profile.d/conda.sh",
@@ -34,9 +60,13 @@ class Config:
             "/opt/miniconda3/etc/profile.d/conda.sh",
             "/opt/miniforge3/etc/profile.d/conda.sh",
         ]
-        
+
         # Check if conda is in PATH
-        if shutil.which("conda"):
+        conda = shutil.which("conda")
+        if conda:
+            conda_sh = self._cached_conda_sh(conda)
+            if conda_sh:
+                return conda_sh
             try:
                 # Get conda installation path
                 conda_path = subprocess.check_output(
@@ -45,6 +75,7 @@ class Config:
                 ).strip()
                 conda_sh = Path(conda_path) / "etc/profile.d/conda.sh"
                 if conda_sh.exists():
+                    self._cache_conda_sh(conda, str(conda_sh))
                     return str(conda_sh)
             except:
                 pass
@@ -58,12 +89,35 @@ class Config:
         # If not found, return default
         return "~/anaconda3/etc/profile.d/conda.sh"
 
+    def _cached_conda_sh(self, conda: str):
+        """Return the cached conda.sh path for a conda executable, or None if stale"""
+        try:
+            with open(CACHE_DIR / "conda.json") as f:
+                cached = json.load(f)
+            if (cached["conda"] == conda and cached["mtime"] == os.stat(conda).st_mtime_ns
+                    and Path(cached["conda_sh"]).exists()):
+                return cached["conda_sh"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _cache_conda_sh(self, conda: str, conda_sh: str):
+        try:
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_DIR / f"conda.json.{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump({"conda": conda, "mtime": os.stat(conda).st_mtime_ns, "conda_sh": conda_sh}, f)
+            os.replace(tmp, CACHE_DIR / "conda.json")
+        except OSError:
+            pass
+
     def _load_config(self) -> dict:
         """Load configuration from file or use defaults"""
-        if self.config_file.exists():
-            with open(self.config_file) as f:
-                return {**self.defaults, **yaml.safe_load(f)}
-        return self.defaults.copy()
+        with span("config.load", file=str(self.config_file)):
+            if self.config_file.exists():
+                with open(self.config_file) as f:
+                    return {**self.defaults, **(yaml.safe_load(f) or {})}
+            return self.defaults.copy()
 
     def get(self, key: str, default=None):
         """Get configuration value, with environment variable override"""
@@ -71,14 +125,23 @@ class Config:
         env_key = f"WANDB_SWEEP_{key.upper()}"
         if env_key in os.environ:
             return os.environ[env_key]
-        
+
         # Then check config file
-        return self.config.get(key, default)
+        if key in self.config:
+            return self.config[key]
+
+        # Finally detect the value if it has a lazy default
+        if key in self.lazy_defaults:
+            if key not in self._detected:
+                with span(f"config.detect_{key}"):
+                    self._detected[key] = self.lazy_defaults[key]()
+            return self._detected[key]
+        return default
 
     def save(self):
         """Save current configuration to file"""
         with open(self.config_file, 'w') as f:
             yaml.dump(self.config, f)
 
-# Create global config instance
-config = Config() 
\ No newline at end of file
+# Create global config instance (loaded lazily on first use)
+config = Config()
@@ -0,0 +1,329 @@
+import hashlib
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from pathlib import Path
+from .config import config
+from .registry import open_registry
+from .executors import get_executor
+from .logs import LogRotator
+
+logger = logging.getLogger(__name__)
+
+DAEMON_UNIT = "easysweeps-daemon.scope"
+
+class DaemonError(RuntimeError):
+    """An RPC failed inside the daemon"""
+
+def socket_path() -> Path:
+    """Path of the daemon socket (default: one socket per project directory in XDG_RUNTIME_DIR)"""
+    path = config.get("daemon_socket")
+    if path:
+        return Path(path).expanduser()
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    key = hashlib.sha1(str(Path.cwd().resolve()).encode()).hexdigest()[:12]
+    return Path(runtime_dir) / f"easysweeps-{os.getuid()}-{key}.sock"
+
+class DaemonClient:
+    """Call the daemon over its Unix socket. Requests and responses are JSON lines."""
+
+    def __init__(self, path: Path = None):
+        self.path = Path(path or socket_path())
+
+    def call(self, method: str, timeout: float = 30.0, **params):
+        """Run an RPC and return its result.
+
+        Raises:
+            OSError: If the daemon cannot be reached
+            DaemonError: If the RPC failed in the daemon
+        """
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(self.path))
+            sock.sendall((json.dumps({"method": method, "params": params}) + "\n").encode())
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise ConnectionError("daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "unknown error"))
+        return response.get("result")
+
+def connect(path: Path = None):
+    """Return a DaemonClient if a daemon answers on the socket, or None to use direct mode.
+
+    Set `use_daemon: false` in ez_config.yaml (or WANDB_SWEEP_USE_DAEMON=0) to always
+    use direct mode.
+    """
+    if str(config.get("use_daemon", True)).lower() in ("0", "false", "no"):
+        return None
+    client = DaemonClient(path)
+    if not client.path.exists():
+        return None
+    try:
+        client.call("ping", timeout=2.0)
+    except (OSError, ValueError, DaemonError) as e:
+        logger.debug(f"No daemon on {client.path}: {e}")
+        return None
+    return client
+
+class Supervised:
+    """An agent the daemon launched and restarts when it crashes"""
+
+    def __init__(self, sweep_id, gpu, agent, unit, process=None):
+        self.sweep_id = sweep_id
+        self.gpu = gpu
+        self.agent = agent
+        self.unit = unit
+        self.process = process
+        self.started = time.monotonic()
+        self.failures = 0
+        self.restart_at = None
+
+class AgentSupervisor:
+    """In-memory registry and agent inventory, with crash restarts.
+
+    The inventory of agent units is refreshed every poll. An agent launched through the
+    daemon is supervised: when its process exits with a non-zero status (or, for agents
+    whose process is not a child of the daemon, when its unit is reported as failed), it
+    is restarted after an exponential backoff of daemon_restart_backoff seconds (default
+    5), doubling per consecutive crash up to daemon_restart_max_backoff (default 300).
+    An agent that ran for daemon_stable_after seconds (default 300) before crashing
+    starts over at the base backoff, and one that crashed daemon_max_restarts times in a
+    row (default 10) is given up on. An exit status of 0 means the sweep is finished and
+    the agent is not restarted. Agents stopped through `kill` are no longer supervised.
+    """
+
+    def __init__(self):
+        self.registry = open_registry()
+        self.executor = get_executor()
+        self.units = {}
+        self.supervised = {}  # unit -> Supervised
+        self.monitor = None
+        self._lock = threading.RLock()
+        self.backoff = float(config.get("daemon_restart_backoff", 5))
+        self.max_backoff = float(config.get("daemon_restart_max_backoff", 300))
+        self.stable_after = float(config.get("daemon_stable_after", 300))
+        self.max_restarts = int(config.get("daemon_max_restarts", 10))
+
+    def refresh(self):
+        units = self.executor.list_units()
+        with self._lock:
+            self.units = {unit.unit: unit for unit in units}
+
+    def poll(self):
+        """Refresh the inventory, detect crashed agents and restart those that are due"""
+        self.refresh()
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for unit, agent in list(self.supervised.items()):
+                if agent.restart_at is None:
+                    crashed = self._crashed(agent)
+                    if crashed is None:
+                        continue
+                    if not crashed:
+                        logger.info(f"Agent {unit} finished")
+                        del self.supervised[unit]
+                        continue
+                    if now - agent.started >= self.stable_after:
+                        agent.failures = 0
+                    agent.failures += 1
+                    if agent.failures > self.max_restarts:
+                        logger.error(f"Agent {unit} crashed {agent.failures - 1} times in a row, giving up")
+                        del self.supervised[unit]
+                        continue
+                    delay = min(self.backoff * 2 ** (agent.failures - 1), self.max_backoff)
+                    agent.restart_at = now + delay
+                    logger.warning(f"Agent {unit} crashed, restarting in {delay:.0f}s")
+                if agent.restart_at <= now:
+                    due.append(self.supervised.pop(unit))
+        for agent in due:
+            self._restart(agent)
+
+    def _crashed(self, agent):
+        """True if the agent crashed, False if it finished, None if it is still running"""
+        if agent.process is not None:
+            returncode = agent.process.poll()
+            if returncode is None:
+                return None
+            return returncode != 0
+        unit = self.units.get(agent.unit)
+        if unit is None:
+            return False
+        if unit.active == "failed":
+            return True
+        return None
+
+    def _restart(self, agent):
+        from .launch_agents import launch_agents, agent_args
+
+        self.executor.reset_failed([agent.unit])
+        try:
+            launches = launch_agents(agent_args(agent.sweep_id, placement=[agent.gpu]))
+        except Exception as e:
+            launches = []
+            logger.error(f"Failed to restart agent {agent.unit}: {e}")
+        launch = launches[0] if launches else None
+        with self._lock:
+            if launch is not None and launch.ready:
+                logger.info(f"Restarted agent {agent.unit} as {launch.unit}")
+                restarted = Supervised(agent.sweep_id, launch.gpu, launch.agent, launch.unit, launch.process)
+                restarted.failures = agent.failures
+                self.supervised[launch.unit] = restarted
+            elif agent.failures < self.max_restarts:
+                # Try again after the next backoff
+                agent.failures += 1
+                agent.restart_at = time.monotonic() + min(self.backoff * 2 ** (agent.failures - 1), self.max_backoff)
+                self.supervised[agent.unit] = agent
+            else:
+                logger.error(f"Agent {agent.unit} could not be restarted {agent.failures} times in a row, giving up")
+        self.refresh()
+
+    def status(self, usage: bool = False) -> dict:
+        from .monitor import collect_status
+
+        monitor = None
+        if usage:
+            from .monitor import AgentMonitor
+            self.monitor = self.monitor or AgentMonitor(self.executor)
+            monitor = self.monitor
+        with self._lock:
+            units = sorted(self.units.values(), key=lambda u: (u.sweep_id, u.gpu, u.agent))
+        active_sweeps = collect_status(self.registry, monitor, units=units)
+        with self._lock:
+            for info in active_sweeps.values():
+                for agent_info in info['agents']:
+                    agent_info['supervised'] = agent_info['unit'] in self.supervised
+        return active_sweeps
+
+    def launch(self, sweep_id, gpu_list=None, agents_per_sweep=1, force_recopy=False, ready_timeout=None,
+               placement=None) -> list:
+        from .launch_agents import launch_agents, agent_args
+
+        launches = launch_agents(agent_args(sweep_id, gpu_list, agents_per_sweep, force_recopy,
+                                            ready_timeout, placement))
+        with self._lock:
+            for launch in launches:
+                if launch.ready:
+                    self.supervised[launch.unit] = Supervised(sweep_id, launch.gpu, launch.agent,
+                                                              launch.unit, launch.process)
+        self.refresh()
+        return [
+            {'unit': launch.unit, 'gpu': launch.gpu, 'agent': launch.agent, 'ready': launch.ready,
+             'latency': launch.latency, 'error': launch.error}
+            for launch in launches
+        ]
+
+    def kill(self, sweep=None, gpu=None, all_agents=False, stop=True) -> list:
+        """Stop supervising the matching agents and, unless stop is False, stop them.
+
+        Returns:
+            Names of the matching units
+        """
+        self.refresh()
+        with self._lock:
+            matching = [
+                unit for unit in self.units.values()
+                if all_agents or ((not sweep or unit.sweep_id == sweep) and (gpu is None or unit.gpu == gpu))
+            ]
+            # Forget the agents first so they are not restarted once they exit
+            for unit in matching:
+                self.supervised.pop(unit.unit, None)
+            if all_agents:
+                self.supervised.clear()
+            elif sweep or gpu is not None:
+                for unit, agent in list(self.supervised.items()):
+                    if (not sweep or agent.sweep_id == sweep) and (gpu is None or agent.gpu == gpu):
+                        del self.supervised[unit]
+        if stop:
+            self.executor.stop(matching)
+            self.refresh()
+        return [unit.unit for unit in matching]
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                result = self.server.dispatch(request["method"], request.get("params") or {})
+                response = {"ok": True, "result": result}
+            except Exception as e:
+                logger.debug(f"RPC failed: {e}")
+                response = {"ok": False, "error": getattr(e, "message", None) or str(e)}
+            self.wfile.write((json.dumps(response, default=str) + "\n").encode())
+            self.wfile.flush()
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Serve the supervisor over a Unix socket, one thread per connection"""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, supervisor: AgentSupervisor):
+        self.supervisor = supervisor
+        self.started = time.time()
+        super().__init__(str(path), _Handler)
+        os.chmod(path, 0o600)
+
+    def dispatch(self, method: str, params: dict):
+        if method == "ping":
+            return {"pid": os.getpid(), "uptime": time.time() - self.started}
+        if method == "status":
+            return self.supervisor.status(usage=params.get("usage", False))
+        if method == "agent":
+            return self.supervisor.launch(**params)
+        if method == "kill":
+            return self.supervisor.kill(**params)
+        if method == "shutdown":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return True
+        raise ValueError(f"Unknown method '{method}'")
+
+def serve(path: Path = None, poll_interval: float = 2.0):
+    """Run the daemon in the foreground until it is stopped with `shutdown`, SIGTERM or Ctrl-C"""
+    path = Path(path or socket_path())
+    if path.exists():
+        try:
+            DaemonClient(path).call("ping", timeout=2.0)
+        except (OSError, ValueError, DaemonError):
+            path.unlink()  # Stale socket of a daemon that did not exit cleanly
+        else:
+            raise RuntimeError(f"A daemon is already running on {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    supervisor = AgentSupervisor()
+    supervisor.refresh()
+    server = DaemonServer(path, supervisor)
+    stop = threading.Event()
+
+    rotator = LogRotator()
+
+    def poll_loop():
+        while not stop.wait(poll_interval):
+            try:
+                supervisor.poll()
+                rotator.poll()
+            except Exception as e:
+                logger.error(f"Supervisor poll failed: {e}")
+
+    poller = threading.Thread(target=poll_loop, name="supervisor", daemon=True)
+    poller.start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    logger.info(f"Daemon listening on {path}")
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        supervisor.registry.close()
+        try:
+            path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,72 @@
+import logging
+import os
+import signal
+import time
+from .units import AgentUnit
+
+logger = logging.getLogger(__name__)
+
+# `wandb agent` stops taking new runs on the first SIGINT and exits once its current run ends
+DRAIN_SIGNAL = signal.SIGINT
+
+def drain_units(executor, units, timeout: float = 3600, interval: float = 1.0, progress=None):
+    """Stop agents gracefully, letting them finish their current runs.
+
+    All agents are signalled at once: only the `wandb agent` process of each unit gets
+    SIGINT, so it stops taking new runs while the run in progress keeps going. The
+    units are then polled together until every agent has exited or `timeout` seconds
+    have passed, and the agents still running at that point are stopped outright.
+    Units whose agent process cannot be found are stopped right away.
+
+    Args:
+        executor: Executor the units run on
+        units: AgentUnit records or unit names
+        timeout: Seconds to wait before stopping the remaining agents
+        interval: Seconds between polls
+        progress: Optional callback called as progress(remaining, total, elapsed) after every poll
+
+    Returns:
+        Tuple (drained, stopped): names of units whose agent exited on its own, and of
+        units that had to be stopped
+    """
+    names = [u.unit if isinstance(u, AgentUnit) else u for u in units]
+    if not names:
+        return [], []
+
+    main_pids = executor.main_pids(names)
+    stopped = []
+    pending = []
+    for unit in names:
+        pid = main_pids.get(unit)
+        try:
+            if pid is None:
+                raise ProcessLookupError
+            os.kill(pid, DRAIN_SIGNAL)
+            pending.append(unit)
+        except ProcessLookupError:
+            logger.warning(f"No agent process found for {unit}, stopping it")
+            stopped.append(unit)
+        except PermissionError as e:
+            logger.warning(f"Cannot signal the agent of {unit} ({e}), stopping it")
+            stopped.append(unit)
+    if stopped:
+        executor.stop(stopped)
+
+    drained = []
+    start = time.monotonic()
+    while pending:
+        active = executor.units_active(pending)
+        drained += [unit for unit in pending if not active.get(unit)]
+        pending = [unit for unit in pending if active.get(unit)]
+        elapsed = time.monotonic() - start
+        if progress is not None:
+            progress(len(pending), len(names), elapsed)
+        if not pending:
+            break
+        if elapsed >= timeout:
+            logger.warning(f"{len(pending)} agents still running after {timeout:.0f}s, stopping them")
+            executor.stop(pending)
+            stopped += pending
+            break
+        time.sleep(interval)
+    return drained, stopped
@@ -0,0 +1,316 @@
+import json
+import logging
+import os
+import signal
+import subprocess
+import time
+from pathlib import Path
+from .config import config, CACHE_DIR
+from .units import (AgentUnit, UNIT_PREFIX, UNIT_SUFFIX, parse_unit_name, list_agent_units,
+                    stop_units, reset_failed_units)
+
+logger = logging.getLogger(__name__)
+
+# Environment variable that tags the processes of an agent with its unit name
+UNIT_ENV = "EASYSWEEPS_UNIT"
+
+class Executor:
+    """Interface for running agents (and other long-running easysweeps processes) as named units.
+
+    A unit name identifies one launched command, e.g. `wandb-agent-{sweep_id}-{gpu}-{agent}.scope`
+    for agents. Agent units are listed as AgentUnit records.
+    """
+
+    name = None
+
+    def launch(self, unit: str, command: list, stdout=None) -> subprocess.Popen:
+        """Start command as the given unit.
+
+        Args:
+            unit: Unit name
+            command: Command to run
+            stdout: File object that receives stdout and stderr (default: discarded)
+
+        Returns:
+            The started process
+        """
+        raise NotImplementedError
+
+    def list_units(self, sweep_id: str = None, gpu: int = None) -> list:
+        """List agent units, sorted by (sweep_id, gpu, agent), optionally only of one sweep and/or GPU"""
+        raise NotImplementedError
+
+    def stop(self, units) -> int:
+        """Stop units (AgentUnit records or unit names). Returns the number of units requested to stop."""
+        raise NotImplementedError
+
+    def stop_all(self):
+        """Stop every agent unit"""
+        self.stop(self.list_units())
+
+    def units_active(self, units) -> dict:
+        """Return a mapping of unit name to whether the unit is running"""
+        raise NotImplementedError
+
+    def reset_failed(self, units):
+        """Forget units that failed so their names can be used again"""
+
+    def locate(self, units) -> dict:
+        """Return a mapping of unit name to a handle for `pids`. Handles can be cached while a unit runs."""
+        raise NotImplementedError
+
+    def pids(self, handles: dict) -> dict:
+        """Return a mapping of unit name to the PIDs of its processes, given handles from `locate`"""
+        raise NotImplementedError
+
+    def main_pids(self, units) -> dict:
+        """Return a mapping of unit name to the PID of its top process (for agents, `wandb agent` itself)"""
+        import psutil
+
+        names = [u.unit if isinstance(u, AgentUnit) else u for u in units]
+        main = {}
+        for unit, pids in self.pids(self.locate(names)).items():
+            in_unit = set(pids)
+            roots = []
+            for pid in pids:
+                try:
+                    if psutil.Process(pid).ppid() not in in_unit:
+                        roots.append(pid)
+                except psutil.Error:
+                    continue
+            if roots:
+                main[unit] = min(roots)
+        return main
+
+class SystemdExecutor(Executor):
+    """Run each unit as a transient systemd user scope (`systemd-run --user --scope`)"""
+
+    name = "systemd"
+
+    def launch(self, unit: str, command: list, stdout=None) -> subprocess.Popen:
+        return subprocess.Popen(
+            ['systemd-run', '--user', '--scope', f'--unit={unit}', *command],
+            stdout=stdout or subprocess.DEVNULL, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+        )
+
+    def list_units(self, sweep_id: str = None, gpu: int = None) -> list:
+        return list_agent_units(sweep_id=sweep_id, gpu=gpu)
+
+    def stop(self, units) -> int:
+        return stop_units(units)
+
+    def stop_all(self):
+        # A single glob also catches units that are not listed yet
+        subprocess.run(['systemctl', '--user', '--no-pager', 'stop', f'{UNIT_PREFIX}*{UNIT_SUFFIX}'])
+
+    def units_active(self, units) -> dict:
+        units = list(units)
+        if not units:
+            return {}
+        result = subprocess.run(
+            ['systemctl', '--user', 'is-active', *units],
+            capture_output=True, text=True
+        )
+        states = result.stdout.split()
+        return {unit: state == "active" for unit, state in zip(units, states)}
+
+    def reset_failed(self, units):
+        reset_failed_units(units)
+
+    def locate(self, units) -> dict:
+        from .monitor import query_control_groups
+        return query_control_groups(units)
+
+    def pids(self, handles: dict) -> dict:
+        from .monitor import read_cgroup_pids
+        return {unit: read_cgroup_pids(control_group) for unit, control_group in handles.items()}
+
+class ProcessExecutor(Executor):
+    """Run each unit as a plain process group, without systemd.
+
+    Every unit is started in a new session, so it leads its own process group, and is
+    recorded in a JSON state file (pid, process group and start time) in
+    process_state_dir (default ~/.cache/easysweeps/units). The start time guards
+    against PID reuse. Stopping a unit sends SIGTERM to the whole process group and
+    SIGKILL to groups still alive after process_stop_timeout seconds (default 10).
+    Processes of a unit are found by scanning /proc for its process group.
+    """
+
+    name = "process"
+
+    def __init__(self, state_dir: Path = None, stop_timeout: float = None):
+        self.state_dir = Path(state_dir or config.get("process_state_dir") or CACHE_DIR / "units").expanduser()
+        self.stop_timeout = float(stop_timeout if stop_timeout is not None else config.get("process_stop_timeout", 10))
+
+    def _state_file(self, unit: str) -> Path:
+        return self.state_dir / f"{unit}.json"
+
+    def _read_state(self, unit: str):
+        try:
+            with open(self._state_file(unit)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _alive(self, state) -> bool:
+        import psutil
+        try:
+            proc = psutil.Process(state["pid"])
+            return abs(proc.create_time() - state["started"]) < 1.0 and proc.status() != psutil.STATUS_ZOMBIE
+        except (psutil.Error, KeyError, TypeError):
+            return False
+
+    def _forget(self, unit: str):
+        try:
+            self._state_file(unit).unlink()
+        except OSError:
+            pass
+
+    def launch(self, unit: str, command: list, stdout=None) -> subprocess.Popen:
+        import psutil
+
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        state = self._read_state(unit)
+        if state is not None and self._alive(state):
+            raise RuntimeError(f"Unit {unit} is already running")
+        process = subprocess.Popen(
+            command, stdout=stdout or subprocess.DEVNULL, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True, env={**os.environ, UNIT_ENV: unit},
+        )
+        try:
+            started = psutil.Process(process.pid).create_time()
+        except psutil.Error:
+            started = time.time()
+        tmp = self.state_dir / f".{unit}.{os.getpid()}"
+        with open(tmp, "w") as f:
+            json.dump({"unit": unit, "pid": process.pid, "pgid": process.pid, "started": started}, f)
+        os.replace(tmp, self._state_file(unit))
+        return process
+
+    def _states(self) -> dict:
+        states = {}
+        if not self.state_dir.is_dir():
+            return states
+        for path in self.state_dir.glob("*.json"):
+            state = self._read_state(path.name[:-len(".json")])
+            if state is None:
+                continue
+            if self._alive(state):
+                states[state["unit"]] = state
+            else:
+                # The process is gone; like a finished scope the unit disappears
+                self._forget(state["unit"])
+        return states
+
+    def list_units(self, sweep_id: str = None, gpu: int = None) -> list:
+        units = []
+        for unit in self._states():
+            parsed = parse_unit_name(unit)
+            if parsed is None:
+                continue
+            units.append(AgentUnit(unit, *parsed, "active", "running"))
+        if sweep_id is not None:
+            units = [u for u in units if u.sweep_id == sweep_id]
+        if gpu is not None:
+            units = [u for u in units if u.gpu == int(gpu)]
+        return sorted(units, key=lambda u: (u.sweep_id, u.gpu, u.agent))
+
+    def _signal(self, pgid: int, sig) -> bool:
+        try:
+            os.killpg(pgid, sig)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError as e:
+            logger.warning(f"Cannot signal process group {pgid}: {e}")
+            return False
+
+    def stop(self, units) -> int:
+        names = [u.unit if isinstance(u, AgentUnit) else u for u in units]
+        pending = {}
+        for unit in names:
+            state = self._read_state(unit)
+            if state is not None and self._alive(state) and self._signal(state["pgid"], signal.SIGTERM):
+                pending[unit] = state
+            else:
+                self._forget(unit)
+
+        deadline = time.monotonic() + self.stop_timeout
+        while pending and time.monotonic() < deadline:
+            time.sleep(0.1)
+            pending = {unit: state for unit, state in pending.items() if self._group_alive(state["pgid"])}
+        for unit, state in pending.items():
+            logger.warning(f"Unit {unit} did not stop after {self.stop_timeout:.0f}s, killing it")
+            self._signal(state["pgid"], signal.SIGKILL)
+        for unit in names:
+            self._forget(unit)
+        return len(names)
+
+    def _group_alive(self, pgid: int) -> bool:
+        try:
+            os.killpg(pgid, 0)
+            return True
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+
+    def units_active(self, units) -> dict:
+        active = {}
+        for unit in units:
+            state = self._read_state(unit)
+            active[unit] = state is not None and self._alive(state)
+        return active
+
+    def reset_failed(self, units):
+        for unit in units:
+            state = self._read_state(unit.unit if isinstance(unit, AgentUnit) else unit)
+            if state is not None and not self._alive(state):
+                self._forget(state["unit"])
+
+    def locate(self, units) -> dict:
+        handles = {}
+        for unit in units:
+            state = self._read_state(unit)
+            if state is not None:
+                handles[unit] = state["pgid"]
+        return handles
+
+    def main_pids(self, units) -> dict:
+        main = {}
+        for unit in units:
+            state = self._read_state(unit.unit if isinstance(unit, AgentUnit) else unit)
+            if state is not None and self._alive(state):
+                main[state["unit"]] = state["pid"]
+        return main
+
+    def pids(self, handles: dict) -> dict:
+        # One pass over /proc for all units
+        units_by_group = {pgid: unit for unit, pgid in handles.items()}
+        pids = {unit: [] for unit in handles}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # Fields after the parenthesized command name: state, ppid, pgrp, ...
+            fields = stat[stat.rfind(")") + 2:].split()
+            unit = units_by_group.get(int(fields[2]))
+            if unit is not None:
+                pids[unit].append(int(entry))
+        return pids
+
+EXECUTORS = {
+    SystemdExecutor.name: SystemdExecutor,
+    ProcessExecutor.name: ProcessExecutor,
+}
+
+def get_executor(name: str = None) -> Executor:
+    """Create the executor with the given name (default: `executor` from ez_config.yaml, systemd)"""
+    name = name or config.get("executor", SystemdExecutor.name)
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor '{name}', expected one of: {', '.join(EXECUTORS)}")
+    return EXECUTORS[name]()
@@ -0,0 +1,85 @@
+import logging
+import subprocess
+from collections import Counter, namedtuple
+
+logger = logging.getLogger(__name__)
+
+GpuInfo = namedtuple("GpuInfo", ["index", "memory_total", "memory_free", "utilization"])
+
+QUERY_FIELDS = "index,memory.total,memory.free,utilization.gpu"
+
+def parse_gpu_query(output: str) -> list:
+    """Parse `nvidia-smi --query-gpu=index,memory.total,memory.free,utilization.gpu
+    --format=csv,noheader,nounits` output into GpuInfo records (memory in MiB, utilization in %)"""
+    gpus = []
+    for line in output.splitlines():
+        parts = [part.strip() for part in line.split(",")]
+        if len(parts) != 4:
+            continue
+        try:
+            index, total, free = int(parts[0]), float(parts[1]), float(parts[2])
+        except ValueError:
+            logger.warning(f"Invalid nvidia-smi line: {line.strip()}")
+            continue
+        try:
+            utilization = float(parts[3])
+        except ValueError:
+            utilization = 0.0  # "[N/A]" on some devices
+        gpus.append(GpuInfo(index, total, free, utilization))
+    return gpus
+
+def query_gpus() -> list:
+    """Query free memory and utilization of all GPUs with a single nvidia-smi call"""
+    try:
+        out = subprocess.check_output(
+            ["nvidia-smi", f"--query-gpu={QUERY_FIELDS}", "--format=csv,noheader,nounits"],
+            text=True
+        )
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise RuntimeError(f"Failed to query GPUs with nvidia-smi: {e}")
+    return parse_gpu_query(out)
+
+def plan_placement(num_agents: int, gpus: list, running_units: list = (), agent_memory_mb: float = 0,
+                   max_agents_per_gpu: int = None, max_utilization: float = None) -> list:
+    """Decide on which GPUs to place new agents.
+
+    Each GPU can take as many new agents as its free memory allows given the per-agent
+    memory estimate, limited by max_agents_per_gpu counting the agents already running
+    there. Agents are assigned one at a time to the GPU with the fewest agents that
+    still has room.
+
+    Args:
+        num_agents: Number of agents to place
+        gpus: GpuInfo records of the candidate GPUs
+        running_units: AgentUnit records of agents already running
+        agent_memory_mb: Estimated GPU memory used by one agent (0 disables the memory check)
+        max_agents_per_gpu: Maximum number of agents on one GPU, including running ones
+        max_utilization: Skip GPUs whose utilization (%) is above this value
+
+    Returns:
+        List of GPU indices, one per placed agent. It is shorter than num_agents when
+        the GPUs are full.
+    """
+    running = Counter(unit.gpu for unit in running_units if unit.running)
+    capacity = {}
+    for gpu in gpus:
+        if max_utilization is not None and gpu.utilization > max_utilization:
+            logger.debug(f"Skipping GPU {gpu.index}: utilization {gpu.utilization:.0f}%")
+            continue
+        room = int(gpu.memory_free // agent_memory_mb) if agent_memory_mb else num_agents
+        if max_agents_per_gpu is not None:
+            room = min(room, max_agents_per_gpu - running[gpu.index])
+        if room > 0:
+            capacity[gpu.index] = room
+
+    load = {index: running[index] for index in capacity}
+    placement = []
+    for _ in range(num_agents):
+        candidates = [index for index in capacity if capacity[index] > 0]
+        if not candidates:
+            break
+        index = min(candidates, key=lambda i: (load[i], i))
+        placement.append(index)
+        capacity[index] -= 1
+        load[index] += 1
+    return placement
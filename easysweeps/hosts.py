@@ -0,0 +1,244 @@
+import json
+import logging
+import os
+import shlex
+import subprocess
+import sys
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from .config import config, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Host names that always mean the machine the CLI runs on
+LOCAL_HOSTS = ("local", "localhost")
+
+# Environment of easysweeps commands run on a host: an empty host list keeps a shared
+# ez_config.yaml with `hosts` from making the host fan out to all hosts again
+REMOTE_ENV = {"WANDB_SWEEP_HOSTS": ""}
+
+HostSpec = namedtuple("HostSpec", ["host", "gpus"])
+
+def parse_gpu_range(text: str) -> list:
+    """Parse a GPU list such as `0,1`, `0-3` or `0-1,4` into a list of indices"""
+    gpus = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            gpus.extend(range(int(first), int(last) + 1))
+        else:
+            gpus.append(int(part))
+    return gpus
+
+def parse_hosts(values) -> list:
+    """Parse host specs such as `node1:0,1 node2:0-3 node3` into HostSpec records.
+
+    Every value may hold several whitespace-separated specs. A host without GPUs has
+    gpus=None.
+
+    Raises:
+        ValueError: If a GPU list is not valid
+    """
+    if isinstance(values, str):
+        values = [values]
+    specs = []
+    for value in values:
+        for item in value.split():
+            host, _, gpus = item.partition(":")
+            try:
+                specs.append(HostSpec(host, parse_gpu_range(gpus) if gpus else None))
+            except ValueError:
+                raise ValueError(f"Invalid GPU list in host spec '{item}', expected e.g. node1:0,1 or node2:0-3")
+    return specs
+
+def configured_hosts() -> list:
+    """Hosts from the `hosts` setting of ez_config.yaml (a list or a space-separated string)"""
+    return parse_hosts(config.get("hosts") or [])
+
+class Transport:
+    """Interface for running commands on a host.
+
+    easysweeps runs its own CLI on every host, in the project directory (the current
+    directory by default, see remote_dir in ez_config.yaml), so the project and the
+    sweep registry must be available there, e.g. on a shared filesystem.
+    """
+
+    name = None
+
+    def __init__(self, host: str):
+        self.host = host
+        self.workdir = config.get("remote_dir") or str(Path.cwd())
+
+    def run(self, argv: list, input: str = None, timeout: float = None, env: dict = None) -> subprocess.CompletedProcess:
+        """Run a command on the host in the project directory and capture its output as text.
+
+        Args:
+            argv: Command to run
+            input: Text passed to the command on stdin
+            timeout: Seconds after which the command is abandoned
+            env: Extra environment variables for the command
+        """
+        raise NotImplementedError
+
+    def easysweeps_command(self) -> list:
+        return shlex.split(config.get("remote_command", "easysweeps"))
+
+    def easysweeps(self, *args, input: str = None, timeout: float = None) -> subprocess.CompletedProcess:
+        """Run an easysweeps command on the host"""
+        return self.run([*self.easysweeps_command(), *args], input=input, timeout=timeout, env=REMOTE_ENV)
+
+class LocalTransport(Transport):
+    """Run commands on this machine.
+
+    Used for `localhost`, and as a stand-in for real hosts in tests (host_transport:
+    local). Stand-in hosts get their own process_state_dir, so with `executor:
+    process` each of them keeps a separate agent inventory.
+    """
+
+    name = "local"
+
+    def easysweeps_command(self) -> list:
+        return [sys.executable, "-m", "easysweeps.cli"]
+
+    def run(self, argv: list, input: str = None, timeout: float = None, env: dict = None) -> subprocess.CompletedProcess:
+        env = {**os.environ, **(env or {})}
+        if self.host not in LOCAL_HOSTS:
+            state_dir = Path(config.get("process_state_dir") or CACHE_DIR / "units").expanduser()
+            env["WANDB_SWEEP_PROCESS_STATE_DIR"] = str(state_dir / "hosts" / self.host)
+        return subprocess.run(argv, cwd=self.workdir, env=env, input=input, timeout=timeout,
+                              capture_output=True, text=True)
+
+class SshTransport(Transport):
+    """Run commands over SSH, reusing one master connection per host.
+
+    The first command opens an OpenSSH ControlMaster connection that later commands
+    (including those of later easysweeps invocations) share, so only the first one pays
+    for the handshake. The master stays up for ssh_control_persist (default 10m) after
+    its last use. Extra ssh options can be given in ssh_options.
+    """
+
+    name = "ssh"
+
+    def ssh_command(self) -> list:
+        control_dir = CACHE_DIR / "ssh"
+        control_dir.mkdir(parents=True, exist_ok=True, mode=0o700)
+        return [
+            "ssh", "-o", "BatchMode=yes",
+            "-o", "ControlMaster=auto",
+            "-o", f"ControlPath={control_dir}/%C",
+            "-o", f"ControlPersist={config.get('ssh_control_persist', '10m')}",
+            *shlex.split(config.get("ssh_options", "")),
+            self.host,
+        ]
+
+    def run(self, argv: list, input: str = None, timeout: float = None, env: dict = None) -> subprocess.CompletedProcess:
+        assignments = [f"{key}={shlex.quote(value)}" for key, value in (env or {}).items()]
+        remote = f"cd {shlex.quote(self.workdir)} && {' '.join([*assignments, *(shlex.quote(arg) for arg in argv)])}"
+        return subprocess.run([*self.ssh_command(), remote], input=input, timeout=timeout,
+                              capture_output=True, text=True)
+
+TRANSPORTS = {
+    LocalTransport.name: LocalTransport,
+    SshTransport.name: SshTransport,
+}
+
+def get_transport(host: str) -> Transport:
+    """Create the transport for a host (default: `host_transport` from ez_config.yaml, ssh)"""
+    if host in LOCAL_HOSTS:
+        return LocalTransport(host)
+    name = config.get("host_transport", SshTransport.name)
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown host transport '{name}', expected one of: {', '.join(TRANSPORTS)}")
+    return TRANSPORTS[name](host)
+
+def run_on_hosts(commands: dict, input: str = None, timeout: float = None) -> dict:
+    """Run easysweeps commands on several hosts concurrently, one thread per host.
+
+    Args:
+        commands: Mapping of host to the easysweeps arguments to run there
+
+    Returns:
+        Mapping of host to its CompletedProcess, or to the exception if it could not be run
+    """
+    def run(item):
+        host, args = item
+        try:
+            return get_transport(host).easysweeps(*args, input=input, timeout=timeout)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=max(1, len(commands))) as pool:
+        return dict(zip(commands, pool.map(run, commands.items())))
+
+def launch_on_hosts(sweep_id: str, specs: list, gpu_list=None, agents_per_sweep: int = 1, auto_agents: int = None,
+                    force_recopy: bool = False, ready_timeout: float = None) -> dict:
+    """Run `easysweeps agent` for a sweep on every host concurrently.
+
+    Each host launches agents on the GPUs of its spec, or on gpu_list for hosts given
+    without GPUs. With auto_agents, every host places that many agents by its own free
+    capacity instead.
+
+    Returns:
+        Mapping of host to its CompletedProcess or exception, see run_on_hosts
+
+    Raises:
+        ValueError: If a host has no GPUs and neither gpu_list nor auto_agents is given
+    """
+    commands = {}
+    for spec in specs:
+        args = ["agent", sweep_id, "--agents-per-sweep", str(agents_per_sweep)]
+        gpus = spec.gpus if spec.gpus is not None else gpu_list
+        if gpus:
+            args += ["--gpu-list", ",".join(str(gpu) for gpu in gpus)]
+        elif auto_agents is None:
+            raise ValueError(f"No GPUs given for host {spec.host}, use e.g. {spec.host}:0,1, --gpu-list or --auto")
+        if auto_agents is not None:
+            args += ["--auto", str(auto_agents)]
+        if force_recopy:
+            args.append("--force-recopy")
+        if ready_timeout is not None:
+            args += ["--ready-timeout", str(ready_timeout)]
+        commands[spec.host] = args
+    return run_on_hosts(commands)
+
+def host_error(result) -> str:
+    """Describe a failed run_on_hosts result, or return None if it succeeded"""
+    if isinstance(result, Exception):
+        return str(result)
+    if result.returncode != 0:
+        output = (result.stderr or result.stdout).strip()
+        return output.splitlines()[-1] if output else f"exit status {result.returncode}"
+    return None
+
+def collect_host_status(hosts, timeout: float = 60) -> tuple:
+    """Query `status --json` on all hosts concurrently and merge the inventories.
+
+    Returns:
+        Tuple (active_sweeps, errors): active_sweeps has the layout of
+        monitor.collect_status, with a 'host' entry in every agent dict; errors maps
+        unreachable hosts to an error message
+    """
+    results = run_on_hosts({host: ["status", "--json"] for host in hosts}, timeout=timeout)
+    active_sweeps = {}
+    errors = {}
+    for host, result in results.items():
+        error = host_error(result)
+        if error is None:
+            try:
+                document = json.loads(result.stdout.strip().splitlines()[-1])
+            except (ValueError, IndexError):
+                error = "invalid status output"
+        if error is not None:
+            errors[host] = error
+            continue
+        for sweep in document["sweeps"]:
+            merged = active_sweeps.setdefault(sweep["sweep_id"], {"name": sweep["name"], "agents": []})
+            for agent in sweep["agents"]:
+                merged["agents"].append({**agent, "host": host})
+    # Sweeps with agents first, like the single-host status
+    ordered = sorted(active_sweeps.items(), key=lambda item: not item[1]["agents"])
+    return dict(ordered), errors
@@ -1,11 +1,20 @@
 import csv
-import subprocess
 import argparse
+import shlex
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import click
 import logging
 from .config import config
 from .utils import setup_logging, copy_project_for_sweep
+from .registry import open_registry
+from .units import unit_name
+from .executors import get_executor
+from .local_sweeps import is_local_sweep
+from .logs import agent_log_name, rotate_configured_logs
+from .trace import span
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +24,16 @@ def launch_agents(args):
     This function launches Weights & Biases sweep agents using systemd scope units for a specific sweep ID
     across specified GPUs. It handles the following tasks:
     1. Sets up logging and creates necessary directories
-    2. Verifies the sweep ID exists in the sweep log file
-    3. Launches wandb agents with proper GPU assignments
-    4. Uses systemd scope units for process management
+    2. Verifies the sweep ID exists in the sweep registry
+    3. Launches wandb agents with proper GPU assignments, concurrently
+    4. Runs each agent as a unit of the configured executor (systemd scope units by
+       default, or plain process groups with `executor: process`)
+    5. Waits until every agent is ready (process alive, unit active, log growing)
+       or has failed, and reports the launch latency
     
     Args:
         args: An argparse.Namespace object containing:
-            - sweep_log_dir: Directory containing the sweep log file
+            - sweep_log_dir: Directory containing the sweep registry
             - gpu_list: List of GPU indices to use
             - conda_env: Name of the conda environment to use
             - entity: W&B entity name
@@ -29,80 +41,212 @@ def launch_agents(args):
             - agents_per_sweep: Number of agents to launch per sweep
             - force_recopy: Boolean indicating whether to force recopy project directories
             - sweep_id: The sweep ID to launch agents for
+            - ready_timeout: Seconds to wait for each agent to become ready (optional)
+            - placement: List of GPU indices, one per agent to launch (optional). When
+              given it replaces gpu_list/agents_per_sweep, and agent numbers are picked
+              so they do not clash with agents of this sweep that already exist.
     
     Raises:
-        FileNotFoundError: If the sweep log file is not found
+        click.ClickException: If the sweep ID is not in the registry
         Exception: For various errors during agent launch process
     
     Returns:
-        None
+        List of AgentLaunch objects describing each launch
     """
     # Set up logging
     log_dir = Path(config.get("agent_log_dir"))
     setup_logging(log_dir)
 
-    sweep_log = Path(args.sweep_log_dir) / "created_sweeps.txt"
-    if not sweep_log.exists():
-        logger.error(f"Sweep log file not found: {sweep_log}")
-        raise FileNotFoundError(f"Sweep log file not found: {sweep_log}")
-
     agent_log_dir = Path(config.get("agent_log_dir"))
     agent_log_dir.mkdir(parents=True, exist_ok=True)
 
-    # Find the sweep in the log file
+    # Find the sweep in the registry
     try:
-        with sweep_log.open() as f:
-            sweep_info = None
-            for line in f:
-                if line.strip():
-                    name, sweep_id = line.strip().split()
-                    if sweep_id == args.sweep_id:
-                        sweep_info = (name, sweep_id)
-                        break
-            
-            if not sweep_info:
-                raise click.ClickException(f"No sweep found with ID: {args.sweep_id}")
-            
-            name, sweep_id = sweep_info
+        with open_registry(args.sweep_log_dir) as registry:
+            sweep_info = registry.get(args.sweep_id)
     except Exception as e:
-        logger.error(f"Failed to read sweep log file: {e}")
+        logger.error(f"Failed to read sweep registry: {e}")
         raise
 
+    if not sweep_info:
+        raise click.ClickException(f"No sweep found with ID: {args.sweep_id}")
+
+    name, sweep_id = sweep_info.name, sweep_info.sweep_id
+
+    # Handle project copying if enabled (once per sweep, shared by all its agents)
+    project_dir = Path.cwd()
+    if config.get("enable_project_copy", False):
+        try:
+            base_dir = Path(config.get("project_copy_base_dir"))
+            with span("agent.copy_project", sweep_id=sweep_id):
+                project_dir = copy_project_for_sweep(sweep_id, base_dir, force_recopy=getattr(args, 'force_recopy', False))
+            logger.debug(f"Using project copy at {project_dir}")
+        except Exception as e:
+            logger.error(f"Failed to copy project for sweep {sweep_id}: {e}")
+            raise
+
     # Launch agents on each specified GPU
-    for gpu in args.gpu_list:
-        # Launch multiple agents for this sweep on this GPU
-        for agent_idx in range(args.agents_per_sweep):
-            log_file = agent_log_dir / f"{name}_gpu{gpu}_agent{agent_idx}.log"
-
-            # Handle project copying if enabled
-            project_dir = Path.cwd()
-            if config.get("enable_project_copy", False):
-                try:
-                    base_dir = Path(config.get("project_copy_base_dir"))
-                    project_dir = copy_project_for_sweep(sweep_id, base_dir, force_recopy=getattr(args, 'force_recopy', False))
-                    logger.debug(f"Using project copy at {project_dir}")
-                except Exception as e:
-                    logger.error(f"Failed to copy project for sweep {sweep_id}: {e}")
-                    continue
-
-            # Create the command
-            conda_path = config.get("conda_path")
-            cmd = (
-                f'systemd-run --user --scope --unit=wandb-agent-{sweep_id}-{gpu}-{agent_idx} bash -c "'
-                f'trap \'pkill -P $$\' EXIT; '
-                f'cd {project_dir} && '
-                f'source {conda_path} && '
-                f'conda activate {args.conda_env} && '
-                f'mkdir -p {agent_log_dir} && '
-                f'CUDA_VISIBLE_DEVICES={gpu} PYTHONPATH=$PWD '
-                f'exec wandb agent {args.entity}/{args.project}/{sweep_id}" '
-                f'>> {log_file} 2>&1'
-            )
-
-            try:
-                subprocess.Popen(cmd, shell=True)
-                click.echo(f"Launched agent for {sweep_id}:{name} on GPU {gpu}")
-                logger.debug(f"Launched agent for {name} on GPU {gpu}")
-            except Exception as e:
-                logger.error(f"Failed to launch agent: {e}")
-                continue
+    executor = get_executor()
+    placement = getattr(args, 'placement', None)
+    if placement is not None:
+        specs = _placement_specs(sweep_id, placement, executor)
+    else:
+        specs = [(gpu, agent_idx) for gpu in args.gpu_list for agent_idx in range(args.agents_per_sweep)]
+    conda_path = config.get("conda_path")
+    local_sweep_dir = Path(args.sweep_log_dir).resolve() if is_local_sweep(sweep_id, args.sweep_log_dir) else None
+    warm = config.get("trial_runner", "process") == "warm"
+    ready_timeout = float(getattr(args, 'ready_timeout', None) or config.get("agent_ready_timeout", 10))
+
+    # Keep agent logs bounded before more agents start appending to them
+    with span("agent.rotate_logs"):
+        rotate_configured_logs(agent_log_dir)
+
+    def spawn(spec):
+        gpu, agent_idx = spec
+        unit = unit_name(sweep_id, gpu, agent_idx)
+        log_file = agent_log_dir.resolve() / agent_log_name(name, gpu, agent_idx)
+        launch = AgentLaunch(unit, gpu, agent_idx, log_file, time.monotonic())
+        try:
+            launch.log_size = log_file.stat().st_size if log_file.exists() else 0
+            with span("agent.spawn", unit=unit), log_file.open("ab") as log:
+                launch.process = executor.launch(unit, _agent_command(project_dir, conda_path, args, gpu, sweep_id,
+                                                                        local_sweep_dir, warm),
+                                                 stdout=log)
+        except Exception as e:
+            launch.error = str(e)
+        return launch
+
+    with ThreadPoolExecutor(max_workers=min(32, max(1, len(specs)))) as pool:
+        launches = list(pool.map(spawn, specs))
+
+    with span("agent.wait_ready", agents=len(launches)):
+        _wait_until_ready(launches, ready_timeout, executor)
+
+    for launch in launches:
+        if launch.ready:
+            click.echo(f"Launched agent for {sweep_id}:{name} on GPU {launch.gpu} "
+                       f"(ready in {launch.latency:.1f}s)")
+            logger.debug(f"Launched agent {launch.unit} for {name} on GPU {launch.gpu}")
+        else:
+            click.echo(click.style(f"Failed to launch agent for {sweep_id}:{name} on GPU {launch.gpu}: "
+                                   f"{launch.error}", fg="red"))
+            logger.debug(f"Failed to launch agent {launch.unit}: {launch.error}")
+
+    ready = [launch for launch in launches if launch.ready]
+    if ready:
+        latencies = sorted(launch.latency for launch in ready)
+        click.echo(f"{len(ready)}/{len(launches)} agents ready, launch latency "
+                   f"median {latencies[len(latencies) // 2]:.1f}s, max {latencies[-1]:.1f}s")
+    return launches
+
+def agent_args(sweep_id, gpu_list=None, agents_per_sweep=1, force_recopy=False, ready_timeout=None,
+               placement=None) -> argparse.Namespace:
+    """Build the arguments of launch_agents, taking the rest from ez_config.yaml"""
+    return argparse.Namespace(
+        conda_env=config.get("conda_env"),
+        sweep_log_dir=config.get("sweep_dir"),
+        gpu_list=gpu_list,
+        entity=config.get("entity"),
+        project=config.get("project"),
+        all_gpus=True,  # Always use all specified GPUs
+        agents_per_sweep=agents_per_sweep,
+        force_recopy=force_recopy,
+        sweep_id=sweep_id,
+        ready_timeout=ready_timeout,
+        placement=placement,
+    )
+
+def _placement_specs(sweep_id, placement, executor) -> list:
+    """Turn a list of GPU indices into (gpu, agent_idx) pairs that do not clash with
+    agent units of this sweep that already exist"""
+    used = {(unit.gpu, unit.agent) for unit in executor.list_units(sweep_id=sweep_id)}
+    specs = []
+    for gpu in sorted(placement):
+        agent_idx = 0
+        while (gpu, agent_idx) in used:
+            agent_idx += 1
+        used.add((gpu, agent_idx))
+        specs.append((gpu, agent_idx))
+    return specs
+
+class AgentLaunch:
+    """State of a single agent launch and its readiness probe"""
+
+    def __init__(self, unit, gpu, agent, log_file, started):
+        self.unit = unit
+        self.gpu = gpu
+        self.agent = agent
+        self.log_file = log_file
+        self.started = started
+        self.process = None
+        self.log_size = 0
+        self.ready = False
+        self.latency = None
+        self.error = None
+
+def _agent_command(project_dir, conda_path, args, gpu, sweep_id, local_sweep_dir=None, warm=False) -> list:
+    """Build the command that activates the conda environment and runs the wandb agent
+    (or, for local sweeps, `easysweeps local-agent`, and with `trial_runner: warm`,
+    `easysweeps warm-agent` from the conda environment)"""
+    if warm:
+        agent = (f"python -m easysweeps.cli warm-agent {sweep_id} "
+                 f"--sweep-dir {shlex.quote(str(Path(args.sweep_log_dir).resolve()))}")
+        if config.get("trial_entry_point"):
+            agent += f" --entry-point {shlex.quote(str(config.get('trial_entry_point')))}"
+        if config.get("trials_per_process") is not None:
+            agent += f" --trials-per-process {int(config.get('trials_per_process'))}"
+    elif local_sweep_dir is not None:
+        agent = (f"{shlex.quote(sys.executable)} -m easysweeps.cli local-agent {sweep_id} "
+                 f"--sweep-dir {shlex.quote(str(local_sweep_dir))}")
+    else:
+        agent = f"wandb agent {args.entity}/{args.project}/{sweep_id}"
+    return [
+        'bash', '-c',
+        f"trap 'pkill -P $$' EXIT; "
+        f"cd {project_dir} && "
+        f"source {conda_path} && "
+        f"conda activate {args.conda_env} && "
+        f"CUDA_VISIBLE_DEVICES={gpu} PYTHONPATH=$PWD "
+        f"exec {agent}"
+    ]
+
+def _log_grew(launch) -> bool:
+    try:
+        return launch.log_file.stat().st_size > launch.log_size
+    except OSError:
+        return False
+
+def _wait_until_ready(launches, timeout: float, executor, interval: float = 0.2):
+    """Probe launched agents until each one is ready, has failed, or the timeout expires.
+
+    An agent is ready when its process is still alive, its unit is active and its log
+    file has grown since the launch. The executor checks all pending units at once per
+    probe round (a single `systemctl is-active` call with systemd).
+    """
+    pending = [launch for launch in launches if launch.error is None]
+    deadline = time.monotonic() + timeout
+    while pending:
+        active = executor.units_active([launch.unit for launch in pending])
+        still_pending = []
+        for launch in pending:
+            returncode = launch.process.poll()
+            if returncode is not None:
+                launch.error = f"agent exited with code {returncode}, see {launch.log_file}"
+            elif active.get(launch.unit) and _log_grew(launch):
+                launch.ready = True
+                launch.latency = time.monotonic() - launch.started
+            else:
+                still_pending.append(launch)
+        pending = still_pending
+        if not pending:
+            break
+        if time.monotonic() >= deadline:
+            for launch in pending:
+                if active.get(launch.unit):
+                    # The unit is up but quiet so far, treat it as started
+                    launch.ready = True
+                    launch.latency = time.monotonic() - launch.started
+                else:
+                    launch.error = f"unit not active after {timeout:.0f}s, see {launch.log_file}"
+            break
+        time.sleep(interval)
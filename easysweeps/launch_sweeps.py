@@ -1,70 +1,202 @@
 # create_sweeps.py
-import itertools
-import subprocess
-from copy import deepcopy
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
 import click
-import yaml
 import logging
 from .config import config
+from .backends import get_backend
+from .registry import open_registry
+from .render import compile_template, yaml_load, yaml_dump
+from .variants import VariantSpec
+from .trace import span
 
 logger = logging.getLogger(__name__)
 
-def create_sweeps(sweep_dir=None, template_file=None, variants_file=None):
-    """Create wandb sweeps based on template and variants configuration"""
+def hash_sweep_config(sweep_config: dict) -> str:
+    """Return a stable content hash of a rendered sweep config and its target entity/project"""
+    payload = json.dumps(
+        [config.get("entity"), config.get("project"), sweep_config],
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+def _compile(sweep_template, spec):
+    """Compile the sweep template for the keys of the variant spec (and its explicit includes)"""
+    keys = set(spec.keys)
+    for combo in spec.includes:
+        keys.update(combo)
+    return compile_template(sweep_template, keys)
+
+def _create_sweep(sweep_config, sweep_dir, backend):
+    """Save a rendered sweep config and register it with the sweep backend.
+
+    Returns:
+        Tuple of (sweep_name, sweep_id)
+    """
+    sweep_name = sweep_config["name"]
+
+    # Save to YAML
+    sweep_file = sweep_dir / f"sweep_{sweep_name}.yaml"
+    with span("sweep.write", file=str(sweep_file)), open(sweep_file, "w") as f:
+        yaml_dump(sweep_config, f)
+
+    # Create sweep without launching agent
+    with span("sweep.register", backend=backend.name):
+        sweep_id = backend.create_sweep(sweep_config, sweep_file)
+    return sweep_name, sweep_id
+
+def preview_sweeps(template_file, variants_file, limit=10):
+    """Count the sweeps a template and variants file would create, without creating them
+
+    Returns:
+        Tuple (raw_count, count, previews): number of combinations in the product, number
+        of sweeps after exclusion, inclusion and sampling, and (sweep_name, combo) pairs
+        for the first `limit` sweeps
+    """
+    with open(template_file) as f:
+        sweep_template = yaml_load(f)
+    with open(variants_file) as f:
+        spec = VariantSpec(yaml_load(f))
+    template = _compile(sweep_template, spec)
+
+    previews = []
+    count = 0
+    for combo in spec:
+        if count < limit:
+            previews.append((template.render(combo)["name"], combo))
+        count += 1
+    return spec.raw_count, count, previews
+
+def create_sweeps(sweep_dir=None, template_file=None, variants_file=None, jobs=1, backend=None, force=False):
+    """Create wandb sweeps based on template and variants configuration
+
+    Variant combinations are generated lazily (see easysweeps.variants.VariantSpec for
+    the zip, exclude, include and sampling options of the variants file), and only a
+    bounded number of rendered sweeps is kept in flight.
+
+    Every rendered sweep config is hashed and looked up in the sweep registry.
+    Combinations that were already created with an identical config are reused instead
+    of being created again. New sweeps are added to the registry (and to
+    created_sweeps.txt) in variant order as soon as all earlier combinations are
+    finished, so an interrupted run only loses the sweeps that were still in flight.
+
+    Args:
+        sweep_dir: Directory where the rendered sweep files are written
+        template_file: Path to the sweep template
+        variants_file: Path to the sweep variants file
+        jobs: Number of sweeps to create concurrently. Each worker only waits on a
+            `wandb sweep` subprocess, so a thread pool is enough.
+        backend: SweepBackend instance or backend name (default: `sweep_backend` from ez_config.yaml)
+        force: If True, create every sweep even if the registry already has it
+
+    Returns:
+        List of (sweep_name, sweep_id) tuples for all combinations, both new and reused,
+        in the order of the variant combinations regardless of the order in which the
+        sweeps finished.
+    """
     # Use provided paths or defaults from config
     sweep_dir = Path(sweep_dir or config.get("sweep_dir"))
     sweep_dir.mkdir(parents=True, exist_ok=True)
 
     # Load template and variants
     try:
-        with open(template_file) as f:
-            sweep_template = yaml.safe_load(f)
+        with span("sweep.load_template", file=str(template_file)), open(template_file) as f:
+            sweep_template = yaml_load(f)
     except Exception as e:
         logger.error(f"Failed to load sweep template: {e}")
         raise
 
     try:
-        with open(variants_file) as f:
-            variants = yaml.safe_load(f)
+        with span("sweep.load_variants", file=str(variants_file)), open(variants_file) as f:
+            variants = yaml_load(f)
     except Exception as e:
         logger.error(f"Failed to load variants file: {e}")
         raise
 
-    # Cartesian product
-    keys, values = zip(*variants.items())
-    combinations = [dict(zip(keys, v)) for v in itertools.product(*values)]
-    total = len(combinations)
-
-    created_sweeps = []
-    for i, combo in enumerate(combinations):
-        try:
-            sweep_config = deepcopy(sweep_template)
-            for k, v in combo.items():
-                sweep_config["parameters"][k]["value"] = v
-
-            sweep_config["name"] = sweep_name = sweep_config["name"].format(**combo)
-
-            # Save to YAML
-            sweep_file = sweep_dir / f"sweep_{sweep_name}.yaml"
-            with open(sweep_file, "w") as f:
-                yaml.dump(sweep_config, f)
-
-            # Create sweep without launching agent
-            out = subprocess.check_output(
-                ["wandb", "sweep", str(sweep_file)],
-                text=True,
-                stderr=subprocess.STDOUT
-            )
-            sweep_id = out.strip().split("/")[-1]
-            created_sweeps.append((sweep_name, sweep_id))
-            click.echo(f"Created sweep {sweep_name}:{sweep_id} [{i + 1}/{total}]")
-
-        except Exception as e:
-            import traceback
-            logger.error(f"Failed to create sweep {i + 1}: {e}\n{traceback.format_exc()}")
-            continue
-
-    logger.debug(f"Created {len(created_sweeps)} sweeps successfully")
-    return created_sweeps
+    # Lazily expand the variant combinations. An exact count would walk the whole
+    # product when combinations are excluded or sampled, so only show a bound then.
+    spec = VariantSpec(variants)
+    max_count, exact = spec.max_count()
+    total = str(max_count) if exact else f"<={max_count}"
+
+    # Compile the template once; each combination then only fills in its slots
+    with span("sweep.compile_template"):
+        template = _compile(sweep_template, spec)
+
+    if backend is None or isinstance(backend, str):
+        backend = get_backend(backend)
+    with open_registry(sweep_dir) as registry:
+        known = {} if force else registry.hashes()
+
+        sweeps = []
+        in_flight = {}  # future -> (index, config_hash, combo)
+        outcomes = {}  # index -> (result, config_hash, combo, created) until recorded in order
+        next_to_record = 0
+        done = 0
+
+        def collect(futures):
+            nonlocal done
+            for future in futures:
+                i, config_hash, combo = in_flight.pop(future)
+                done += 1
+                result = None
+                try:
+                    result = sweep_name, sweep_id = future.result()
+                    click.echo(f"Created sweep {sweep_name}:{sweep_id} [{done}/{total}]")
+                except Exception as e:
+                    output = getattr(e, "output", None)
+                    logger.error(f"Failed to create sweep {i + 1}: {e}" + (f"\n{output}" if output else ""),
+                                 exc_info=True)
+                outcomes[i] = (result, config_hash, combo, True)
+
+        def record():
+            # Record the finished prefix so the registry stays in variant order
+            nonlocal next_to_record
+            while next_to_record in outcomes:
+                result, config_hash, combo, created = outcomes.pop(next_to_record)
+                if result is not None:
+                    sweeps.append(result)
+                    if created:
+                        registry.add(*result, config_hash=config_hash, variant=combo)
+                next_to_record += 1
+
+        jobs = max(1, jobs)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for i, combo in enumerate(spec):
+                try:
+                    with span("sweep.render"):
+                        sweep_config = template.render(combo)
+                except Exception as e:
+                    done += 1
+                    logger.error(f"Failed to render sweep {i + 1}: {e}", exc_info=True)
+                    outcomes[i] = (None, None, combo, False)
+                    record()
+                    continue
+
+                config_hash = hash_sweep_config(sweep_config)
+                existing = known.get(config_hash)
+                if existing:
+                    done += 1
+                    outcomes[i] = (existing, config_hash, combo, False)
+                    click.echo(f"Unchanged sweep {existing[0]}:{existing[1]} [{done}/{total}]")
+                    record()
+                    continue
+
+                future = executor.submit(_create_sweep, sweep_config, sweep_dir, backend)
+                in_flight[future] = (i, config_hash, combo)
+
+                # Keep a bounded number of rendered sweeps in memory
+                if len(in_flight) >= 2 * jobs:
+                    finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                    record()
+
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+                record()
 
+    logger.debug(f"{len(sweeps)} sweeps in total")
+    return sweeps
@@ -0,0 +1,349 @@
+import fcntl
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import secrets
+import signal
+import socket
+import subprocess
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import reduce
+from pathlib import Path
+from .config import config
+from .render import yaml_load, yaml_dump
+
+logger = logging.getLogger(__name__)
+
+# Local sweeps live in sweep_dir/local/<sweep_id>
+LOCAL_DIR = "local"
+LOCAL_METHODS = ("grid", "random")
+
+LocalRun = namedtuple("LocalRun", ["run_id", "index", "params"])
+
+def _flatten_parameters(parameters: dict, prefix: tuple = ()) -> list:
+    """Return (path, spec) pairs for the parameters of a sweep config, descending into
+    nested `parameters` blocks"""
+    flat = []
+    for key, spec in parameters.items():
+        if isinstance(spec, dict) and "parameters" in spec:
+            flat.extend(_flatten_parameters(spec["parameters"], prefix + (key,)))
+        else:
+            flat.append((prefix + (key,), spec if isinstance(spec, dict) else {"value": spec}))
+    return flat
+
+def _set_path(params: dict, path: tuple, value):
+    for key in path[:-1]:
+        params = params.setdefault(key, {})
+    params[path[-1]] = value
+
+def grid_values(name: str, spec: dict) -> list:
+    """Values a parameter takes in a grid search"""
+    if "values" in spec:
+        return list(spec["values"])
+    if "value" in spec:
+        return [spec["value"]]
+    raise ValueError(f"Grid search needs `values` or `value` for parameter '{name}'")
+
+def sample_value(name: str, spec: dict, rng: random.Random):
+    """Draw a value of a parameter for a random search, following the wandb sweep distributions"""
+    if "value" in spec:
+        return spec["value"]
+    if "values" in spec:
+        if "probabilities" in spec:
+            return rng.choices(spec["values"], weights=spec["probabilities"])[0]
+        return rng.choice(spec["values"])
+    distribution = spec.get("distribution")
+    if distribution is None:
+        # Like wandb, integer bounds mean int_uniform and other bounds mean uniform
+        if "min" not in spec or "max" not in spec:
+            raise ValueError(f"Parameter '{name}' needs `value`, `values` or a distribution")
+        distribution = "int_uniform" if isinstance(spec["min"], int) and isinstance(spec["max"], int) else "uniform"
+    low, high = spec.get("min"), spec.get("max")
+    mu, sigma = float(spec.get("mu", 0.0)), float(spec.get("sigma", 1.0))
+    q = float(spec.get("q", 1.0))
+    if distribution == "int_uniform":
+        return rng.randint(int(low), int(high))
+    if distribution in ("uniform", "q_uniform"):
+        value = rng.uniform(float(low), float(high))
+    elif distribution in ("log_uniform_values", "q_log_uniform_values"):
+        value = math.exp(rng.uniform(math.log(float(low)), math.log(float(high))))
+    elif distribution in ("log_uniform", "q_log_uniform"):
+        value = math.exp(rng.uniform(float(low), float(high)))
+    elif distribution in ("normal", "q_normal"):
+        value = rng.gauss(mu, sigma)
+    elif distribution in ("log_normal", "q_log_normal"):
+        value = math.exp(rng.gauss(mu, sigma))
+    elif distribution == "categorical":
+        return rng.choice(spec["values"])
+    elif distribution == "constant":
+        return spec["value"]
+    else:
+        raise ValueError(f"Unsupported distribution '{distribution}' for parameter '{name}'")
+    if distribution.startswith("q_"):
+        value = round(value / q) * q
+    return value
+
+class LocalSweep:
+    """A grid or random sweep controlled locally instead of by the wandb sweep server.
+
+    The rendered sweep config is kept in sweep_dir/local/<sweep_id>/sweep.yaml and the
+    runs in state.json next to it. Agents take the next parameter set under an
+    exclusive lock on state.lock, so any number of agents, on any host that shares the
+    sweep dir, can work through the same sweep. Grid sweeps end after the last
+    combination, random sweeps after run_cap runs (or never, like on wandb).
+
+    A run left `running` by an agent process that no longer exists on this host is
+    marked crashed and its parameters are handed out again.
+    """
+
+    def __init__(self, sweep_id: str, sweep_dir: Path = None):
+        self.sweep_id = sweep_id
+        self.path = Path(sweep_dir or config.get("sweep_dir")) / LOCAL_DIR / sweep_id
+        self.config_file = self.path / "sweep.yaml"
+        self.state_file = self.path / "state.json"
+        self._config = None
+        self._parameters = None
+
+    @classmethod
+    def create(cls, sweep_config: dict, sweep_dir: Path = None) -> "LocalSweep":
+        """Store a rendered sweep config as a new local sweep with a fresh ID"""
+        method = sweep_config.get("method", "grid")
+        if method not in LOCAL_METHODS:
+            raise ValueError(f"Local sweeps support the {' and '.join(LOCAL_METHODS)} methods, got '{method}'")
+        if "program" not in sweep_config and "command" not in sweep_config:
+            raise ValueError("The sweep config needs a `program` (or `command`) for local sweeps")
+        sweep = cls(secrets.token_hex(4), sweep_dir)
+        sweep.path.mkdir(parents=True)
+        with open(sweep.config_file, "w") as f:
+            yaml_dump(sweep_config, f)
+        sweep.size()  # Validate the parameters before any agent starts
+        return sweep
+
+    def exists(self) -> bool:
+        return self.config_file.exists()
+
+    @property
+    def config(self) -> dict:
+        if self._config is None:
+            with open(self.config_file) as f:
+                self._config = yaml_load(f)
+        return self._config
+
+    @property
+    def parameters(self) -> list:
+        if self._parameters is None:
+            self._parameters = _flatten_parameters(self.config.get("parameters") or {})
+        return self._parameters
+
+    def size(self):
+        """Number of runs the sweep has in total, or None for a random sweep without run_cap"""
+        if self.config.get("method", "grid") == "grid":
+            return reduce(lambda n, item: n * len(grid_values(".".join(item[0]), item[1])), self.parameters, 1)
+        run_cap = self.config.get("run_cap")
+        return int(run_cap) if run_cap else None
+
+    def params(self, index: int) -> dict:
+        """Parameter set number `index` (the same index always gives the same parameters)"""
+        params = {}
+        if self.config.get("method", "grid") == "grid":
+            # Decode the index as a mixed-radix number, last parameter varying fastest
+            chosen = []
+            for path, spec in reversed(self.parameters):
+                values = grid_values(".".join(path), spec)
+                index, position = divmod(index, len(values))
+                chosen.append((path, values[position]))
+            for path, value in reversed(chosen):
+                _set_path(params, path, value)
+        else:
+            rng = random.Random(f"{self.sweep_id}:{index}")
+            for path, spec in self.parameters:
+                _set_path(params, path, sample_value(".".join(path), spec, rng))
+        return params
+
+    @contextmanager
+    def _locked_state(self):
+        """Hold the sweep lock and yield the state dict, which is saved on exit"""
+        with open(self.path / "state.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.state_file) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {"next": 0, "retry": [], "runs": {}}
+            yield state
+            tmp = self.path / f".state.json.{os.getpid()}"
+            with open(tmp, "w") as f:
+                json.dump(state, f, indent=1, default=str)
+            os.replace(tmp, self.state_file)
+
+    def runs(self) -> dict:
+        """Mapping of run ID to the recorded run (index, params, state, agent, times, exit_code)"""
+        try:
+            with open(self.state_file) as f:
+                return json.load(f)["runs"]
+        except (OSError, ValueError, KeyError):
+            return {}
+
+    def has_runs_left(self) -> bool:
+        """True if next_run would still hand out parameters (runs in progress do not count)"""
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {"next": 0, "retry": []}
+        size = self.size()
+        return bool(state.get("retry")) or size is None or state.get("next", 0) < size
+
+    def _requeue_crashed(self, state: dict):
+        hostname = socket.gethostname()
+        for run_id, run in state["runs"].items():
+            if run["state"] != "running":
+                continue
+            host, _, pid = run["agent"].rpartition(":")
+            if host != hostname:
+                continue
+            try:
+                os.kill(int(pid), 0)
+            except ProcessLookupError:
+                logger.warning(f"Agent of run {run_id} is gone, handing out its parameters again")
+                run["state"] = "crashed"
+                state["retry"].append(run["index"])
+            except (PermissionError, ValueError):
+                pass
+
+    def next_run(self, agent: str):
+        """Claim the next parameter set for an agent ("host:pid").
+
+        Returns:
+            A LocalRun, or None when the sweep has no runs left
+        """
+        with self._locked_state() as state:
+            self._requeue_crashed(state)
+            if state["retry"]:
+                index = state["retry"].pop(0)
+            else:
+                size = self.size()
+                if size is not None and state["next"] >= size:
+                    return None
+                index = state["next"]
+                state["next"] += 1
+            run_id = secrets.token_hex(4)
+            params = self.params(index)
+            state["runs"][run_id] = {"index": index, "params": params, "state": "running", "agent": agent,
+                                     "started": time.time()}
+        return LocalRun(run_id, index, params)
+
+    def finish_run(self, run_id: str, exit_code: int):
+        """Record that a run ended"""
+        with self._locked_state() as state:
+            run = state["runs"][run_id]
+            run["state"] = "finished" if exit_code == 0 else "failed"
+            run["exit_code"] = exit_code
+            run["finished"] = time.time()
+
+def is_local_sweep(sweep_id: str, sweep_dir: Path = None) -> bool:
+    """True if the sweep was created with `sweep_backend: local`"""
+    return LocalSweep(sweep_id, sweep_dir).exists()
+
+def run_command(sweep: LocalSweep, run: LocalRun, args_json_file: Path) -> list:
+    """Build the command of a run from the sweep's `command` (wandb's macros are supported)"""
+    params = run.params
+    formatted = {key: json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+                 for key, value in params.items()}
+    macros = {
+        "${env}": ["/usr/bin/env"],
+        "${interpreter}": ["python"],
+        "${program}": [str(sweep.config.get("program", ""))],
+        "${args}": [f"--{key}={value}" for key, value in formatted.items()],
+        "${args_no_hyphens}": [f"{key}={value}" for key, value in formatted.items()],
+        "${args_no_boolean_flags}": [f"--{key}" if value is True else f"--{key}={formatted[key]}"
+                                     for key, value in params.items() if value is not False],
+        "${args_json}": [json.dumps(params)],
+        "${args_json_file}": [str(args_json_file)],
+    }
+    template = sweep.config.get("command") or ["${env}", "${interpreter}", "${program}", "${args}"]
+    return list(itertools.chain.from_iterable(macros.get(part, [part]) for part in template))
+
+def prepare_run(sweep: LocalSweep, run: LocalRun) -> tuple:
+    """Write the parameter files of a run and build its command and environment.
+
+    The parameters are passed the way `wandb agent` passes them: as command line
+    arguments (per the sweep's `command`) and in wandb/sweep-<sweep_id>/config-<run_id>.yaml,
+    which wandb.init reads through WANDB_SWEEP_PARAM_PATH.
+
+    Returns:
+        Tuple (command, env): the command of the run and the environment variables to set for it
+    """
+    param_dir = Path("wandb") / f"sweep-{sweep.sweep_id}"
+    param_dir.mkdir(parents=True, exist_ok=True)
+    param_file = param_dir / f"config-{run.run_id}.yaml"
+    with open(param_file, "w") as f:
+        yaml_dump({key: {"value": value} for key, value in run.params.items()}, f)
+    json_file = param_dir / f"config-{run.run_id}.json"
+    with open(json_file, "w") as f:
+        json.dump(run.params, f)
+    env = {
+        "WANDB_MODE": str(config.get("local_wandb_mode", "offline")),
+        "WANDB_RUN_ID": run.run_id,
+        "WANDB_SWEEP_PARAM_PATH": str(param_file.resolve()),
+        "WANDB_ENTITY": str(config.get("entity")),
+        "WANDB_PROJECT": str(config.get("project")),
+        "EASYSWEEPS_SWEEP_ID": sweep.sweep_id,
+    }
+    return run_command(sweep, run, json_file.resolve()), env
+
+def agent_name() -> str:
+    """Name under which this process claims runs ("host:pid")"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+@contextmanager
+def stop_after_current_run(echo=print):
+    """Handle SIGINT like `wandb agent`: the first one asks to stop once the current run
+    is done, a second one interrupts. Yields a list that is non-empty once a stop was
+    requested."""
+    stopping = []
+
+    def on_sigint(signum, frame):
+        if stopping:
+            raise KeyboardInterrupt
+        stopping.append(True)
+        echo("easysweeps: Ctrl + C detected. Stopping after the current run.")
+
+    previous = signal.signal(signal.SIGINT, on_sigint)
+    try:
+        yield stopping
+    finally:
+        signal.signal(signal.SIGINT, previous)
+
+def run_agent(sweep: LocalSweep, count: int = None, echo=print) -> int:
+    """Run the sweep's program for parameter sets of the sweep until none are left.
+
+    Every run is a new process, started with the parameters from prepare_run. wandb
+    runs in local_wandb_mode (default offline), so nothing needs the network; offline
+    runs can be uploaded later with `wandb sync`.
+
+    Like `wandb agent`, the first SIGINT lets the current run finish and then stops.
+
+    Returns:
+        Number of runs done
+    """
+    agent = agent_name()
+    done = 0
+    with stop_after_current_run(echo) as stopping:
+        while not stopping and (count is None or done < count):
+            run = sweep.next_run(agent)
+            if run is None:
+                echo(f"easysweeps: Sweep {sweep.sweep_id} has no runs left")
+                break
+            command, env = prepare_run(sweep, run)
+            echo(f"easysweeps: Starting run {run.run_id} with {json.dumps(run.params)}")
+            exit_code = subprocess.run(command, env={**os.environ, **env}).returncode
+            sweep.finish_run(run.run_id, exit_code)
+            echo(f"easysweeps: Run {run.run_id} {'finished' if exit_code == 0 else f'failed with exit code {exit_code}'}")
+            done += 1
+    return done
@@ -0,0 +1,204 @@
+import fcntl
+import gzip
+import logging
+import os
+import re
+import shutil
+import time
+from collections import namedtuple
+from pathlib import Path
+from .config import config
+
+logger = logging.getLogger(__name__)
+
+AGENT_LOG_RE = re.compile(r"^(?P<name>.+)_gpu(?P<gpu>\d+)_agent(?P<agent>\d+)\.log$")
+
+# Held while logs are rotated, so processes that rotate periodically do not collide
+ROTATE_LOCK_FILE = ".rotate.lock"
+
+AgentLog = namedtuple("AgentLog", ["path", "name", "gpu", "agent"])
+
+def agent_log_name(name: str, gpu: int, agent: int) -> str:
+    """Return the file name of an agent's log"""
+    return f"{name}_gpu{gpu}_agent{agent}.log"
+
+def find_agent_logs(log_dir: Path, names=None, gpu: int = None, agent: int = None) -> list:
+    """List agent log files, optionally filtered by sweep name, GPU and agent index"""
+    logs = []
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return logs
+    for entry in os.scandir(log_dir):
+        match = AGENT_LOG_RE.match(entry.name)
+        if not match or not entry.is_file():
+            continue
+        log = AgentLog(Path(entry.path), match["name"], int(match["gpu"]), int(match["agent"]))
+        if names is not None and log.name not in names:
+            continue
+        if gpu is not None and log.gpu != gpu:
+            continue
+        if agent is not None and log.agent != agent:
+            continue
+        logs.append(log)
+    return sorted(logs, key=lambda log: (log.name, log.gpu, log.agent))
+
+def tail_lines(path: Path, n: int, block_size: int = 64 * 1024) -> list:
+    """Return the last n lines of a file, reading backwards from the end"""
+    if n <= 0:
+        return []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        data = b""
+        while pos > 0 and data.count(b"\n") <= n:
+            read = min(block_size, pos)
+            pos -= read
+            f.seek(pos)
+            data = f.read(read) + data
+    lines = data.decode(errors="replace").splitlines()
+    return lines[-n:]
+
+class LogFollower:
+    """Follow many growing log files by polling their size.
+
+    Each file keeps its own offset, so a poll only reads the bytes appended since the
+    previous one. A file that shrank (truncated by rotation) is read from the start
+    again, and a file that was replaced is reopened.
+    """
+
+    def __init__(self, paths, from_end: bool = True):
+        self.state = {}  # path -> (inode, offset)
+        for path in paths:
+            try:
+                st = os.stat(path)
+                self.state[Path(path)] = (st.st_ino, st.st_size if from_end else 0)
+            except OSError:
+                self.state[Path(path)] = (None, 0)
+        self._partial = {}
+
+    def poll(self) -> list:
+        """Return (path, line) pairs for all complete lines appended since the last poll"""
+        lines = []
+        for path, (inode, offset) in self.state.items():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_ino != inode or st.st_size < offset:
+                offset = 0
+                self._partial.pop(path, None)
+            if st.st_size == offset:
+                self.state[path] = (st.st_ino, offset)
+                continue
+            with open(path, "rb") as f:
+                f.seek(offset)
+                data = f.read(st.st_size - offset)
+            self.state[path] = (st.st_ino, offset + len(data))
+            data = self._partial.pop(path, b"") + data
+            *complete, rest = data.split(b"\n")
+            if rest:
+                self._partial[path] = rest
+            lines.extend((path, line.decode(errors="replace")) for line in complete)
+        return lines
+
+    def follow(self, interval: float = 0.5):
+        """Yield (path, line) pairs forever"""
+        while True:
+            yield from self.poll()
+            time.sleep(interval)
+
+def rotate_log(path: Path, max_bytes: int, backups: int = 3) -> bool:
+    """Compress and truncate a log file once it is larger than max_bytes.
+
+    The file is copied to `<log>.1.gz` and then truncated in place (copytruncate), so
+    agents that keep it open in append mode continue writing to the same file. Older
+    archives are shifted to `.2.gz`, `.3.gz`... and only `backups` of them are kept.
+    Lines written between the copy and the truncation are lost.
+
+    Returns:
+        True if the file was rotated
+    """
+    path = Path(path)
+    try:
+        if path.stat().st_size <= max_bytes:
+            return False
+    except OSError:
+        return False
+
+    if backups <= 0:
+        with open(path, "r+b") as f:
+            f.truncate(0)
+        return True
+
+    for i in range(backups - 1, 0, -1):
+        older = path.with_name(f"{path.name}.{i}.gz")
+        if older.exists():
+            os.replace(older, path.with_name(f"{path.name}.{i + 1}.gz"))
+
+    archive = path.with_name(f"{path.name}.1.gz")
+    tmp = archive.with_name(archive.name + ".tmp")
+    with open(path, "r+b") as src:
+        with gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        src.truncate(0)
+    os.replace(tmp, archive)
+    return True
+
+def rotate_agent_logs(log_dir: Path, max_bytes: int, backups: int = 3) -> list:
+    """Rotate every agent log in log_dir that is larger than max_bytes.
+
+    Nothing is rotated while another process is rotating the logs of log_dir.
+
+    Returns:
+        List of rotated log paths
+    """
+    rotated = []
+    log_dir = Path(log_dir)
+    if not log_dir.exists():
+        return rotated
+    with open(log_dir / ROTATE_LOCK_FILE, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return rotated
+        for log in find_agent_logs(log_dir):
+            try:
+                if rotate_log(log.path, max_bytes, backups):
+                    rotated.append(log.path)
+            except OSError as e:
+                logger.warning(f"Failed to rotate {log.path}: {e}")
+    return rotated
+
+def rotate_configured_logs(log_dir: Path = None) -> list:
+    """Rotate agent logs by agent_log_max_mb (default 100, 0 disables rotation) and
+    agent_log_backups (default 3) from ez_config.yaml
+
+    Returns:
+        List of rotated log paths
+    """
+    max_log_mb = float(config.get("agent_log_max_mb", 100) or 0)
+    if not max_log_mb:
+        return []
+    return rotate_agent_logs(Path(log_dir or config.get("agent_log_dir")), int(max_log_mb * 1024 * 1024),
+                             int(config.get("agent_log_backups", 3)))
+
+class LogRotator:
+    """Rotate agent logs from a long-running process (the daemon, the queue or the
+    telemetry sampler), at most every agent_log_rotate_interval seconds (default 60),
+    so the logs of agents that run for days stay bounded"""
+
+    def __init__(self, log_dir: Path = None, interval: float = None):
+        self.log_dir = log_dir
+        self.interval = float(interval if interval is not None else config.get("agent_log_rotate_interval", 60))
+        self.last = None
+
+    def poll(self) -> list:
+        """Rotate the logs if the interval has passed since the last rotation"""
+        now = time.monotonic()
+        if self.last is not None and now - self.last < self.interval:
+            return []
+        self.last = now
+        rotated = rotate_configured_logs(self.log_dir)
+        for path in rotated:
+            logger.info(f"Rotated {path}")
+        return rotated
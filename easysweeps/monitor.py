@@ -0,0 +1,211 @@
+import logging
+import subprocess
+import time
+from pathlib import Path
+import click
+import psutil
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOTS = (Path("/sys/fs/cgroup"), Path("/sys/fs/cgroup/systemd"))
+
+def query_control_groups(units) -> dict:
+    """Return a mapping of unit name to its cgroup path with a single `systemctl show` call"""
+    units = list(units)
+    if not units:
+        return {}
+    result = subprocess.run(
+        ['systemctl', '--user', 'show', '--property=Id,ControlGroup', *units],
+        capture_output=True, text=True
+    )
+    groups = {}
+    for block in result.stdout.split("\n\n"):
+        props = dict(line.split("=", 1) for line in block.splitlines() if "=" in line)
+        if props.get("Id") and props.get("ControlGroup"):
+            groups[props["Id"]] = props["ControlGroup"]
+    return groups
+
+def read_cgroup_pids(control_group: str) -> list:
+    """List the PIDs in a cgroup (unified or legacy systemd hierarchy)"""
+    for root in CGROUP_ROOTS:
+        procs = root / control_group.lstrip("/") / "cgroup.procs"
+        try:
+            return [int(pid) for pid in procs.read_text().split()]
+        except (OSError, ValueError):
+            continue
+    return []
+
+class AgentMonitor:
+    """Collect CPU, memory and uptime of agent units.
+
+    Meant to be sampled repeatedly: the executor locates each unit once (its cgroup
+    path under systemd, its process group otherwise) and the psutil.Process objects
+    are kept between samples, so each refresh only lists the unit's PIDs and reads the
+    per-process counters. CPU percentages are measured since the previous sample (and
+    are 0.0 on the first one).
+    """
+
+    def __init__(self, executor=None):
+        if executor is None:
+            from .executors import get_executor
+            executor = get_executor()
+        self.executor = executor
+        self._control_groups = {}
+        self._processes = {}
+
+    def _process(self, pid: int):
+        proc = self._processes.get(pid)
+        if proc is None:
+            try:
+                proc = psutil.Process(pid)
+                proc.cpu_percent(None)
+            except psutil.Error:
+                return None
+            self._processes[pid] = proc
+        return proc
+
+    def sample(self, units) -> dict:
+        """Measure the processes of each unit.
+
+        Args:
+            units: AgentUnit records
+
+        Returns:
+            Mapping of unit name to a dict with "pids", "cpu_percent", "rss" (bytes)
+            and "uptime" (seconds, None if the unit has no processes)
+        """
+        running = [unit.unit for unit in units if unit.running]
+        missing = [unit for unit in running if unit not in self._control_groups]
+        if missing:
+            self._control_groups.update(self.executor.locate(missing))
+        unit_pids = self.executor.pids({unit: self._control_groups[unit] for unit in running
+                                        if unit in self._control_groups})
+
+        now = time.time()
+        seen = set()
+        usage = {}
+        for unit in running:
+            pids = unit_pids.get(unit, [])
+            cpu, rss, started = 0.0, 0, None
+            for pid in pids:
+                proc = self._process(pid)
+                if proc is None:
+                    continue
+                try:
+                    with proc.oneshot():
+                        cpu += proc.cpu_percent(None)
+                        rss += proc.memory_info().rss
+                        created = proc.create_time()
+                except psutil.Error:
+                    continue
+                seen.add(pid)
+                started = created if started is None else min(started, created)
+            usage[unit] = {
+                "pids": pids,
+                "cpu_percent": cpu,
+                "rss": rss,
+                "uptime": now - started if started is not None else None,
+            }
+
+        # Forget processes and units that are gone
+        self._processes = {pid: proc for pid, proc in self._processes.items() if pid in seen}
+        self._control_groups = {unit: cg for unit, cg in self._control_groups.items() if unit in usage}
+        return usage
+
+def format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+def format_duration(seconds) -> str:
+    if seconds is None:
+        return "-"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    return f"{minutes}m{seconds:02d}s"
+
+def collect_status(registry, monitor=None, units=None) -> dict:
+    """Gather sweeps and their agents.
+
+    Args:
+        registry: Open SweepRegistry used to look up sweep names
+        monitor: Optional AgentMonitor; when given, each agent also gets its resource usage
+        units: AgentUnit records to report (default: query the executor)
+
+    Returns:
+        dict: sweep_id -> {'name': str, 'agents': list of agent dicts}. Sweeps with agents come first.
+    """
+    if units is None:
+        from .executors import get_executor
+        units = get_executor().list_units()
+    usage = monitor.sample(units) if monitor is not None else {}
+
+    # Get agent scope units
+    active_sweeps = {}  # sweep_id -> {name: str, agents: list of dicts}
+    for unit in units:
+        if unit.sweep_id not in active_sweeps:
+            active_sweeps[unit.sweep_id] = {
+                'name': unit.sweep_id,  # Default to ID if name not found
+                'agents': []
+            }
+        agent_info = {
+            'unit': unit.unit,
+            'gpu': unit.gpu,
+            'agent': unit.agent,
+            'status': "running" if unit.running else "stopped",
+        }
+        if unit.unit in usage:
+            agent_info.update(usage[unit.unit])
+        active_sweeps[unit.sweep_id]['agents'].append(agent_info)
+
+    # Get sweep names from the registry for inactive sweeps
+    for sweep_id, name in registry.names().items():
+        if sweep_id not in active_sweeps:
+            active_sweeps[sweep_id] = {
+                'name': name,
+                'agents': []
+            }
+        else:
+            active_sweeps[sweep_id]['name'] = name
+    return active_sweeps
+
+def format_status(active_sweeps, with_usage=False) -> list:
+    """Render the output of collect_status as a list of lines"""
+    lines = ["=== Sweeps and Agents Status ===", ""]
+
+    # First show sweeps with running agents
+    active_sweeps_with_agents = {sid: info for sid, info in active_sweeps.items() if info['agents']}
+    if active_sweeps_with_agents:
+        lines.append("Active Sweeps:")
+        lines.append("-" * 50)
+        for sweep_id, info in active_sweeps_with_agents.items():
+            lines.append(f"Sweep: {info['name']} (ID: {sweep_id})")
+            lines.append("Agents:")
+            for agent_info in sorted(info['agents'], key=lambda a: (a.get('host', ''), a['gpu'], a['agent'])):
+                status = agent_info['status']
+                status_color = "green" if status == "running" else "red"
+                host = f"{agent_info['host']} " if 'host' in agent_info else ""
+                line = f"  {host}GPU {agent_info['gpu']}, Agent {agent_info['agent']}: {click.style(status, fg=status_color)}"
+                if with_usage and 'rss' in agent_info:
+                    line += (f"  CPU {agent_info['cpu_percent']:5.1f}%  RSS {format_bytes(agent_info['rss']):>9}"
+                             f"  up {format_duration(agent_info['uptime'])}  procs {len(agent_info['pids'])}")
+                lines.append(line)
+            lines.append("-" * 50)
+
+    # Then show sweeps without agents
+    inactive_sweeps = {sid: info for sid, info in active_sweeps.items() if not info['agents']}
+    if inactive_sweeps:
+        lines.append("")
+        lines.append("Inactive Sweeps (no running agents):")
+        lines.append("-" * 50)
+        for sweep_id, info in inactive_sweeps.items():
+            lines.append(f"   {info['name']} (ID: {sweep_id})")
+
+    if not active_sweeps:
+        lines.append("No active sweeps found")
+    return lines
@@ -0,0 +1,234 @@
+import logging
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+import click
+
+logger = logging.getLogger(__name__)
+
+# Files whose patterns are honored in every directory of the project
+IGNORE_FILES = (".gitignore", ".easysweepsignore")
+
+# Patterns (in .gitignore syntax) that are always excluded from project copies
+DEFAULT_IGNORE_PATTERNS = (
+    ".git/", "__pycache__/", "*.pyc",
+    "*.pyo", "*.pyd", ".pytest_cache/",
+    "*.egg-info/", "dist/", "build/",
+    ".easysweeps_manifest.json",
+)
+
+def _translate(pattern: str) -> str:
+    """Translate the body of a .gitignore pattern into a regular expression"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            # Like fnmatch, a "]" right after "[" or "[!" is part of the set
+            j = i + 1
+            if pattern.startswith("!", j):
+                j += 1
+            if pattern.startswith("]", j):
+                j += 1
+            end = pattern.find("]", j)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end]
+                negate_set = body.startswith("!")
+                if negate_set:
+                    body = body[1:]
+                body = re.sub(r"([\\\[\]^&~|])", r"\\\1", body)
+                out.append(f"[{'^' if negate_set else ''}{body}]")
+                i = end
+        elif c == "\\" and i + 1 < len(pattern):
+            i += 1
+            out.append(re.escape(pattern[i]))
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+class IgnoreRules:
+    """Ordered list of .gitignore-style rules. The last matching rule decides."""
+
+    def __init__(self, rules=None):
+        self.rules = list(rules or [])  # (base, regex, negate, dir_only)
+
+    def add(self, pattern: str, base: str = ""):
+        """Add a single pattern, relative to the directory `base` (posix, "" for the root)"""
+        pattern = pattern.rstrip("\n")
+        if not pattern.strip() or pattern.startswith("#"):
+            return
+        if not pattern.endswith("\\ "):
+            pattern = pattern.rstrip()
+        negate = pattern.startswith("!")
+        if negate:
+            pattern = pattern[1:]
+        elif pattern.startswith("\\!") or pattern.startswith("\\#"):
+            pattern = pattern[1:]
+        dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        if not pattern:
+            return
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        regex = _translate(pattern)
+        regex = f"^{regex}$" if anchored else f"^(?:.*/)?{regex}$"
+        try:
+            compiled = re.compile(regex)
+        except re.error as e:
+            logger.warning(f"Skipping invalid ignore pattern {pattern!r}: {e}")
+            return
+        self.rules.append((base, compiled, negate, dir_only))
+
+    def extended(self, path: Path, base: str = "") -> "IgnoreRules":
+        """Return a copy of these rules with the patterns of an ignore file appended"""
+        rules = IgnoreRules(self.rules)
+        try:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                for line in f:
+                    rules.add(line, base)
+        except OSError as e:
+            logger.warning(f"Failed to read {path}: {e}")
+        return rules
+
+    def ignored(self, rel: str, is_dir: bool) -> bool:
+        """Check whether a path (posix, relative to the project root) is ignored"""
+        result = False
+        for base, regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel.startswith(base + "/"):
+                    continue
+                path = rel[len(base) + 1:]
+            else:
+                path = rel
+            if regex.match(path):
+                result = not negate
+        return result
+
+def default_rules(extra_patterns=()) -> IgnoreRules:
+    rules = IgnoreRules()
+    for pattern in (*DEFAULT_IGNORE_PATTERNS, *extra_patterns):
+        rules.add(pattern)
+    return rules
+
+def scan_project(root: Path, rules: IgnoreRules = None, max_file_size: int = None):
+    """List the files of a project that should be copied.
+
+    .gitignore and .easysweepsignore files are honored in every directory, on top of
+    DEFAULT_IGNORE_PATTERNS. Ignored directories are pruned without being listed.
+    Symlinks are followed like by shutil.copytree, except links back to a directory
+    that contains them, which would never end. Entries that are neither files nor
+    directories (dangling links, sockets) are skipped with a warning.
+
+    Args:
+        root: Project directory
+        rules: Base ignore rules (default: DEFAULT_IGNORE_PATTERNS)
+        max_file_size: Skip files larger than this many bytes (None for no limit)
+
+    Returns:
+        Tuple (files, skipped): files is a list of (relative posix path, os.stat_result),
+        skipped a list of relative paths that exceeded max_file_size
+    """
+    root = Path(root)
+    files, skipped = [], []
+    root_st = root.stat()
+    # Every directory carries the (device, inode) pairs of itself and its parents
+    stack = [("", rules or default_rules(), frozenset([(root_st.st_dev, root_st.st_ino)]))]
+    while stack:
+        rel_dir, dir_rules, parents = stack.pop()
+        dir_path = root / rel_dir if rel_dir else root
+        for ignore_file in IGNORE_FILES:
+            if (dir_path / ignore_file).is_file():
+                dir_rules = dir_rules.extended(dir_path / ignore_file, rel_dir)
+        try:
+            entries = sorted(os.scandir(dir_path), key=lambda e: e.name)
+        except OSError as e:
+            logger.warning(f"Failed to list {dir_path}: {e}")
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if dir_rules.ignored(rel, is_dir):
+                continue
+            if is_dir:
+                try:
+                    st = entry.stat()
+                except OSError as e:
+                    logger.warning(f"Skipping {rel}: {e}")
+                    continue
+                inode = (st.st_dev, st.st_ino)
+                if inode in parents:
+                    logger.warning(f"Skipping {rel}: symlink loop back to a parent directory")
+                    continue
+                stack.append((rel, dir_rules, parents | {inode}))
+            elif entry.is_file():
+                st = entry.stat()
+                if max_file_size is not None and st.st_size > max_file_size:
+                    skipped.append(rel)
+                    continue
+                files.append((rel, st))
+            else:
+                logger.warning(f"Skipping {rel}: not a regular file or directory")
+    return files, skipped
+
+def _copy_file(source: Path, target: Path, rel: str):
+    dst = target / rel
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source / rel, dst)
+
+def run_parallel(func, files, jobs: int, label: str):
+    """Run func(rel, stat) for every file on a thread pool with a progress bar.
+
+    Returns:
+        List of func results in the order of files
+    """
+    results = [None] * len(files)
+    total_bytes = sum(st.st_size for _, st in files)
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor, \
+            click.progressbar(length=total_bytes, label=label, file=click.get_text_stream("stderr")) as bar:
+        futures = {executor.submit(func, rel, st): i for i, (rel, st) in enumerate(files)}
+        for future in as_completed(futures):
+            i = futures[future]
+            results[i] = future.result()
+            bar.update(files[i][1].st_size)
+    elapsed = max(time.monotonic() - start, 1e-6)
+    logger.info(f"{label}: {len(files)} files, {total_bytes / 1e6:.1f} MB in {elapsed:.1f}s "
+                f"({total_bytes / 1e6 / elapsed:.1f} MB/s)")
+    return results
+
+def copy_project(source: Path, target: Path, jobs: int = 8, max_file_size: int = None) -> int:
+    """Copy the non-ignored files of a project to target on a thread pool.
+
+    Returns:
+        Number of copied files
+    """
+    source, target = Path(source), Path(target)
+    files, skipped = scan_project(source, max_file_size=max_file_size)
+    for rel in skipped:
+        logger.warning(f"Skipping {rel}: larger than the maximum file size")
+    target.mkdir(parents=True, exist_ok=True)
+    run_parallel(lambda rel, st: _copy_file(source, target, rel), files, jobs, f"Copying project to {target}")
+    return len(files)
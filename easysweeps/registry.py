@@ -0,0 +1,201 @@
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+from .config import config
+from .trace import span
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILE = "sweeps.db"
+SWEEP_LOG_FILE = "created_sweeps.txt"
+JOURNAL_FILE = "sweep_journal.txt"
+
+SweepRecord = namedtuple("SweepRecord", ["name", "sweep_id", "config_hash", "variant", "created_at"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sweeps (
+    sweep_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    config_hash TEXT,
+    variant TEXT,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS sweeps_name ON sweeps (name);
+CREATE INDEX IF NOT EXISTS sweeps_config_hash ON sweeps (config_hash);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class SweepRegistry:
+    """Indexed store of created sweeps, kept in sweep_dir/sweeps.db.
+
+    Lookups by sweep ID, name and config hash use SQLite indexes instead of scanning
+    created_sweeps.txt. Writes happen in a single transaction, and SQLite's file
+    locking serializes concurrent CLI invocations.
+
+    created_sweeps.txt is still appended on every write so it stays a readable log.
+    If it is edited by hand, the new lines are imported the next time the registry is
+    opened.
+    """
+
+    def __init__(self, sweep_dir: Path = None):
+        self.sweep_dir = Path(sweep_dir or config.get("sweep_dir"))
+        self.sweep_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.sweep_dir / REGISTRY_FILE
+        self.sweep_log = self.sweep_dir / SWEEP_LOG_FILE
+        self._lock = threading.Lock()
+        with span("registry.open", path=str(self.path)):
+            self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.executescript(_SCHEMA)
+            self._sync_text_files()
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _log_stamp(self) -> str:
+        if not self.sweep_log.exists():
+            return ""
+        stat = self.sweep_log.stat()
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _get_meta(self, key: str):
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _sync_text_files(self):
+        """Import created_sweeps.txt (and the sweep journal) if they changed since the last sync"""
+        with self._lock:
+            stamp = self._log_stamp()
+            if not stamp or stamp == self._get_meta("sweep_log_stamp"):
+                return
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = 0
+                with self.sweep_log.open() as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            name, sweep_id = line.strip().split()
+                        except ValueError:
+                            logger.warning(f"Invalid line format in {self.sweep_log}: {line.strip()}")
+                            continue
+                        cursor = self._conn.execute(
+                            "INSERT OR IGNORE INTO sweeps (sweep_id, name) VALUES (?, ?)", (sweep_id, name)
+                        )
+                        imported += cursor.rowcount
+
+                # Older versions recorded config hashes in a separate journal file
+                journal = self.sweep_dir / JOURNAL_FILE
+                if journal.exists():
+                    with journal.open() as f:
+                        for line in f:
+                            try:
+                                config_hash, sweep_id, name = line.strip().split(maxsplit=2)
+                            except ValueError:
+                                continue
+                            self._conn.execute(
+                                "UPDATE sweeps SET config_hash = ? WHERE sweep_id = ? AND config_hash IS NULL",
+                                (config_hash, sweep_id)
+                            )
+
+                self._set_meta("sweep_log_stamp", self._log_stamp())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if imported:
+                logger.debug(f"Imported {imported} sweeps from {self.sweep_log}")
+
+    def add(self, name: str, sweep_id: str, config_hash: str = None, variant: dict = None) -> SweepRecord:
+        """Record a newly created sweep and append it to created_sweeps.txt"""
+        record = SweepRecord(name, sweep_id, config_hash, variant, time.time())
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                variant_json = json.dumps(variant, default=str) if variant is not None else None
+                exists = self._conn.execute(
+                    "UPDATE sweeps SET name = ?, config_hash = ?, variant = ?, created_at = ? WHERE sweep_id = ?",
+                    (name, config_hash, variant_json, record.created_at, sweep_id)
+                ).rowcount
+                if not exists:
+                    self._conn.execute(
+                        "INSERT INTO sweeps (sweep_id, name, config_hash, variant, created_at) VALUES (?, ?, ?, ?, ?)",
+                        (sweep_id, name, config_hash, variant_json, record.created_at)
+                    )
+                    in_sync = self._log_stamp() == (self._get_meta("sweep_log_stamp") or "")
+                    with self.sweep_log.open("a") as f:
+                        f.write(f"{name} {sweep_id}\n")
+                    # Only advance the stamp if nobody else modified the log in between
+                    if in_sync:
+                        self._set_meta("sweep_log_stamp", self._log_stamp())
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return record
+
+    def _query(self, where: str = "", params: tuple = ()) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT name, sweep_id, config_hash, variant, created_at FROM sweeps {where} ORDER BY rowid",
+                params
+            ).fetchall()
+        return [
+            SweepRecord(name, sweep_id, config_hash, json.loads(variant) if variant else None, created_at)
+            for name, sweep_id, config_hash, variant, created_at in rows
+        ]
+
+    def get(self, sweep_id: str):
+        """Return the SweepRecord for a sweep ID, or None"""
+        records = self._query("WHERE sweep_id = ?", (sweep_id,))
+        return records[0] if records else None
+
+    def get_by_hash(self, config_hash: str):
+        """Return the most recent sweep created from a config with the given hash, or None"""
+        records = self._query("WHERE config_hash = ?", (config_hash,))
+        return records[-1] if records else None
+
+    def hashes(self) -> dict:
+        """Return a mapping of config hash to (name, sweep_id) of the most recent sweep with that hash"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT config_hash, name, sweep_id FROM sweeps WHERE config_hash IS NOT NULL ORDER BY rowid"
+            ).fetchall()
+        return {config_hash: (name, sweep_id) for config_hash, name, sweep_id in rows}
+
+    def find_by_name(self, name: str) -> list:
+        """Return all sweeps with the given name, oldest first"""
+        return self._query("WHERE name = ?", (name,))
+
+    def all(self) -> list:
+        """Return all sweeps in creation order"""
+        return self._query()
+
+    def names(self) -> dict:
+        """Return a mapping of sweep ID to sweep name"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT sweep_id, name FROM sweeps").fetchall())
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sweeps").fetchone()[0]
+
+def open_registry(sweep_dir: Path = None) -> SweepRegistry:
+    """Open the sweep registry for a sweep dir (default: sweep_dir from ez_config.yaml)"""
+    return SweepRegistry(sweep_dir)
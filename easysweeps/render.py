@@ -0,0 +1,119 @@
+import re
+import yaml
+
+# Use the libyaml based loader and dumper when PyYAML was built with them
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# {key}, {key!r} or {key:spec}; keys may be dotted to refer to nested parameters
+PLACEHOLDER_RE = re.compile(r"\{([A-Za-z_][A-Za-z0-9_.]*)(![rsa])?(:[^{}]*)?\}")
+
+def yaml_load(stream):
+    return yaml.load(stream, Loader=YamlLoader)
+
+def yaml_dump(data, stream=None):
+    return yaml.dump(data, stream, Dumper=YamlDumper)
+
+def _parameter_path(template: dict, key: str):
+    """Return the path of the `value` entry of a (possibly nested, dotted) parameter, or None.
+
+    `optimizer.lr` refers to parameters -> optimizer -> parameters -> lr -> value.
+    """
+    path = ["parameters"]
+    node = template.get("parameters")
+    for i, part in enumerate(key.split(".")):
+        if i:
+            path.append("parameters")
+            node = node.get("parameters") if isinstance(node, dict) else None
+        if not isinstance(node, dict) or part not in node:
+            return None
+        path.append(part)
+        node = node[part]
+    if not isinstance(node, dict):
+        return None
+    return tuple(path) + ("value",)
+
+def _format_value(value, conversion, spec):
+    if conversion == "!r":
+        value = repr(value)
+    elif conversion == "!a":
+        value = ascii(value)
+    elif conversion == "!s":
+        value = str(value)
+    return format(value, spec[1:] if spec else "")
+
+class CompiledTemplate:
+    """A sweep template prepared for rendering many variant combinations.
+
+    The template is scanned once for substitution slots:
+    - the `value` of every parameter named by a variant key (nested parameters use
+      dotted keys, e.g. `optimizer.lr`)
+    - every string that contains `{key}` placeholders of variant keys, anywhere in the
+      document (name, program, command, metric...). Format specs such as `{lr:.0e}`
+      are supported, and other braces such as wandb's `${args}` macros are left alone.
+
+    Rendering copies only the dicts and lists on the way to a slot. All other parts
+    of the rendered config are shared with the template, so they must not be modified.
+    """
+
+    def __init__(self, template: dict, keys):
+        self.template = template
+        self.keys = set(keys)
+        self.value_slots = []  # (path, key)
+        self.string_slots = []  # (path, template string)
+
+        placeholder_keys = set()
+        self._scan(template, (), placeholder_keys)
+
+        for key in sorted(self.keys):
+            path = _parameter_path(template, key)
+            if path is not None:
+                self.value_slots.append((path, key))
+            elif key not in placeholder_keys:
+                raise ValueError(f"Variant '{key}' is neither a template parameter nor used as a placeholder")
+
+    def _scan(self, node, path, placeholder_keys):
+        if isinstance(node, dict):
+            items = node.items()
+        elif isinstance(node, list):
+            items = enumerate(node)
+        else:
+            if isinstance(node, str):
+                names = {m.group(1) for m in PLACEHOLDER_RE.finditer(node)} & self.keys
+                if names:
+                    self.string_slots.append((path, node))
+                    placeholder_keys.update(names)
+            return
+        for key, child in items:
+            self._scan(child, path + (key,), placeholder_keys)
+
+    def _substitute(self, text: str, combo: dict) -> str:
+        def replace(match):
+            name, conversion, spec = match.groups()
+            if name not in combo:
+                return match.group(0)
+            return _format_value(combo[name], conversion, spec)
+        return PLACEHOLDER_RE.sub(replace, text)
+
+    def render(self, combo: dict) -> dict:
+        """Render the sweep config for a single variant combination"""
+        root = dict(self.template)
+        copied = {(): root}
+
+        def container(path):
+            if path not in copied:
+                parent = container(path[:-1])
+                child = parent[path[-1]]
+                parent[path[-1]] = copied[path] = dict(child) if isinstance(child, dict) else list(child)
+            return copied[path]
+
+        for path, key in self.value_slots:
+            if key in combo:
+                container(path[:-1])[path[-1]] = combo[key]
+        for path, text in self.string_slots:
+            container(path[:-1])[path[-1]] = self._substitute(text, combo)
+        return root
+
+def compile_template(template: dict, keys) -> CompiledTemplate:
+    """Compile a sweep template for the given variant keys"""
+    return CompiledTemplate(template, keys)
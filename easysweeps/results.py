@@ -0,0 +1,206 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .config import config
+from .render import yaml_load
+
+logger = logging.getLogger(__name__)
+
+RESULTS_INDEX_FILE = "results_index.json"
+
+# run-20240101_120000-abc123 (online) or offline-run-20240101_120000-abc123
+RUN_DIR_RE = re.compile(r"^(?:offline-)?run-\d{8}_\d{6}-(?P<run_id>[A-Za-z0-9]+)$")
+# wandb agents (and local agents) leave wandb/sweep-<sweep_id>/config-<run_id>.yaml per run
+SWEEP_DIR_PREFIX = "sweep-"
+PARAM_FILE_RE = re.compile(r"^config-(?P<run_id>[A-Za-z0-9]+)\.yaml$")
+
+# Below this many runs to parse, worker processes cost more than they save
+PARALLEL_MIN_RUNS = 64
+
+RunResult = namedtuple("RunResult", ["run_id", "sweep_id", "path", "config", "summary"])
+
+def result_roots(registry=None) -> list:
+    """Directories whose wandb/ folder holds runs: the project and its copies (see enable_project_copy)"""
+    roots = [Path.cwd()]
+    base_dir = config.get("project_copy_base_dir")
+    if base_dir and registry is not None:
+        base_dir = Path(base_dir).expanduser()
+        project = config.get("project")
+        for sweep_id in registry.names():
+            copy = base_dir / f"{project}_{sweep_id}"
+            if (copy / "wandb").is_dir():
+                roots.append(copy)
+    return roots
+
+def _run_stamp(run_dir: str) -> str:
+    """Size and mtime of the run's summary (or config), which change while the run goes on"""
+    for name in ("wandb-summary.json", "config.yaml"):
+        try:
+            stat = os.stat(os.path.join(run_dir, "files", name))
+            return f"{name}:{stat.st_size}:{stat.st_mtime_ns}"
+        except OSError:
+            continue
+    return ""
+
+def read_run(run_dir: str) -> dict:
+    """Parse the config and summary files of a wandb run directory.
+
+    Config values are unwrapped from wandb's {value: ...} entries, and internal keys
+    (starting with an underscore) of the config and nested values of the summary (such
+    as media) are dropped.
+    """
+    files = os.path.join(run_dir, "files")
+    run_config = {}
+    try:
+        with open(os.path.join(files, "config.yaml")) as f:
+            raw = yaml_load(f) or {}
+        run_config = {key: entry["value"] for key, entry in raw.items()
+                      if not key.startswith("_") and isinstance(entry, dict) and "value" in entry}
+    except (OSError, ValueError, AttributeError) as e:
+        logger.debug(f"No readable config in {run_dir}: {e}")
+    summary = {}
+    try:
+        with open(os.path.join(files, "wandb-summary.json")) as f:
+            summary = {key: value for key, value in json.load(f).items() if not isinstance(value, (dict, list))}
+    except (OSError, ValueError, AttributeError) as e:
+        logger.debug(f"No readable summary in {run_dir}: {e}")
+    return {"config": run_config, "summary": summary}
+
+class ResultsIndex:
+    """Incremental index of parsed wandb runs, kept in sweep_dir/results_index.json.
+
+    Each run directory is stored with a stamp (size and mtime of its summary file). A
+    scan lists the run directories, which is cheap, and only parses the runs that are
+    new or whose summary changed since the previous scan, on `jobs` worker processes
+    when there are many of them.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            with open(self.path) as f:
+                self.runs = json.load(f)
+        except (OSError, ValueError):
+            self.runs = {}
+
+    def save(self):
+        tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(self.runs, f, default=str)
+        os.replace(tmp, self.path)
+
+    def scan(self, roots, jobs: int = None) -> int:
+        """Bring the index up to date with the run directories under roots.
+
+        Returns:
+            Number of runs that were parsed
+        """
+        found = {}
+        for root in roots:
+            wandb_dir = Path(root) / "wandb"
+            sweeps = _sweep_run_ids(wandb_dir)
+            try:
+                entries = list(os.scandir(wandb_dir))
+            except OSError:
+                continue
+            for entry in entries:
+                match = RUN_DIR_RE.match(entry.name)
+                if match is None or not entry.is_dir(follow_symlinks=False):
+                    continue
+                run_id = match.group("run_id")
+                found[entry.path] = (run_id, sweeps.get(run_id) or _copy_sweep_id(Path(root)))
+
+        stamps = {path: _run_stamp(path) for path in found}
+        stale = [path for path in found
+                 if path not in self.runs or self.runs[path]["stamp"] != stamps[path]]
+        if len(stale) >= PARALLEL_MIN_RUNS and (jobs is None or jobs > 1):
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                parsed = list(pool.map(read_run, stale, chunksize=16))
+        else:
+            parsed = [read_run(path) for path in stale]
+
+        for path, run in zip(stale, parsed):
+            run_id, sweep_id = found[path]
+            self.runs[path] = {"stamp": stamps[path], "run_id": run_id, "sweep_id": sweep_id, **run}
+        for path in list(self.runs):
+            if path not in found:
+                del self.runs[path]
+            else:
+                # Param files can appear after the run directory was indexed
+                self.runs[path]["sweep_id"] = found[path][1]
+        self.save()
+        return len(stale)
+
+    def results(self) -> list:
+        """All indexed runs as RunResult records"""
+        return [RunResult(run["run_id"], run["sweep_id"], path, run["config"], run["summary"])
+                for path, run in self.runs.items()]
+
+def _sweep_run_ids(wandb_dir: Path) -> dict:
+    """Map run IDs to sweep IDs from the sweep-<sweep_id>/config-<run_id>.yaml files of agents"""
+    run_sweeps = {}
+    try:
+        entries = [entry for entry in os.scandir(wandb_dir) if entry.name.startswith(SWEEP_DIR_PREFIX)]
+    except OSError:
+        return run_sweeps
+    for entry in entries:
+        sweep_id = entry.name[len(SWEEP_DIR_PREFIX):]
+        try:
+            for param_file in os.scandir(entry.path):
+                match = PARAM_FILE_RE.match(param_file.name)
+                if match:
+                    run_sweeps[match.group("run_id")] = sweep_id
+        except OSError:
+            continue
+    return run_sweeps
+
+def _copy_sweep_id(root: Path):
+    """Sweep ID of a project copy (named <project>_<sweep_id>), or None for the project itself"""
+    prefix = f"{config.get('project')}_"
+    if root != Path.cwd() and root.name.startswith(prefix):
+        return root.name[len(prefix):]
+    return None
+
+def sweep_metric(sweep_dir: Path, record) -> dict:
+    """The `metric` of a sweep: from its local sweep config or rendered sweep file, else from the template"""
+    from .local_sweeps import LocalSweep
+
+    local = LocalSweep(record.sweep_id, sweep_dir)
+    candidates = [local.config_file, Path(sweep_dir) / f"sweep_{record.name}.yaml", Path(sweep_dir) / "sweep_template.yaml"]
+    for path in candidates:
+        try:
+            with open(path) as f:
+                metric = (yaml_load(f) or {}).get("metric")
+        except OSError:
+            continue
+        if metric:
+            return metric
+    return {}
+
+def leaderboard(runs: list, metric: str, goal: str = "minimize") -> tuple:
+    """Sort runs by a summary metric, best first.
+
+    Returns:
+        Tuple (ranked, missing): runs that report a finite value of the metric, sorted,
+        and runs that do not (including diverged runs with NaN or infinite values)
+    """
+    ranked, missing = [], []
+    for run in runs:
+        value = run.summary.get(metric)
+        finite = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        (ranked if finite else missing).append(run)
+    ranked.sort(key=lambda run: run.summary[metric], reverse=goal == "maximize")
+    return ranked, missing
+
+def varied_parameters(runs: list) -> list:
+    """Config keys whose value differs between the runs, in order of first appearance"""
+    values = {}
+    for run in runs:
+        for key, value in run.config.items():
+            values.setdefault(key, set()).add(json.dumps(value, sort_keys=True, default=str))
+    return [key for key, seen in values.items() if len(seen) > 1]
@@ -0,0 +1,233 @@
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+from pathlib import Path
+from .project_files import scan_project, run_parallel
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = ".easysweeps_store"
+MANIFEST_FILE = ".easysweeps_manifest.json"  # excluded from scans by DEFAULT_IGNORE_PATTERNS
+
+# ioctl request number of FICLONE on Linux (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+# Stored objects are read-only; they keep the read and execute bits of their source
+OBJECT_MODE_MASK = 0o555
+DEFAULT_OBJECT_MODE = 0o444
+
+def object_key(digest: str, mode: int) -> str:
+    """Store key of a file: its content hash, plus its read/execute bits if they are not the default"""
+    mode &= OBJECT_MODE_MASK
+    return digest if mode == DEFAULT_OBJECT_MODE else f"{digest}-{mode:03o}"
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Clone src to dst with a copy-on-write reflink. Returns False if unsupported."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return True
+        except OSError:
+            pass
+    os.unlink(dst)
+    return False
+
+def _load_json(path: Path) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _write_json(path: Path, data: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+class SnapshotStore:
+    """Content-addressed store shared by all project snapshots under a base dir.
+
+    Every file is stored once under its SHA-256 hash (and its permission bits, so a
+    hardlinked script stays executable) and snapshots link to it, by reflink when the
+    filesystem supports it and by hardlink otherwise. Stored objects are read-only, so
+    a snapshot file has to be replaced (as editors and git do) rather than modified in
+    place. Hashes of source files are cached by size and mtime, so unchanged files are
+    never read twice.
+    """
+
+    def __init__(self, base_dir: Path, link_mode: str = "auto"):
+        self.root = Path(base_dir).expanduser() / STORE_DIR
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index_file = self.root / "index.json"
+        self.index = _load_json(self.index_file)
+        if link_mode not in ("auto", "reflink", "hardlink", "copy"):
+            raise ValueError(f"Unknown snapshot link mode '{link_mode}'")
+        self.link_mode = link_mode
+
+    def _object_path(self, key: str) -> Path:
+        return self.objects / key[:2] / key[2:]
+
+    def hash(self, path: Path, st: os.stat_result) -> str:
+        """Return the content hash of a source file, reusing the cached one if size and mtime match"""
+        key = str(path.resolve())
+        cached = self.index.get(key)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        digest = _hash_file(path)
+        self.index[key] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def add(self, path: Path, digest: str, mode: int = DEFAULT_OBJECT_MODE) -> Path:
+        """Make sure the content of path, with the read/execute bits of mode, is in the
+        store and return the object path"""
+        obj = self._object_path(object_key(digest, mode))
+        if not obj.exists():
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            tmp = obj.with_name(obj.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+            if not (self.link_mode in ("auto", "reflink") and _reflink(path, tmp)):
+                shutil.copyfile(path, tmp)
+            os.chmod(tmp, mode & OBJECT_MODE_MASK)
+            os.replace(tmp, obj)
+        return obj
+
+    def materialize(self, obj: Path, target: Path, mode: int):
+        """Place a stored object at target without copying its data where possible.
+
+        Reflinks and copies get mode; hardlinks share the mode of the object, which has
+        the read and execute bits of mode but no write bits.
+        """
+        if target.exists() or target.is_symlink():
+            target.unlink()
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if self.link_mode in ("auto", "reflink") and _reflink(obj, target):
+            os.chmod(target, mode)
+            return
+        if self.link_mode in ("auto", "hardlink"):
+            try:
+                os.link(obj, target)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP):
+                    raise
+        shutil.copyfile(obj, target)
+        os.chmod(target, mode)
+
+    def save(self):
+        _write_json(self.index_file, self.index)
+
+    def prune(self) -> dict:
+        """Remove objects that no snapshot manifest under the base dir references, and
+        drop cached hashes of source files that no longer exist.
+
+        Snapshots keep their own links to the data, so pruning never changes the files
+        of a snapshot. An object removed while another sync is still adding it is
+        simply stored again by the next sync that needs it.
+
+        Returns:
+            Dict with the number of "objects" and "bytes" removed from the store, and
+            the number of "index" entries dropped
+        """
+        referenced = set()
+        for manifest_file in self.root.parent.glob(f"*/{MANIFEST_FILE}"):
+            referenced.update(_load_json(manifest_file).values())
+        stats = {"objects": 0, "bytes": 0, "index": 0}
+        for obj in self.objects.glob("*/*"):
+            if obj.name.endswith(".tmp") or obj.parent.name + obj.name in referenced:
+                continue
+            try:
+                size = obj.stat().st_size
+                obj.unlink()
+            except OSError as e:
+                logger.warning(f"Failed to remove stored object {obj}: {e}")
+                continue
+            stats["objects"] += 1
+            stats["bytes"] += size
+        for fanout in self.objects.iterdir():
+            try:
+                fanout.rmdir()
+            except OSError:
+                pass  # still holds objects
+        for path in [path for path in self.index if not os.path.exists(path)]:
+            del self.index[path]
+            stats["index"] += 1
+        self.save()
+        return stats
+
+def sync_snapshot(source: Path, target: Path, link_mode: str = "auto", jobs: int = 8,
+                  max_file_size: int = None, prune: bool = False) -> dict:
+    """Create or update a snapshot of source at target.
+
+    Only files whose size, mtime or content changed since the last sync are touched.
+    Files that were removed from the source are removed from the snapshot, while files
+    created inside the snapshot (run outputs, logs) are left alone. Files are selected
+    with easysweeps.project_files.scan_project and processed on a thread pool.
+
+    Args:
+        source: Project directory to snapshot
+        target: Snapshot directory
+        link_mode: "auto" (reflink, else hardlink), "reflink", "hardlink" or "copy"
+        jobs: Number of files hashed and linked concurrently
+        max_file_size: Skip files larger than this many bytes
+        prune: Afterwards, remove store objects and cached hashes that are no longer
+            needed (see SnapshotStore.prune)
+
+    Returns:
+        Dict with the number of files "added", "updated", "removed" and "unchanged",
+        and with prune, the SnapshotStore.prune result under "pruned"
+    """
+    source, target = Path(source), Path(target)
+    store = SnapshotStore(target.parent, link_mode)
+    manifest_file = target / MANIFEST_FILE
+    old_manifest = _load_json(manifest_file)
+    files, skipped = scan_project(source, max_file_size=max_file_size)
+    for rel in skipped:
+        logger.warning(f"Skipping {rel}: larger than the maximum file size")
+
+    def sync_file(rel, st):
+        mode = stat.S_IMODE(st.st_mode)
+        digest = store.hash(source / rel, st)
+        key = object_key(digest, mode)
+        dst = target / rel
+        if old_manifest.get(rel) == key and dst.exists():
+            return key, "unchanged"
+        obj = store.add(source / rel, digest, mode)
+        store.materialize(obj, dst, mode)
+        return key, "updated" if rel in old_manifest else "added"
+
+    target.mkdir(parents=True, exist_ok=True)
+    results = run_parallel(sync_file, files, jobs, f"Syncing snapshot {target}")
+    new_manifest = {rel: key for (rel, _), (key, _) in zip(files, results)}
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+    for _, outcome in results:
+        stats[outcome] += 1
+
+    for key in set(old_manifest) - set(new_manifest):
+        stale = target / key
+        if stale.exists():
+            stale.unlink()
+        stats["removed"] += 1
+
+    store.save()
+    _write_json(manifest_file, new_manifest)
+    if prune:
+        stats["pruned"] = store.prune()
+    logger.debug(f"Synced snapshot {target}: {stats}")
+    return stats
@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import signal
+import time
+from pathlib import Path
+import click
+from .config import config
+from .registry import open_registry
+from .executors import get_executor
+from .render import yaml_load
+from .logs import LogRotator
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FILE = "queue.yaml"
+QUEUE_STATE_FILE = "queue_state.json"
+
+# States of a wandb sweep in which agents get no more runs
+FINISHED_SWEEP_STATES = ("FINISHED", "CANCELED")
+
+# Exit statuses of agents that were stopped by a signal (`ez kill`, Ctrl-C) rather than failing
+STOP_SIGNALS = (signal.SIGINT, signal.SIGTERM, signal.SIGKILL)
+
+def stopped_by_signal(returncode: int) -> bool:
+    """True if an exit status means the process was stopped (directly or through a shell)"""
+    return -returncode in STOP_SIGNALS or returncode - 128 in STOP_SIGNALS
+
+def sweep_finished(sweep_id: str, sweep_dir: Path = None):
+    """Whether a sweep has no runs left to hand out.
+
+    Local sweeps are checked in their state file, wandb sweeps by their state on the
+    sweep server.
+
+    Returns:
+        True or False, or None if the state of the sweep cannot be found out
+    """
+    from .local_sweeps import LocalSweep
+
+    local = LocalSweep(sweep_id, sweep_dir)
+    if local.exists():
+        return not local.has_runs_left()
+    try:
+        import wandb
+        state = wandb.Api(timeout=30).sweep(f"{config.get('entity')}/{config.get('project')}/{sweep_id}").state
+    except Exception as e:
+        logger.debug(f"Cannot get the state of sweep {sweep_id}: {e}")
+        return None
+    return str(state).upper() in FINISHED_SWEEP_STATES
+
+class QueuedSweep:
+    """A sweep in the queue and the agents the queue launched for it"""
+
+    def __init__(self, sweep_id, name, order, priority=0, max_agents=1):
+        self.sweep_id = sweep_id
+        self.name = name
+        self.order = order
+        self.priority = priority
+        self.max_agents = max_agents
+        self.state = "pending"  # pending, done or failed
+        self.failures = 0
+        self.clean_exits = 0  # agents that exited with status 0 while the sweep state was unknown
+        self.processes = {}  # unit -> Popen of agents launched by the queue
+
+def load_queue_file(path: Path) -> dict:
+    """Read queue.yaml: a default `max_agents` and per-sweep `priority`/`max_agents`
+    under `sweeps`, keyed by sweep ID or name"""
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return yaml_load(f) or {}
+
+class SweepQueue:
+    """Keep a fixed number of agent slots per GPU busy with the sweeps of the registry.
+
+    Every poll, agents launched by the queue that exited are reaped. When an agent exits
+    with status 0, the sweep is checked (see sweep_finished): a sweep with no runs left
+    is done and gets no new agents, while the slot of an agent that was only drained or
+    interrupted is filled again. If the sweep state cannot be checked, the sweep is
+    done after max_failures agents exited with status 0. Agents stopped by a signal
+    (`ez kill`) are not held against their sweep. An agent that exits with an error
+    counts as a failure, and a sweep that failed max_failures times is given up on.
+    Then the free slots (slots_per_gpu minus the agents running on each GPU, including
+    agents not started by the queue) are handed to the pending sweeps in order of
+    priority (higher first), then creation order, up to each sweep's agent cap.
+
+    The sweep list and queue.yaml are re-read every poll, so new sweeps are picked up
+    and priorities can be changed while the queue runs. Finished and failed sweeps are
+    remembered in sweep_dir/queue_state.json.
+    """
+
+    def __init__(self, gpus: list, slots_per_gpu: int = 1, max_agents: int = 1, max_failures: int = 3,
+                 ready_timeout: float = None, sweep_dir: Path = None, executor=None):
+        self.gpus = list(gpus)
+        self.slots_per_gpu = slots_per_gpu
+        self.max_agents = max_agents
+        self.max_failures = max_failures
+        self.ready_timeout = ready_timeout
+        self.sweep_dir = Path(sweep_dir or config.get("sweep_dir"))
+        self.executor = executor or get_executor()
+        self.sweeps = {}  # sweep_id -> QueuedSweep
+        self.state_file = self.sweep_dir / QUEUE_STATE_FILE
+        self._load_state()
+
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                self._state = json.load(f)
+        except (OSError, ValueError):
+            self._state = {}
+
+    def _save_state(self):
+        self._state = {
+            sweep_id: {"state": entry.state, "failures": entry.failures}
+            for sweep_id, entry in self.sweeps.items() if entry.state != "pending" or entry.failures
+        }
+        tmp = self.state_file.with_name(f".{QUEUE_STATE_FILE}.{os.getpid()}")
+        with open(tmp, "w") as f:
+            json.dump(self._state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def reset(self):
+        """Forget which sweeps finished or failed"""
+        self._state = {}
+        try:
+            self.state_file.unlink()
+        except FileNotFoundError:
+            pass
+
+    def refresh(self):
+        """Sync the queue with the registry and queue.yaml"""
+        settings = load_queue_file(self.sweep_dir / QUEUE_FILE)
+        overrides = settings.get("sweeps") or {}
+        default_cap = int(settings.get("max_agents", self.max_agents))
+        with open_registry(self.sweep_dir) as registry:
+            records = registry.all()
+        for order, record in enumerate(records):
+            entry = self.sweeps.get(record.sweep_id)
+            if entry is None:
+                entry = self.sweeps[record.sweep_id] = QueuedSweep(record.sweep_id, record.name, order)
+                saved = self._state.get(record.sweep_id) or {}
+                entry.state = saved.get("state", "pending")
+                entry.failures = saved.get("failures", 0)
+            override = overrides.get(record.sweep_id) or overrides.get(record.name) or {}
+            entry.priority = float(override.get("priority", 0))
+            entry.max_agents = int(override.get("max_agents", default_cap))
+
+    def ordered(self) -> list:
+        """Queued sweeps in launch order: highest priority first, then oldest first"""
+        return sorted(self.sweeps.values(), key=lambda entry: (-entry.priority, entry.order))
+
+    def reap(self):
+        """Collect agents launched by the queue that exited"""
+        changed = False
+        for entry in self.sweeps.values():
+            for unit, process in list(entry.processes.items()):
+                returncode = process.poll()
+                if returncode is None:
+                    continue
+                del entry.processes[unit]
+                changed |= self._agent_exited(entry, unit, returncode)
+        if changed:
+            self._save_state()
+
+    def _agent_exited(self, entry, unit, returncode) -> bool:
+        if entry.state != "pending":
+            return False
+        if returncode == 0:
+            finished = sweep_finished(entry.sweep_id, self.sweep_dir)
+            if finished is None:
+                entry.clean_exits += 1
+                finished = entry.clean_exits >= self.max_failures
+            if not finished:
+                logger.info(f"Agent {unit} stopped before sweep {entry.sweep_id} was finished")
+                return False
+            entry.state = "done"
+            click.echo(f"Sweep {entry.name} ({entry.sweep_id}) has no runs left")
+        elif stopped_by_signal(returncode):
+            logger.info(f"Agent {unit} was stopped")
+            return False
+        else:
+            entry.failures += 1
+            logger.warning(f"Agent {unit} exited with code {returncode}")
+            if entry.failures >= self.max_failures:
+                entry.state = "failed"
+                click.echo(click.style(f"Sweep {entry.name} ({entry.sweep_id}) failed {entry.failures} times, "
+                                       f"skipping it", fg="red"))
+        return True
+
+    def plan(self, units) -> list:
+        """Assign the free GPU slots to pending sweeps.
+
+        Args:
+            units: AgentUnit records of the running agents
+
+        Returns:
+            List of (QueuedSweep, list of GPU indices) to launch
+        """
+        free = {gpu: self.slots_per_gpu for gpu in self.gpus}
+        running = {}
+        for unit in units:
+            if not unit.running:
+                continue
+            running[unit.sweep_id] = running.get(unit.sweep_id, 0) + 1
+            if unit.gpu in free:
+                free[unit.gpu] -= 1
+        plan = []
+        for entry in self.ordered():
+            if entry.state != "pending":
+                continue
+            placement = []
+            for _ in range(entry.max_agents - running.get(entry.sweep_id, 0)):
+                gpu = max(free, key=lambda index: (free[index], -index), default=None)
+                if gpu is None or free[gpu] <= 0:
+                    break
+                free[gpu] -= 1
+                placement.append(gpu)
+            if placement:
+                plan.append((entry, placement))
+        return plan
+
+    def launch(self, entry, placement):
+        from .launch_agents import launch_agents, agent_args
+
+        try:
+            launches = launch_agents(agent_args(entry.sweep_id, placement=placement,
+                                                ready_timeout=self.ready_timeout))
+        except Exception as e:
+            logger.error(f"Failed to launch agents for {entry.sweep_id}: {e}")
+            entry.failures += 1
+            launches = []
+        for launch in launches:
+            if launch.ready:
+                entry.processes[launch.unit] = launch.process
+            elif launch.process is not None and launch.process.poll() is not None:
+                self._agent_exited(entry, launch.unit, launch.process.returncode)
+            else:
+                entry.failures += 1
+        if entry.state == "pending" and entry.failures >= self.max_failures:
+            entry.state = "failed"
+        self._save_state()
+
+    def poll(self) -> int:
+        """Reap exited agents and fill the free slots. Returns the number of agents launched."""
+        self.refresh()
+        self.reap()
+        launched = 0
+        for entry, placement in self.plan(self.executor.list_units()):
+            click.echo(f"Launching {len(placement)} agents for {entry.name} ({entry.sweep_id}) "
+                       f"on GPUs {','.join(map(str, placement))}")
+            self.launch(entry, placement)
+            launched += len(placement)
+        return launched
+
+    @property
+    def finished(self) -> bool:
+        """True when no sweep is waiting for agents and no agent of the queue is running"""
+        return all((entry.state != "pending" or entry.max_agents <= 0) and not entry.processes
+                   for entry in self.sweeps.values())
+
+    def run(self, interval: float = 2.0):
+        """Poll until every sweep is done or failed, rotating agent logs on the way"""
+        rotator = LogRotator()
+        while True:
+            self.poll()
+            rotator.poll()
+            if self.finished:
+                return
+            time.sleep(interval)
@@ -0,0 +1,167 @@
+import fcntl
+import logging
+import math
+import struct
+import time
+from collections import namedtuple, defaultdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"EZTL"
+VERSION = 1
+
+# magic, version, record size, capacity, total records ever written
+HEADER = struct.Struct("<4sHHIQ")
+# timestamp, interval, sweep_id, gpu, agent, cpu %, rss MiB, gpu utilization %, gpu memory used MiB
+RECORD = struct.Struct("<df16sHHffff")
+
+Sample = namedtuple("Sample", ["timestamp", "interval", "sweep_id", "gpu", "agent",
+                               "cpu_percent", "rss_mb", "gpu_util", "gpu_mem_mb"])
+
+class TelemetryFile:
+    """Fixed-size ring buffer of fixed-width agent samples.
+
+    The file holds a small header followed by `capacity` records of RECORD.size bytes.
+    Once it is full, the oldest records are overwritten, so the file never grows past
+    HEADER.size + capacity * RECORD.size bytes. Writers and readers take an flock on
+    the file. Missing GPU values are stored as NaN.
+    """
+
+    def __init__(self, path: Path, capacity: int = 200000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if not self.path.exists() or self.path.stat().st_size < HEADER.size:
+            with open(self.path, "wb") as f:
+                f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, 0))
+                f.truncate(HEADER.size + capacity * RECORD.size)
+        with open(self.path, "rb") as f:
+            magic, version, record_size, self.capacity, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"{self.path} is not an easysweeps telemetry file")
+
+    def append(self, samples):
+        """Write samples, overwriting the oldest ones when the buffer is full"""
+        samples = list(samples)
+        if not samples:
+            return
+        with open(self.path, "r+b") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            header = HEADER.unpack(f.read(HEADER.size))
+            written = header[4]
+            for sample in samples:
+                f.seek(HEADER.size + (written % self.capacity) * RECORD.size)
+                f.write(RECORD.pack(
+                    sample.timestamp, sample.interval, sample.sweep_id.encode()[:16],
+                    sample.gpu, sample.agent, sample.cpu_percent, sample.rss_mb,
+                    sample.gpu_util, sample.gpu_mem_mb
+                ))
+                written += 1
+            f.seek(0)
+            f.write(HEADER.pack(*header[:4], written))
+
+    def read(self, since: float = None) -> list:
+        """Return the stored samples in chronological order, optionally only those after `since`"""
+        with open(self.path, "rb") as f:
+            fcntl.flock(f, fcntl.LOCK_SH)
+            written = HEADER.unpack(f.read(HEADER.size))[4]
+            count = min(written, self.capacity)
+            data = f.read(self.capacity * RECORD.size)
+        start = written % self.capacity if written > self.capacity else 0
+        samples = []
+        for i in range(count):
+            offset = ((start + i) % self.capacity) * RECORD.size
+            ts, interval, sweep_id, gpu, agent, cpu, rss, util, mem = RECORD.unpack_from(data, offset)
+            if since is not None and ts < since:
+                continue
+            samples.append(Sample(ts, interval, sweep_id.rstrip(b"\0").decode(), gpu, agent, cpu, rss, util, mem))
+        return samples
+
+def record_samples(telemetry: TelemetryFile, interval: float, count: int = None):
+    """Sample all running agents every `interval` seconds and append them to the telemetry file.
+
+    Args:
+        telemetry: Telemetry file to write to
+        interval: Seconds between samples
+        count: Stop after this many samples (default: run forever)
+    """
+    from .monitor import AgentMonitor
+    from .executors import get_executor
+    from .gpus import query_gpus
+    from .logs import LogRotator
+
+    executor = get_executor()
+    monitor = AgentMonitor(executor)
+    rotator = LogRotator()
+    taken = 0
+    last = time.time()
+    while count is None or taken < count:
+        time.sleep(max(0.0, last + interval - time.time()))
+        now = time.time()
+        elapsed, last = now - last, now
+
+        rotator.poll()
+        units = [unit for unit in executor.list_units() if unit.running]
+        usage = monitor.sample(units)
+        try:
+            gpus = {gpu.index: gpu for gpu in query_gpus()}
+        except RuntimeError as e:
+            logger.debug(f"No GPU data: {e}")
+            gpus = {}
+
+        samples = []
+        for unit in units:
+            agent_usage = usage.get(unit.unit, {})
+            gpu = gpus.get(unit.gpu)
+            samples.append(Sample(
+                now, elapsed, unit.sweep_id, unit.gpu, unit.agent,
+                agent_usage.get("cpu_percent", 0.0), agent_usage.get("rss", 0) / 2 ** 20,
+                gpu.utilization if gpu else math.nan,
+                gpu.memory_total - gpu.memory_free if gpu else math.nan,
+            ))
+        telemetry.append(samples)
+        taken += 1
+
+def summarize(samples, idle_gpu_util: float = 5.0, idle_cpu_percent: float = 5.0, idle_fraction: float = 0.5):
+    """Summarize GPU time per sweep and find idle agents.
+
+    Every sample stands for `interval` seconds of the agent's GPU. When several agents
+    share a GPU at the same moment, that GPU time is split between them. The share is
+    counted as used in proportion to the GPU utilization and as idle for the rest.
+
+    An agent is flagged as idle when at least `idle_fraction` of its samples had GPU
+    utilization below `idle_gpu_util` and CPU usage below `idle_cpu_percent`.
+
+    Returns:
+        Tuple (sweeps, idle_agents): sweeps maps sweep_id to a dict with "gpu_hours",
+        "used_hours", "idle_hours" and "agents"; idle_agents is a list of
+        (sweep_id, gpu, agent, idle_hours, idle_share) tuples
+    """
+    agents_per_gpu = defaultdict(int)
+    for s in samples:
+        agents_per_gpu[(s.timestamp, s.gpu)] += 1
+
+    sweeps = defaultdict(lambda: {"gpu_hours": 0.0, "used_hours": 0.0, "idle_hours": 0.0, "agents": set()})
+    agents = defaultdict(lambda: [0, 0, 0.0])  # samples, idle samples, idle seconds
+    for s in samples:
+        hours = s.interval / 3600 / agents_per_gpu[(s.timestamp, s.gpu)]
+        util = 0.0 if math.isnan(s.gpu_util) else min(s.gpu_util, 100.0) / 100
+        sweep = sweeps[s.sweep_id]
+        sweep["gpu_hours"] += hours
+        sweep["used_hours"] += hours * util
+        sweep["idle_hours"] += hours * (1 - util)
+        sweep["agents"].add((s.gpu, s.agent))
+
+        stats = agents[(s.sweep_id, s.gpu, s.agent)]
+        stats[0] += 1
+        if (math.isnan(s.gpu_util) or s.gpu_util < idle_gpu_util) and s.cpu_percent < idle_cpu_percent:
+            stats[1] += 1
+            stats[2] += s.interval
+
+    idle_agents = [
+        (sweep_id, gpu, agent, idle_seconds / 3600, idle / total)
+        for (sweep_id, gpu, agent), (total, idle, idle_seconds) in sorted(agents.items())
+        if total and idle / total >= idle_fraction
+    ]
+    return dict(sweeps), idle_agents
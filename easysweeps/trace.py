@@ -0,0 +1,119 @@
+import json
+import os
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+class Tracer:
+    """Record timed spans of easysweeps operations.
+
+    Tracing is off by default and `span` is then a no-op. Once enabled, every span is
+    kept as a Chrome trace-event ("complete" event), and every `subprocess.run` call
+    (which also covers `check_output` and `call`) gets a span of its own, so the
+    time spent in `wandb`, `systemctl`, `systemd-run` or `conda` shows up without
+    instrumenting each call site.
+
+    The trace can be opened in chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.thread_names = {}
+        self._origin = time.perf_counter()
+        self._run = None
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self._origin = time.perf_counter()
+        self._run = subprocess.run
+        subprocess.run = self._traced_run
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        subprocess.run = self._run
+
+    def _traced_run(self, *popenargs, **kwargs):
+        cmd = popenargs[0] if popenargs else kwargs.get("args")
+        with self.span(command_label(cmd), "subprocess", cmd=_command_text(cmd)) as args:
+            result = self._run(*popenargs, **kwargs)
+            args["returncode"] = result.returncode
+            return result
+
+    @contextmanager
+    def span(self, name: str, category: str = "easysweeps", **args):
+        """Time the enclosed block. Yields a dict that may be filled with more span arguments."""
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            self.thread_names[thread.ident] = thread.name
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": args,
+            })
+
+    def write(self, path: Path):
+        """Write the recorded spans as a Chrome trace-event JSON file"""
+        metadata = [{"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": "easysweeps"}}]
+        metadata += [
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+            for tid, name in self.thread_names.items()
+        ]
+        with open(path, "w") as f:
+            json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, limit: int = 15) -> list:
+        """Aggregate spans by name.
+
+        Returns:
+            List of (name, count, total_ms, max_ms) tuples, slowest total first
+        """
+        totals = defaultdict(lambda: [0, 0.0, 0.0])
+        for event in self.events:
+            stats = totals[event["name"]]
+            stats[0] += 1
+            stats[1] += event["dur"] / 1000
+            stats[2] = max(stats[2], event["dur"] / 1000)
+        rows = [(name, count, total, longest) for name, (count, total, longest) in totals.items()]
+        return sorted(rows, key=lambda row: row[2], reverse=True)[:limit]
+
+def command_label(cmd) -> str:
+    """Short name of a command for span names, e.g. `systemctl list-units` or `wandb sweep`"""
+    if isinstance(cmd, str):
+        parts = cmd.split()
+    else:
+        parts = [str(part) for part in cmd or []]
+    if not parts:
+        return "subprocess"
+    label = os.path.basename(parts[0])
+    for part in parts[1:4]:
+        if not part.startswith("-"):
+            return f"{label} {part}"
+    return label
+
+def _command_text(cmd, limit: int = 300) -> str:
+    text = cmd if isinstance(cmd, str) else " ".join(str(part) for part in cmd or [])
+    return text if len(text) <= limit else text[:limit] + "..."
+
+# Global tracer instance, enabled by `easysweeps --trace/--timings`
+tracer = Tracer()
+span = tracer.span
@@ -0,0 +1,103 @@
+import logging
+import subprocess
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+UNIT_PREFIX = "wandb-agent-"
+UNIT_SUFFIX = ".scope"
+
+# Maximum number of units passed to a single `systemctl stop` call
+STOP_BATCH_SIZE = 500
+
+class AgentUnit(namedtuple("AgentUnit", ["unit", "sweep_id", "gpu", "agent", "active", "sub"])):
+    """A wandb agent scope unit as reported by systemd"""
+
+    __slots__ = ()
+
+    @property
+    def running(self) -> bool:
+        return self.active == "active"
+
+def unit_name(sweep_id: str, gpu: int, agent: int) -> str:
+    """Return the systemd scope unit name for an agent"""
+    return f"{UNIT_PREFIX}{sweep_id}-{gpu}-{agent}{UNIT_SUFFIX}"
+
+def parse_unit_name(unit: str):
+    """Parse `wandb-agent-{sweep_id}-{gpu}-{agent}.scope` into (sweep_id, gpu, agent).
+
+    Returns:
+        Tuple of (sweep_id, gpu, agent), or None if the name does not match
+    """
+    if not unit.startswith(UNIT_PREFIX) or not unit.endswith(UNIT_SUFFIX):
+        return None
+    try:
+        sweep_id, gpu, agent = unit[len(UNIT_PREFIX):-len(UNIT_SUFFIX)].rsplit("-", 2)
+        return sweep_id, int(gpu), int(agent)
+    except ValueError:
+        return None
+
+def parse_list_units(output: str) -> list:
+    """Parse `systemctl list-units --plain --no-legend` output into AgentUnit records"""
+    units = []
+    for line in output.splitlines():
+        # Columns: UNIT LOAD ACTIVE SUB DESCRIPTION...
+        parts = line.split(None, 4)
+        if len(parts) < 4:
+            continue
+        parsed = parse_unit_name(parts[0])
+        if parsed is None:
+            continue
+        sweep_id, gpu, agent = parsed
+        units.append(AgentUnit(parts[0], sweep_id, gpu, agent, parts[2], parts[3]))
+    return units
+
+def list_agent_units(sweep_id: str = None, gpu: int = None) -> list:
+    """Query systemd once for all agent scope units.
+
+    Args:
+        sweep_id: Only return agents of this sweep
+        gpu: Only return agents bound to this GPU
+
+    Returns:
+        List of AgentUnit records sorted by (sweep_id, gpu, agent)
+    """
+    result = subprocess.run(
+        ['systemctl', '--user', 'list-units', '--type=scope', '--all',
+         '--plain', '--no-legend', '--no-pager', f'{UNIT_PREFIX}*'],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        logger.warning(f"systemctl list-units failed: {result.stderr.strip()}")
+    units = parse_list_units(result.stdout)
+    if sweep_id is not None:
+        units = [u for u in units if u.sweep_id == sweep_id]
+    if gpu is not None:
+        units = [u for u in units if u.gpu == int(gpu)]
+    return sorted(units, key=lambda u: (u.sweep_id, u.gpu, u.agent))
+
+def stop_units(units) -> int:
+    """Stop agent units with as few `systemctl stop` calls as possible.
+
+    Args:
+        units: Iterable of AgentUnit records or unit names
+
+    Returns:
+        Number of units that were requested to stop
+    """
+    names = [u.unit if isinstance(u, AgentUnit) else u for u in units]
+    for start in range(0, len(names), STOP_BATCH_SIZE):
+        batch = names[start:start + STOP_BATCH_SIZE]
+        result = subprocess.run(
+            ['systemctl', '--user', '--no-pager', 'stop', *batch],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            logger.warning(f"systemctl stop failed: {result.stderr.strip()}")
+    return len(names)
+
+def reset_failed_units(units):
+    """Clear the failed state of units so their names can be used again"""
+    names = [u.unit if isinstance(u, AgentUnit) else u for u in units]
+    if names:
+        subprocess.run(['systemctl', '--user', 'reset-failed', *names], capture_output=True, text=True)
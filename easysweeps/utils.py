@@ -59,14 +59,26 @@ def setup_logging(log_dir: Path = Path("logs"), level=logging.INFO):
 def copy_project_for_sweep(sweep_id: str, base_dir: Path, force_recopy: bool = False) -> Path:
     """Copy the project directory to a new location for a specific sweep.
     
+    Files matched by the project's .gitignore and .easysweepsignore files (and by
+    DEFAULT_IGNORE_PATTERNS) are not copied, nor are files larger than
+    `copy_max_file_size_mb`. Files are copied on `copy_jobs` threads.
+
+    With `project_copy_mode: snapshot` in ez_config.yaml, the copy is a snapshot whose
+    files are linked from a content-addressed store shared by all sweeps (see
+    easysweeps.snapshot), and force_recopy re-syncs only the files that changed.
+
     Args:
         sweep_id: The sweep ID to use in the directory name
         base_dir: The base directory where the project copy will be created
-        force_recopy: If True, will remove existing directory before copying
+        force_recopy: If True, will remove existing directory before copying (or
+            re-sync it and prune the snapshot store in snapshot mode)
         
     Returns:
         Path to the new project directory
     """
+    from .snapshot import sync_snapshot
+    from .project_files import copy_project
+
     logger = logging.getLogger(__name__)
     
     # Expand the home directory if present
@@ -77,6 +89,27 @@ def copy_project_for_sweep(sweep_id: str, base_dir: Path, force_recopy: bool = F
     
     # Create the target directory with project name and sweep ID
     target_dir = base_dir / f"{project_name}_{sweep_id}"
+
+    # Files matched by .gitignore / .easysweepsignore or over the size limit are skipped
+    copy_jobs = int(config.get("copy_jobs", 8))
+    max_size_mb = config.get("copy_max_file_size_mb")
+    max_file_size = int(float(max_size_mb) * 1024 * 1024) if max_size_mb is not None else None
+
+    if config.get("project_copy_mode", "copy") == "snapshot":
+        if target_dir.exists() and not force_recopy:
+            logger.warning(f"Target directory {target_dir} already exists, using it")
+            return target_dir
+        stats = sync_snapshot(Path.cwd(), target_dir,
+                              link_mode=config.get("snapshot_link_mode", "auto"),
+                              jobs=copy_jobs, max_file_size=max_file_size, prune=force_recopy)
+        logger.info(f"Synced project snapshot {target_dir}: {stats['added']} added, "
+                    f"{stats['updated']} updated, {stats['removed']} removed, {stats['unchanged']} unchanged")
+        if "pruned" in stats:
+            pruned = stats["pruned"]
+            logger.info(f"Pruned snapshot store: {pruned['objects']} objects "
+                        f"({pruned['bytes'] / 1024 / 1024:.1f} MB) removed")
+        return target_dir
+
     if target_dir.exists():
         if force_recopy:
             logger.info(f"Force recopy enabled, removing existing directory {target_dir}")
@@ -90,12 +123,7 @@ def copy_project_for_sweep(sweep_id: str, base_dir: Path, force_recopy: bool = F
     
     # Copy the project directory
     try:
-        shutil.copytree(current_dir, target_dir, 
-                       ignore=shutil.ignore_patterns(
-                           '.git', '__pycache__', '*.pyc', 
-                           '*.pyo', '*.pyd', '.pytest_cache',
-                           '*.egg-info', 'dist', 'build'
-                       ))
+        copy_project(current_dir, target_dir, jobs=copy_jobs, max_file_size=max_file_size)
         logger.debug(f"Successfully copied project to {target_dir}")
         return target_dir
     except Exception as e:
@@ -0,0 +1,198 @@
+import itertools
+import logging
+import random
+from functools import reduce
+
+# Keys of a variants file that configure the expansion instead of defining an axis
+ZIP_KEY = "_zip"
+EXCLUDE_KEY = "_exclude"
+INCLUDE_KEY = "_include"
+SAMPLE_KEY = "_sample"
+
+# Seed of `_sample` when none is given, so every expansion draws the same combinations
+DEFAULT_SAMPLE_SEED = 0
+
+logger = logging.getLogger(__name__)
+
+class VariantSpec:
+    """Lazy expansion of a variants file into variant combinations.
+
+    Every non-reserved key of the variants file is a list of values, and the
+    combinations are the Cartesian product of those lists. The expansion can be
+    adjusted with reserved keys:
+
+    - `_zip`: list of key groups, e.g. `[[model, batch_size]]`. Keys of a group advance
+      together instead of forming a product, so their lists must have the same length.
+    - `_exclude`: list of partial combinations, e.g. `[{dataset: coco, model: vit}]`.
+      A combination matching all keys of a rule is dropped. A rule value may be a list,
+      in which case any of its values matches.
+    - `_include`: list of full combinations that are added after the product.
+    - `_sample`: `{n: 20, method: random|lhs, seed: 0}` to create only n combinations,
+      drawn uniformly at random or by Latin hypercube sampling over the value indices
+      of each axis. The seed defaults to DEFAULT_SAMPLE_SEED, so the same variants
+      file always gives the same combinations and re-running `ez sweep` finds them
+      unchanged. Change the seed to draw a different subset. Latin hypercube rows that
+      repeat an earlier combination are dropped with a warning, so `lhs` can yield
+      fewer than n combinations, e.g. when n is larger than the product. Excluded
+      combinations are skipped in both methods, and `n: 0` or an axis without values
+      yields no sampled combinations.
+
+    Combinations are generated on demand. The product is never materialized, so
+    variant files with a very large number of raw combinations cost nothing up front.
+    """
+
+    def __init__(self, variants: dict):
+        variants = dict(variants or {})
+        zip_groups = [list(group) for group in variants.pop(ZIP_KEY, None) or []]
+        self.excludes = list(variants.pop(EXCLUDE_KEY, None) or [])
+        self.includes = list(variants.pop(INCLUDE_KEY, None) or [])
+        self.sample = variants.pop(SAMPLE_KEY, None)
+        for key, values in variants.items():
+            if not isinstance(values, (list, tuple)):
+                raise ValueError(f"Variant '{key}' must be a list of values")
+
+        # Each axis is (keys, list of value tuples), in the order of the variants file.
+        # A zipped group takes the position of its first key.
+        group_of = {}
+        for group in zip_groups:
+            missing = [key for key in group if key not in variants]
+            if missing:
+                raise ValueError(f"Zipped variant keys not found: {', '.join(missing)}")
+            lengths = {len(variants[key]) for key in group}
+            if len(lengths) != 1:
+                raise ValueError(f"Zipped variants {', '.join(group)} must have the same number of values")
+            for key in group:
+                group_of[key] = tuple(group)
+        self.axes = []
+        seen_groups = set()
+        for key in variants:
+            group = group_of.get(key, (key,))
+            if group in seen_groups:
+                continue
+            seen_groups.add(group)
+            self.axes.append((group, list(zip(*(variants[k] for k in group)))))
+
+    @property
+    def keys(self) -> list:
+        return [key for keys, _ in self.axes for key in keys]
+
+    @property
+    def raw_count(self) -> int:
+        """Number of combinations in the product, before exclusion and sampling"""
+        return reduce(lambda n, axis: n * len(axis[1]), self.axes, 1) if self.axes else 0
+
+    def _combo(self, value_indices) -> dict:
+        combo = {}
+        for (keys, values), index in zip(self.axes, value_indices):
+            combo.update(zip(keys, values[index]))
+        return combo
+
+    def _decode(self, index: int) -> dict:
+        """Map a flat index of the product to its combination (last axis varies fastest)"""
+        value_indices = []
+        for _, values in reversed(self.axes):
+            index, rest = divmod(index, len(values))
+            value_indices.append(rest)
+        return self._combo(reversed(value_indices))
+
+    def excluded(self, combo: dict) -> bool:
+        for rule in self.excludes:
+            if all(
+                combo.get(key) in value if isinstance(value, list) else combo.get(key) == value
+                for key, value in rule.items()
+            ):
+                return True
+        return False
+
+    def _product(self):
+        if not self.axes:
+            return
+        for value_indices in itertools.product(*(range(len(values)) for _, values in self.axes)):
+            yield self._combo(value_indices)
+
+    def _random(self, n: int, rng: random.Random):
+        total = self.raw_count
+        if total <= 4 * n:
+            indices = list(range(total))
+            rng.shuffle(indices)
+        else:
+            # Rejection sampling of unique indices, without materializing the range
+            def draw():
+                seen = set()
+                while len(seen) < total:
+                    index = rng.randrange(total)
+                    if index not in seen:
+                        seen.add(index)
+                        yield index
+            indices = draw()
+        produced = 0
+        for index in indices:
+            combo = self._decode(index)
+            if self.excluded(combo):
+                continue
+            yield combo
+            produced += 1
+            if produced >= n:
+                return
+
+    def _latin_hypercube(self, n: int, rng: random.Random):
+        # Split every axis into n strata and pick each stratum once per axis
+        columns = []
+        for _, values in self.axes:
+            k = len(values)
+            column = [min(k - 1, (j * k) // n) for j in range(n)]
+            rng.shuffle(column)
+            columns.append(column)
+        seen = set()
+        duplicates = 0
+        for value_indices in zip(*columns):
+            if value_indices in seen:
+                duplicates += 1
+                continue
+            seen.add(value_indices)
+            combo = self._combo(value_indices)
+            if not self.excluded(combo):
+                yield combo
+        if duplicates:
+            logger.warning(
+                f"Latin hypercube sampling drew {duplicates} duplicate combinations, "
+                f"which were dropped ({n - duplicates} of {n} remain before exclusion)"
+            )
+
+    def __iter__(self):
+        """Yield the variant combinations as dicts"""
+        if self.sample:
+            n = int(self.sample["n"])
+            rng = random.Random(self.sample.get("seed", DEFAULT_SAMPLE_SEED))
+            method = self.sample.get("method", "random")
+            if method == "random":
+                sampler = self._random
+            elif method == "lhs":
+                sampler = self._latin_hypercube
+            else:
+                raise ValueError(f"Unknown sampling method '{method}', expected 'random' or 'lhs'")
+            if n > 0 and self.raw_count:
+                yield from sampler(n, rng)
+        else:
+            for combo in self._product():
+                if not self.excluded(combo):
+                    yield combo
+        yield from (dict(combo) for combo in self.includes)
+
+    def count(self) -> int:
+        """Number of combinations __iter__ yields. Only iterates when exclusion or sampling requires it."""
+        if not self.excludes and not self.sample:
+            return self.raw_count + len(self.includes)
+        return sum(1 for _ in self)
+
+    def max_count(self) -> tuple:
+        """Upper bound of count() that never iterates over the product.
+
+        Returns:
+            Tuple (count, exact): the bound, and whether it is the exact count (it is
+            unless `_exclude` or `_sample` may drop combinations)
+        """
+        raw = self.raw_count
+        if self.sample:
+            raw = min(raw, max(0, int(self.sample["n"])))
+        return raw + len(self.includes), not self.excludes and not self.sample
@@ -0,0 +1,173 @@
+import gc
+import importlib
+import logging
+import os
+import random
+import signal
+import subprocess
+import sys
+import traceback
+from .config import config
+from .local_sweeps import prepare_run, agent_name, stop_after_current_run
+
+logger = logging.getLogger(__name__)
+
+# Exit status of a worker that ran its share of trials and should be replaced by a fresh process
+RECYCLE_EXIT = 75
+
+# Signal the runner forwards to its worker to stop after the current trial. It is not
+# SIGINT so that a Ctrl-C in a terminal, which reaches both, does not count twice.
+STOP_SIGNAL = signal.SIGUSR1
+
+def load_entry_point(spec: str):
+    """Import a `module:function` entry point (e.g. `train:main`) from the project directory"""
+    module_name, _, attr = spec.partition(":")
+    if not module_name or not attr:
+        raise ValueError(f"Entry point must look like module:function, got '{spec}'")
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    entry = importlib.import_module(module_name)
+    for part in attr.split("."):
+        entry = getattr(entry, part)
+    return entry
+
+def reset_trial_state(failed: bool = False):
+    """Reset what a trial leaves behind so the next one starts like in a fresh process.
+
+    Finishes a wandb run the trial left open, collects garbage, reseeds the Python,
+    NumPy and PyTorch RNGs from fresh entropy and releases cached CUDA memory. Libraries
+    the trial never imported are not touched.
+    """
+    wandb = sys.modules.get("wandb")
+    if wandb is not None and getattr(wandb, "run", None) is not None:
+        wandb.finish(exit_code=1 if failed else 0)
+    gc.collect()
+    random.seed()
+    numpy = sys.modules.get("numpy")
+    if numpy is not None:
+        numpy.random.seed()
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.seed()
+        if torch.cuda.is_available() and torch.cuda.is_initialized():
+            torch.cuda.empty_cache()
+
+def call_trial(entry) -> int:
+    """Call the entry point once and return an exit status, like a process running it would"""
+    try:
+        entry()
+        return 0
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except Exception:
+        traceback.print_exc()
+        return 1
+
+def local_worker(entry, sweep, count: int = None, echo=print) -> int:
+    """Run trials of a local sweep in this process.
+
+    Each trial gets the environment variables and sys.argv its process would get from
+    `easysweeps local-agent`, restored afterwards. After a failed trial the worker
+    exits so the next trial starts in a fresh process.
+
+    Returns:
+        Exit status for the runner: 0 when the sweep is done or a stop was requested,
+        RECYCLE_EXIT when a fresh worker should continue
+    """
+    agent = agent_name()
+    program = str(sweep.config.get("program", ""))
+    done = 0
+    with stop_after_current_run(echo) as stopping:
+        signal.signal(STOP_SIGNAL, lambda *_: stopping.append(True))
+        while not stopping and (count is None or done < count):
+            run = sweep.next_run(agent)
+            if run is None:
+                echo(f"easysweeps: Sweep {sweep.sweep_id} has no runs left")
+                return 0
+            command, env = prepare_run(sweep, run)
+            saved_environ, saved_argv = dict(os.environ), sys.argv
+            os.environ.update(env)
+            sys.argv = command[command.index(program):] if program in command else [program]
+            echo(f"easysweeps: Starting trial {run.run_id} in process {os.getpid()}")
+            try:
+                exit_code = call_trial(entry)
+                reset_trial_state(failed=exit_code != 0)
+            finally:
+                os.environ.clear()
+                os.environ.update(saved_environ)
+                sys.argv = saved_argv
+            sweep.finish_run(run.run_id, exit_code)
+            echo(f"easysweeps: Trial {run.run_id} {'finished' if exit_code == 0 else f'failed with exit code {exit_code}'}")
+            done += 1
+            if exit_code != 0:
+                return RECYCLE_EXIT
+    return 0 if stopping else RECYCLE_EXIT
+
+def wandb_worker(entry, sweep_id: str, count: int = None, echo=print) -> int:
+    """Run trials of a wandb sweep in this process with `wandb.agent(function=...)`.
+
+    Returns:
+        Exit status for the runner, see local_worker
+    """
+    import wandb
+
+    stopping = []
+    trials = []
+    signal.signal(STOP_SIGNAL, lambda *_: stopping.append(True))
+
+    def trial():
+        exit_code = call_trial(entry)
+        reset_trial_state(failed=exit_code != 0)
+        trials.append(exit_code)
+        if stopping:
+            # The run is finished; leave before the agent asks for another one
+            echo("easysweeps: Stopping after the current trial")
+            sys.stdout.flush()
+            os._exit(0)
+
+    wandb.agent(sweep_id, function=trial, entity=config.get("entity"), project=config.get("project"), count=count)
+    return RECYCLE_EXIT if count is not None and len(trials) >= count else 0
+
+def run_warm_agent(worker_command: list, max_crashes: int = 3, echo=print) -> int:
+    """Run worker processes one after another until the sweep is done.
+
+    A worker exiting with RECYCLE_EXIT is replaced by a fresh one. A worker that
+    crashes (any other non-zero status, e.g. a segfault in native code) is replaced too,
+    until max_crashes workers crashed in a row. The first SIGINT is forwarded to the
+    worker as STOP_SIGNAL, so it stops after the trial in progress.
+
+    Returns:
+        Exit status of the agent
+    """
+    stopping = []
+    worker = None
+
+    def on_sigint(signum, frame):
+        if stopping:
+            raise KeyboardInterrupt
+        stopping.append(True)
+        echo("easysweeps: Ctrl + C detected. Stopping after the current trial.")
+        if worker is not None and worker.poll() is None:
+            worker.send_signal(STOP_SIGNAL)
+
+    previous = signal.signal(signal.SIGINT, on_sigint)
+    crashes = 0
+    try:
+        while not stopping:
+            worker = subprocess.Popen(worker_command)
+            returncode = worker.wait()
+            if returncode == 0:
+                return 0
+            if returncode == RECYCLE_EXIT:
+                crashes = 0
+                continue
+            crashes += 1
+            echo(f"easysweeps: Worker exited with code {returncode}")
+            if crashes >= max_crashes:
+                echo(f"easysweeps: {crashes} workers crashed in a row, giving up")
+                return returncode
+    finally:
+        signal.signal(signal.SIGINT, previous)
+    return 0
@@ -0,0 +1,99 @@
+"""Measure how fast sweep configs are rendered and written.
+
+Compares the old approach (deepcopy of the template and the pure-Python YAML dumper
+for every combination) with the compiled template renderer and the libyaml dumper
+used by `easysweeps sweep`. The template has nested parameters and placeholders in
+the name, program and command, so every kind of slot is exercised.
+
+Usage:
+    python scripts/bench_render.py [--combos 2000] [--params 50] [--repeat 5]
+"""
+import argparse
+import io
+import statistics
+import time
+from copy import deepcopy
+
+import yaml
+
+from easysweeps.render import compile_template, yaml_dump, YamlDumper
+from easysweeps.variants import VariantSpec
+
+def make_template(num_params):
+    parameters = {f"p{i}": {"values": list(range(10))} for i in range(num_params)}
+    parameters["lr"] = {"value": None}
+    parameters["optimizer"] = {"parameters": {"momentum": {"value": None}, "eps": {"value": 1e-8}}}
+    return {
+        "name": "run_lr{lr:.0e}_m{optimizer.momentum}",
+        "program": "train.py",
+        "method": "grid",
+        "metric": {"name": "val_loss", "goal": "minimize"},
+        "command": ["${env}", "${interpreter}", "${program}", "--tag=lr{lr}", "${args}"],
+        "parameters": parameters,
+    }
+
+def make_spec(num_combos):
+    lrs = [10 ** -(i % 7 + 1) * (i // 7 + 1) for i in range(max(1, num_combos // 4))]
+    return VariantSpec({"lr": lrs, "optimizer.momentum": [0.0, 0.5, 0.9, 0.99]})
+
+def render_old(template, combo):
+    # Pre-compilation renderer, extended by hand to the same slots for a fair comparison
+    sweep_config = deepcopy(template)
+    sweep_config["parameters"]["lr"]["value"] = combo["lr"]
+    sweep_config["parameters"]["optimizer"]["parameters"]["momentum"]["value"] = combo["optimizer.momentum"]
+    sweep_config["name"] = template["name"].replace("{optimizer.momentum}", str(combo["optimizer.momentum"])).format(**combo)
+    sweep_config["command"][3] = template["command"][3].format(**combo)
+    return sweep_config
+
+def bench(label, func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return label, statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--combos", type=int, default=2000, help="Number of variant combinations")
+    parser.add_argument("--params", type=int, default=50, help="Extra template parameters")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement")
+    args = parser.parse_args()
+
+    template = make_template(args.params)
+    spec = make_spec(args.combos)
+    combos = list(spec)
+    compiled = compile_template(template, spec.keys)
+
+    def old_render():
+        for combo in combos:
+            render_old(template, combo)
+
+    def new_render():
+        for combo in combos:
+            compiled.render(combo)
+
+    def old_full():
+        for combo in combos:
+            yaml.dump(render_old(template, combo), io.StringIO())
+
+    def new_full():
+        for combo in combos:
+            yaml_dump(compiled.render(combo), io.StringIO())
+
+    results = [
+        bench("render (deepcopy)", old_render, args.repeat),
+        bench("render (compiled)", new_render, args.repeat),
+        bench("render + dump (deepcopy, yaml.Dumper)", old_full, args.repeat),
+        bench(f"render + dump (compiled, {YamlDumper.__name__})", new_full, args.repeat),
+    ]
+
+    print(f"{len(combos)} combinations, {len(template['parameters'])} parameters")
+    print(f"{'':<48}{'median ms':>12}{'us/combo':>12}")
+    for label, median in results:
+        print(f"{label:<48}{median:>12.1f}{median * 1000 / len(combos):>12.1f}")
+    print(f"\nrender speedup: {results[0][1] / results[1][1]:.1f}x, "
+          f"render + dump speedup: {results[2][1] / results[3][1]:.1f}x")
+
+if __name__ == "__main__":
+    main()
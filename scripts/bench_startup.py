@@ -0,0 +1,71 @@
+"""Measure easysweeps CLI startup time.
+
+Runs a few cheap invocations in fresh interpreters and reports the median and best
+wall-clock time of each. With --max-ms the script exits with status 1 when any median
+is above the limit, so it can be used to catch startup regressions.
+
+Usage:
+    python scripts/bench_startup.py [--repeat 10] [--max-ms 300] [--imports]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = {
+    "import": [sys.executable, "-c", "import easysweeps.cli"],
+    "--help": [sys.executable, "-m", "easysweeps.cli", "--help"],
+    "sweep --help": [sys.executable, "-m", "easysweeps.cli", "sweep", "--help"],
+    "agent --help": [sys.executable, "-m", "easysweeps.cli", "agent", "--help"],
+}
+
+def time_command(cmd, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def slowest_imports(limit=15):
+    """Return the modules with the highest cumulative import time (in microseconds)"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import easysweeps.cli"],
+        capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((int(cumulative_us), module.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="Runs per command")
+    parser.add_argument("--max-ms", type=float, help="Fail if any median startup time exceeds this")
+    parser.add_argument("--imports", action="store_true", help="Also list the slowest imports")
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'command':<16}{'median ms':>12}{'best ms':>12}")
+    for name, cmd in COMMANDS.items():
+        timings = time_command(cmd, args.repeat)
+        median = statistics.median(timings)
+        print(f"{name:<16}{median:>12.1f}{min(timings):>12.1f}")
+        if args.max_ms is not None and median > args.max_ms:
+            failed = True
+
+    if args.imports:
+        print("\nslowest imports (cumulative ms):")
+        for cumulative_us, module in slowest_imports():
+            print(f"{cumulative_us / 1000:>10.1f}  {module}")
+
+    if failed:
+        print(f"\nStartup time above {args.max_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
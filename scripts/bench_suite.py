@@ -0,0 +1,336 @@
+"""Offline benchmark suite for the easysweeps CLI.
+
+Runs `sweep`, `agent`, `status` and `kill` end to end in a scratch directory, with the
+stand-in executables from scripts/fakes (wandb, systemd-run, systemctl, nvidia-smi)
+first on PATH. Nothing talks to the network, systemd or a GPU, so it runs on any Linux
+box. The CLI of this source tree is used, in a fresh interpreter per invocation, so
+startup cost is included just like for a user.
+
+Measured:
+- sweep creation throughput (sweeps/s) with --jobs 1 and --jobs 8, and the rerun
+  where every sweep is unchanged
+- agent launch latency: `agent --auto N` until all agents are ready
+- `status`, `status --json` and `kill` latency with --units fake agent units
+
+Each run is appended as one JSON line to the results file (default
+.benchmarks/results.jsonl) together with the git revision, so runs of different
+versions can be compared. --compare prints the change against the previous run
+(or the last run with the --baseline label).
+
+--check runs offline functional checks instead of the benchmarks, in the same kind of
+scratch directory:
+- hosts: agents on two stand-in hosts (host_transport: local), their merged status
+  and a kill on one host
+- local_sweep: a grid sweep with `sweep_backend: local`, run to completion by two
+  agents without wandb
+
+Usage:
+    python scripts/bench_suite.py [--sweeps 100] [--units 1000] [--repeat 5] [--compare]
+    python scripts/bench_suite.py --check
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+FAKES_DIR = Path(__file__).resolve().parent / "fakes"
+
+# Benchmarks where a higher value is better; everything else is a latency
+HIGHER_IS_BETTER = {"sweep_create_jobs1", "sweep_create_jobs8", "sweep_create_unchanged"}
+
+class Workspace:
+    """Scratch project directory with an ez_config.yaml and the fake executables on PATH"""
+
+    def __init__(self, root: Path, wandb_delay: float, gpus: int):
+        self.root = root
+        self.state_dir = root / "fake_state"
+        (self.state_dir / "pids").mkdir(parents=True)
+        (root / "conda.sh").write_text("conda() { :; }\n")
+        (root / "ez_config.yaml").write_text(
+            "sweep_dir: sweeps\n"
+            "agent_log_dir: agent_logs\n"
+            "conda_env: base\n"
+            f"conda_path: {root / 'conda.sh'}\n"
+            "entity: fake-entity\n"
+            "project: fake-project\n"
+            "sweep_backend: subprocess\n"
+        )
+        self.env = dict(os.environ)
+        self.env.update({
+            "PATH": f"{FAKES_DIR}{os.pathsep}{os.environ.get('PATH', '')}",
+            "PYTHONPATH": f"{REPO_DIR}{os.pathsep}{os.environ.get('PYTHONPATH', '')}",
+            "FAKE_STATE_DIR": str(self.state_dir),
+            "FAKE_WANDB_DELAY": str(wandb_delay),
+            "FAKE_GPUS": str(gpus),
+            "XDG_CACHE_HOME": str(root / "cache"),
+        })
+
+    def configure(self, *lines):
+        """Append settings to the workspace's ez_config.yaml"""
+        with open(self.root / "ez_config.yaml", "a") as f:
+            f.write("".join(f"{line}\n" for line in lines))
+
+    def ez_output(self, *args, input=None) -> str:
+        """Run an easysweeps command and return its stdout"""
+        result = subprocess.run(
+            [sys.executable, "-m", "easysweeps.cli", *args],
+            cwd=self.root, env=self.env, input=input,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ez {' '.join(args)} failed:\n{result.stdout}{result.stderr}")
+        return result.stdout
+
+    def ez(self, *args, input=None) -> float:
+        """Run an easysweeps command and return its wall-clock time in seconds"""
+        start = time.perf_counter()
+        self.ez_output(*args, input=input)
+        return time.perf_counter() - start
+
+    def write_templates(self, num_sweeps: int, name: str):
+        sweep_dir = self.root / "sweeps"
+        sweep_dir.mkdir(exist_ok=True)
+        (sweep_dir / "sweep_template.yaml").write_text(
+            f"name: \"{name}_{{seed}}\"\n"
+            "method: grid\n"
+            "program: train.py\n"
+            "parameters:\n"
+            "  lr:\n"
+            "    values: [0.1, 0.01, 0.001]\n"
+            "  seed:\n"
+            "    value: None\n"
+        )
+        (sweep_dir / "sweep_variants.yaml").write_text(f"seed: {list(range(num_sweeps))}\n")
+
+    def sweep_ids(self) -> list:
+        import sqlite3
+        with sqlite3.connect(self.root / "sweeps" / "sweeps.db") as db:
+            return [row[0] for row in db.execute("SELECT sweep_id FROM sweeps ORDER BY rowid")]
+
+    def set_units(self, sweep_ids, num_units: int, gpus: int):
+        """Replace the fake unit list with num_units active agents spread over sweeps and GPUs"""
+        lines = []
+        for i in range(num_units):
+            sweep_id = sweep_ids[i % len(sweep_ids)]
+            gpu, agent = (i // len(sweep_ids)) % gpus, i // (len(sweep_ids) * gpus)
+            unit = f"wandb-agent-{sweep_id}-{gpu}-{agent}.scope"
+            lines.append(f"{unit} loaded active running {unit}\n")
+        (self.state_dir / "units.txt").write_text("".join(lines))
+
+    def stop_agents(self):
+        """Kill the processes started by the fake systemd-run and forget all units"""
+        for pid_file in (self.state_dir / "pids").iterdir():
+            try:
+                os.kill(int(pid_file.read_text()), signal.SIGTERM)
+            except (OSError, ValueError):
+                pass
+            pid_file.unlink()
+        (self.state_dir / "units.txt").write_text("")
+
+def bench_sweeps(ws: Workspace, num_sweeps: int) -> dict:
+    results = {}
+    for jobs in (1, 8):
+        shutil.rmtree(ws.root / "sweeps", ignore_errors=True)
+        ws.write_templates(num_sweeps, f"bench_j{jobs}")
+        elapsed = ws.ez("sweep", "--jobs", str(jobs))
+        results[f"sweep_create_jobs{jobs}"] = num_sweeps / elapsed
+    elapsed = ws.ez("sweep", "--jobs", "8")
+    results["sweep_create_unchanged"] = num_sweeps / elapsed
+    return results
+
+def bench_agents(ws: Workspace, sweep_id: str, num_agents: int, repeat: int) -> dict:
+    timings = []
+    for _ in range(repeat):
+        try:
+            timings.append(ws.ez("agent", sweep_id, "--auto", str(num_agents), "--ready-timeout", "10"))
+        finally:
+            ws.stop_agents()
+    return {"agent_launch": statistics.median(timings)}
+
+def bench_units(ws: Workspace, sweep_ids, num_units: int, gpus: int, repeat: int) -> dict:
+    ws.set_units(sweep_ids, num_units, gpus)
+    results = {
+        "status": statistics.median(ws.ez("status") for _ in range(repeat)),
+        "status_json": statistics.median(ws.ez("status", "--json") for _ in range(repeat)),
+    }
+    timings = {"kill_gpu": [], "kill_sweep": []}
+    for _ in range(repeat):
+        ws.set_units(sweep_ids, num_units, gpus)
+        timings["kill_gpu"].append(ws.ez("kill", "--gpu", "0"))
+        ws.set_units(sweep_ids, num_units, gpus)
+        timings["kill_sweep"].append(ws.ez("kill", "--sweep", sweep_ids[0]))
+    results.update({name: statistics.median(values) for name, values in timings.items()})
+    ws.stop_agents()
+    return results
+
+def _agents_per_host(ws: Workspace, hosts: str) -> dict:
+    status = json.loads(ws.ez_output("status", "--json", "--hosts", hosts).strip().splitlines()[-1])
+    counts = {}
+    for sweep in status["sweeps"]:
+        for agent in sweep["agents"]:
+            counts[agent["host"]] = counts.get(agent["host"], 0) + 1
+    return counts
+
+def check_hosts(ws: Workspace):
+    """Launch, list and kill agents on two stand-in hosts run by the local transport"""
+    ws.configure("executor: process", "host_transport: local", "use_daemon: false")
+    ws.write_templates(1, "hosts")
+    ws.ez("sweep")
+    sweep_id = ws.sweep_ids()[0]
+    try:
+        ws.ez("agent", sweep_id, "--hosts", "node1:0 node2:0,1", "--ready-timeout", "10")
+        counts = _agents_per_host(ws, "node1 node2")
+        assert counts == {"node1": 1, "node2": 2}, f"agents per host after launch: {counts}"
+        ws.ez("kill", "--force", "--hosts", "node1", input="y\n")
+        counts = _agents_per_host(ws, "node1 node2")
+        assert counts == {"node2": 2}, f"agents per host after killing node1: {counts}"
+    finally:
+        ws.ez("kill", "--force", "--hosts", "node1 node2", input="y\n")
+    counts = _agents_per_host(ws, "node1 node2")
+    assert not counts, f"agents left after killing all hosts: {counts}"
+
+def check_local_sweep(ws: Workspace, timeout: float = 60):
+    """Run a local grid sweep to completion with two agents"""
+    ws.configure("executor: process", "sweep_backend: local", "local_wandb_mode: disabled", "use_daemon: false")
+    # Agents run with the project directory as PYTHONPATH, so make this source tree importable from there
+    (ws.root / "easysweeps").symlink_to(REPO_DIR / "easysweeps")
+    # Runs take a second, so both agents are still busy when the launch checks that they are ready
+    (ws.root / "train.py").write_text("import sys, time\nprint('train', *sys.argv[1:])\ntime.sleep(1)\n")
+    ws.write_templates(1, "local")
+    ws.ez("sweep")
+    sweep_id = ws.sweep_ids()[0]
+    try:
+        ws.ez("agent", sweep_id, "--gpu-list", "0,1", "--ready-timeout", "10")
+        deadline = time.monotonic() + timeout
+        while True:
+            runs = json.loads(ws.ez_output("local-runs", sweep_id, "--json"))
+            states = sorted(run["state"] for run in runs.values())
+            if states == ["finished"] * 3 or time.monotonic() > deadline:
+                break
+            time.sleep(0.5)
+        assert states == ["finished"] * 3, f"run states after {timeout:.0f}s: {states}"
+        values = sorted(run["params"]["lr"] for run in runs.values())
+        assert values == [0.001, 0.01, 0.1], f"grid values of the runs: {values}"
+    finally:
+        ws.ez("kill", "--force", input="y\n")
+
+CHECKS = {
+    "hosts": check_hosts,
+    "local_sweep": check_local_sweep,
+}
+
+def run_checks(args) -> bool:
+    """Run every check in its own workspace. Returns True if all of them passed."""
+    passed = True
+    for name, check in CHECKS.items():
+        with tempfile.TemporaryDirectory(prefix=f"ez-check-{name}-") as tmp:
+            ws = Workspace(Path(tmp), 0.0, args.gpus)
+            start = time.perf_counter()
+            try:
+                check(ws)
+            except (AssertionError, RuntimeError) as e:
+                passed = False
+                print(f"{name:<14}FAILED  {e}")
+                continue
+            print(f"{name:<14}ok      {time.perf_counter() - start:.1f}s")
+    return passed
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--tags", "--always", "--dirty"],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def load_results(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def print_results(run: dict, baseline: dict = None):
+    header = f"{'benchmark':<26}{'value':>12}  {'unit':<10}"
+    if baseline:
+        header += f"{'baseline':>12}{'change':>10}"
+    print(header)
+    for name, value in run["results"].items():
+        unit = "sweeps/s" if name in HIGHER_IS_BETTER else "s"
+        line = f"{name:<26}{value:>12.3f}  {unit:<10}"
+        old = (baseline or {}).get("results", {}).get(name)
+        if old:
+            change = (value - old) / old * 100
+            worse = change < 0 if name in HIGHER_IS_BETTER else change > 0
+            line += f"{old:>12.3f}{change:>+9.1f}%" + (" (worse)" if worse and abs(change) >= 10 else "")
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sweeps", type=int, default=100, help="Sweeps to create")
+    parser.add_argument("--agents", type=int, default=16, help="Agents to launch")
+    parser.add_argument("--units", type=int, default=1000, help="Fake agent units for status and kill")
+    parser.add_argument("--gpus", type=int, default=8, help="Fake GPUs reported by nvidia-smi")
+    parser.add_argument("--wandb-delay", type=float, default=0.05, help="Seconds each fake `wandb sweep` takes")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per latency measurement")
+    parser.add_argument("--label", help="Label stored with the results (default: git revision)")
+    parser.add_argument("--results", type=Path, default=REPO_DIR / ".benchmarks" / "results.jsonl",
+                        help="JSON lines file the results are appended to")
+    parser.add_argument("--compare", action="store_true", help="Compare with the previous run")
+    parser.add_argument("--baseline", help="Compare with the last run with this label instead")
+    parser.add_argument("--no-save", action="store_true", help="Do not store the results")
+    parser.add_argument("--check", action="store_true", help="Run the functional checks instead of the benchmarks")
+    args = parser.parse_args()
+
+    if platform.system() != "Linux":
+        parser.error("the fake executables need a Linux shell environment")
+
+    if args.check:
+        sys.exit(0 if run_checks(args) else 1)
+
+    with tempfile.TemporaryDirectory(prefix="ez-bench-") as tmp:
+        ws = Workspace(Path(tmp), args.wandb_delay, args.gpus)
+        results = bench_sweeps(ws, args.sweeps)
+        sweep_ids = ws.sweep_ids()
+        results.update(bench_agents(ws, sweep_ids[0], args.agents, args.repeat))
+        results.update(bench_units(ws, sweep_ids, args.units, args.gpus, args.repeat))
+
+    revision = git_revision()
+    run = {
+        "label": args.label or revision,
+        "revision": revision,
+        "time": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.node(),
+        "params": {key: getattr(args, key) for key in ("sweeps", "agents", "units", "gpus", "wandb_delay", "repeat")},
+        "results": results,
+    }
+
+    baseline = None
+    if args.compare or args.baseline:
+        previous = load_results(args.results)
+        if args.baseline:
+            previous = [r for r in previous if r.get("label") == args.baseline]
+        baseline = previous[-1] if previous else None
+        if baseline is None:
+            print("No earlier run to compare with", file=sys.stderr)
+
+    print_results(run, baseline)
+
+    if not args.no_save:
+        args.results.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.results, "a") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nResults appended to {args.results}")
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ setup(
         "wandb>=0.12.0",
         "prompt_toolkit>=3.0.0",
         "typing-extensions>=4.0.0",
+        "psutil>=5.6.0",
     ],
     extras_require={
         "dev": [